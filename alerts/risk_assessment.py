@@ -9,66 +9,103 @@ Takes the high-level activities and decides:
 """
 
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Iterable, List, Optional, Tuple
 
-from recognition.activity_recognition import ActivityItem
+from recognition.activity_recognition import ActivityItem, format_timestamp
+from recognition.rules import RuleSet, get_rule_set
 
 
-@dataclass
+@dataclass(slots=True)
 class AlertItem:
     id: str
     title: str
-    message: str
+    activity_label: str  # the activity that raised the alert
     severity: str  # "warning" | "critical"
-    timestamp: str
+    time_seconds: float
     is_new: bool = True
 
+    @property
+    def timestamp(self) -> str:
+        return format_timestamp(self.time_seconds)
 
-def assess_risk_and_alerts(activities: List[ActivityItem]) -> Tuple[str, List[AlertItem]]:
-    if not activities:
-        return "low", []
+    @property
+    def message(self) -> str:
+        return f"{self.activity_label} at {self.timestamp}"
+
+    def to_dict(self) -> dict:
+        """The API ``Alert`` shape."""
+        return {
+            "id": self.id,
+            "title": self.title,
+            "message": self.message,
+            "severity": self.severity,
+            "timestamp": self.timestamp,
+            "time_seconds": self.time_seconds,
+            "is_new": self.is_new,
+        }
 
-    has_danger = any(a.type == "danger" for a in activities)
-    has_warning = any(a.type == "warning" for a in activities)
 
-    if has_danger:
-        risk_level = "high"
-    elif has_warning:
-        risk_level = "medium"
+def alert_for_activity(activity: ActivityItem, alert_id: str, rules: Optional[RuleSet] = None) -> Optional[AlertItem]:
+    """
+    The alert raised by one activity, or None for normal activities. Titles
+    and severities come from the rule matching the label, with generic
+    titles for warning/danger activities no rule describes.
+    """
+    if activity.type not in ("warning", "danger"):
+        return None
+    if rules is None:
+        rules = get_rule_set()
+    rule = rules.match(activity.label)
+    if rule is not None and rule.activity_type == activity.type and rule.alert_title:
+        title = rule.alert_title
+        severity = rule.alert_severity
+    elif activity.type == "danger":
+        title = "High-Risk Activity Detected"
+        severity = "critical"
     else:
-        risk_level = "low"
+        title = "Suspicious Behavior Detected"
+        severity = "warning"
+    return AlertItem(
+        id=alert_id,
+        title=title,
+        activity_label=activity.label,
+        severity=severity,
+        time_seconds=activity.time_seconds,
+        is_new=True,
+    )
+
+
+def risk_level_for(activity_types: Iterable[str]) -> str:
+    types = set(activity_types)
+    if "danger" in types:
+        return "high"
+    if "warning" in types:
+        return "medium"
+    return "low"
+
+
+def assess_risk_and_alerts(
+    activities: List[ActivityItem],
+    rules: Optional[RuleSet] = None,
+) -> Tuple[str, List[AlertItem]]:
+    """
+    Overall risk level plus one alert per warning/danger activity (see
+    ``alert_for_activity``; ``rules`` defaults to the bundled rule set).
+    """
+    if rules is None:
+        rules = get_rule_set()
+    if not activities:
+        return "low", []
+
+    risk_level = risk_level_for(a.type for a in activities)
 
     alerts: List[AlertItem] = []
 
     # Generate alerts similar to your static dashboard content
     for idx, a in enumerate(activities, start=1):
-        if a.type == "danger":
-            if "unauthorized" in a.label.lower():
-                title = "Unauthorized Access Detected"
-                severity = "critical"
-            elif "theft" in a.label.lower() or "object" in a.label.lower():
-                title = "Theft Activity Detected"
-                severity = "critical"
-            else:
-                title = "High-Risk Activity Detected"
-                severity = "critical"
-        elif a.type == "warning":
-            title = "Suspicious Behavior Detected"
-            severity = "warning"
-        else:
-            # Skip normal items from alerts
-            continue
-
-        alerts.append(
-            AlertItem(
-                id=str(idx),
-                title=title,
-                message=f"{a.label} at {a.timestamp}",
-                severity=severity,
-                timestamp=f"{a.timestamp}",
-                is_new=True,
-            )
-        )
+        alert = alert_for_activity(a, str(idx), rules)
+        if alert is not None:
+            alerts.append(alert)
 
     return risk_level, alerts
 
@@ -18,33 +18,134 @@ You can later replace the stubbed parts with real YOLO/LSTM/LLM models.
 
 from __future__ import annotations
 
+import asyncio
 import os
 import shutil
 import tempfile
-from typing import List
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import logging
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, Request, UploadFile, HTTPException, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
 )
 logger = logging.getLogger(__name__)
 
-from preprocessing.video import extract_video_metadata
-from detection.yolo_pipeline import run_yolo_stub_detection
-from recognition.activity_recognition import build_activity_timeline
-from summarization.llm_summarizer import generate_narrative_summary
-from alerts.risk_assessment import assess_risk_and_alerts
+# Every log line carries the id of the request it belongs to ("-" outside requests).
+from service.tracing import RequestIdFilter, current_request_id, span, start_trace
+
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(RequestIdFilter())
+
+from detection.backends import detector_loaded, warm_detector
+from pipeline.features import FeatureStore
+from pipeline.sharding import shutdown_shard_pool
+from recognition.activity_recognition import ActivityItem
+from recognition.rules import get_rule_set
+from recognition.temporal import recognizer_loaded, warm_recognizer
+from service.analysis import AnalysisResult, PipelineOptions, pipeline_fingerprint, run_analysis
+from service.evidence import EvidenceCache, EvidenceExtractor, valid_digest
+from service.incidents import IncidentStore
+from service.jobs import JobManager
+from service.live import LiveManager
+from service.metrics import REGISTRY, track_peak_rss
+from service.profiling import PROFILER
+from service.push import PushHub, PushMessage, Subscription, camera_topic, job_topic
+from service.readiness import ModelWarmup
+from service.result_cache import ResultCache
+from service.result_store import create_result_store
+from service.settings import Settings
+from service.uploads import ANALYSIS_PEAK_RSS_GROWTH, UploadResult, content_length_exceeds, stream_upload_to_disk
+from service.workers import PipelineExecutor, PoolSaturatedError
+from summarization.backends import get_summarizer, summarizer_loaded, warm_summarizer
+
+settings = Settings.from_env()
+
+# Blocking pipeline stages run here, never on the event loop.
+executor = PipelineExecutor(
+    kind=settings.worker_kind,
+    max_workers=settings.worker_count,
+    max_queue=settings.worker_queue_size,
+    default_retry_after=settings.retry_after_seconds,
+)
+
+pipeline_options = PipelineOptions.from_settings(settings)
+
+# Compile the label rules now so a broken rule file fails at startup.
+rule_set = get_rule_set(settings.rules_path)
+
+# Loads and warms the models when CCTV_MODEL_LOADING says to; /ready reports on it.
+model_warmup = ModelWarmup(
+    {
+        "detector": partial(warm_detector, pipeline_options.detector),
+        "recognizer": partial(warm_recognizer, pipeline_options.recognizer, settings.rules_path),
+        "summarizer": partial(warm_summarizer, pipeline_options.summarizer),
+    },
+    {
+        "detector": partial(detector_loaded, pipeline_options.detector),
+        "recognizer": partial(recognizer_loaded, pipeline_options.recognizer, settings.rules_path),
+        "summarizer": partial(summarizer_loaded, pipeline_options.summarizer),
+    },
+    mode=settings.model_loading,
+)
+
+# Repeat uploads of the same clip are answered from here.
+result_cache = ResultCache(max_memory_bytes=settings.cache_memory_bytes, disk_dir=settings.cache_dir)
+PIPELINE_FINGERPRINT = pipeline_fingerprint({**asdict(pipeline_options), "rules_digest": rule_set.digest})
+
+# Searchable history of every activity and alert (disabled without CCTV_INCIDENT_DB).
+incidents: Optional[IncidentStore] = (
+    IncidentStore(
+        settings.incident_db,
+        batch_size=settings.incident_batch_size,
+        flush_seconds=settings.incident_flush_seconds,
+    )
+    if settings.incident_db
+    else None
+)
+
+# Sampled frames and detections kept for re-analysis (disabled without CCTV_FEATURE_DIR).
+features: Optional[FeatureStore] = (
+    FeatureStore(settings.feature_dir, max_bytes=settings.feature_max_bytes, frames=settings.feature_frames)
+    if settings.feature_dir
+    else None
+)
+
+# Alert thumbnails and clips (disabled without CCTV_EVIDENCE_DIR).
+evidence: Optional[EvidenceExtractor] = (
+    EvidenceExtractor(
+        EvidenceCache(settings.evidence_dir, max_bytes=settings.evidence_max_bytes),
+        workers=settings.evidence_workers,
+        clip_before_seconds=settings.evidence_clip_before_seconds,
+        clip_after_seconds=settings.evidence_clip_after_seconds,
+        thumbnail_width=settings.evidence_thumbnail_width,
+        jpeg_quality=settings.evidence_jpeg_quality,
+    )
+    if settings.evidence_dir
+    else None
+)
+
+# Recent request profiles kept for /debug/profiles (profiling is armed at runtime).
+PROFILER.max_profiles = settings.profile_max_requests
+
+# Endpoints that accept video uploads and are subject to the size limit.
+UPLOAD_PATHS = {"/analyze-video", "/jobs"}
 
 
 class Activity(BaseModel):
     timestamp: str
+    time_seconds: float
     label: str
     type: str  # "normal" | "warning" | "danger"
     confidence: float
@@ -56,7 +157,10 @@ class Alert(BaseModel):
     message: str
     severity: str  # "warning" | "critical"
     timestamp: str
+    time_seconds: float
     is_new: bool
+    thumbnail_url: Optional[str] = None  # set when evidence extraction is enabled
+    clip_url: Optional[str] = None
 
 
 class AnalysisResponse(BaseModel):
@@ -65,9 +169,233 @@ class AnalysisResponse(BaseModel):
     narrative_summary: str
     risk_level: str  # "low" | "medium" | "high"
     alerts: List[Alert]
+    video_sha256: Optional[str] = None
+
+
+class JobSubmitted(BaseModel):
+    job_id: str
+    status: str
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str  # "queued" | "running" | "completed" | "failed"
+    stages: Dict[str, str]  # stage -> "pending" | "running" | "done" | "failed"
+    created_at: float
+    updated_at: float
+    error: Optional[str] = None
+    result: Optional[AnalysisResponse] = None
+
+
+class CacheInvalidated(BaseModel):
+    invalidated: int
+
+
+class StreamRequest(BaseModel):
+    source: str  # rtsp://... / http://... URL, or a file path under CCTV_STREAM_FILE_ROOT
+    camera_id: Optional[str] = None
+    realtime: Optional[bool] = None  # replay at native speed; default: files yes, URLs no
+    weight: float = 1.0  # share of the detection budget relative to other cameras
+
+
+class Latency(BaseModel):
+    count: int
+    mean: float
+    max: float
+    last: float
+
+
+class Scheduling(BaseModel):
+    target_fps: float  # detection FPS currently allotted to the camera
+    achieved_fps: float
+    queue_latency_seconds: float  # capture-to-detection delay of the latest frames
+    frames_skipped: int  # thinned to the allotted FPS, or stale
+    boosted: bool  # raised priority after a warning/danger activity
+
+
+class StreamStatus(BaseModel):
+    stream_id: str
+    camera_id: str
+    source: str
+    status: str  # "starting" | "running" | "finished" | "failed" | "stopped"
+    error: Optional[str] = None
+    started_at: float
+    frames_read: int
+    frames_sampled: int
+    frames_processed: int
+    frames_dropped: int
+    sampled_fps: float
+    risk_level: str
+    activities: int
+    alerts: int
+    activity_latency: Latency
+    alert_latency: Latency
+    scheduling: Optional[Scheduling] = None  # model backends only
+
+
+class NarrativeRequest(BaseModel):
+    activities: List[Activity]
+    duration_seconds: float
+
+
+class StreamNarrative(BaseModel):
+    stream_id: str
+    narrative: str
+    windows: List[str]  # one summary per closed time window, oldest first
+
+
+class StreamItem(BaseModel):
+    seq: int
+    kind: str  # "activity" | "alert"
+    stream_seconds: float
+    latency_seconds: float
+    data: Dict[str, Any]  # an Activity or Alert
+
+
+class StreamItems(BaseModel):
+    stream_id: str
+    items: List[StreamItem]
+    next_after: int  # pass as ``after`` to fetch the following items
+
+
+class Incident(BaseModel):
+    id: int
+    ts: float  # epoch seconds of the event
+    camera: str
+    kind: str  # "activity" | "alert"
+    label: str  # activity label or alert title
+    severity: str  # activity type or alert severity
+    confidence: Optional[float] = None
+    message: Optional[str] = None
+    source: Optional[str] = None  # "upload" | "job" | "stream"
+    ref: Optional[str] = None  # video sha256, job id or stream id
+
+
+class ProfileRequest(BaseModel):
+    requests: int = 1  # analyses to profile
+    interval_ms: float = 5.0  # sampling interval
+
+
+class ModelStatus(BaseModel):
+    state: str  # "cold" | "loading" | "ready" | "failed"
+    load_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class Readiness(BaseModel):
+    ready: bool
+    model_loading: str  # "eager" | "background" | "lazy"
+    pid: int  # tells the workers of a pre-forked server apart
+    models: Dict[str, ModelStatus]
+
+
+class ProfilerStatus(BaseModel):
+    armed_requests: int
+    interval_ms: float
+    profiles: List[str]  # request ids with a stored profile, oldest first
+
+
+class IncidentPage(BaseModel):
+    items: List[Incident]
+    next_cursor: Optional[str] = None  # pass as ``cursor`` for the next (older) page
+
+
+def _to_response(result: AnalysisResult, digest: Optional[str] = None) -> AnalysisResponse:
+    """Adapt pipeline dataclasses to the API response models."""
+    # Times are formatted as mm:ss timestamps here, at the API boundary.
+    activity_models = [Activity(**a.to_dict()) for a in result.activities]
+    alert_models = [Alert(**alert.to_dict()) for alert in result.alerts]
+
+    return AnalysisResponse(
+        video_duration_seconds=result.metadata.duration_seconds,
+        activities=activity_models,
+        narrative_summary=result.narrative,
+        risk_level=result.risk_level,
+        alerts=alert_models,
+        video_sha256=digest,
+    )
+
+
+# Fan-out of activities, alerts and job progress to SSE / WebSocket clients.
+push_hub = PushHub(
+    buffer_size=settings.push_buffer_size,
+    max_subscribers=settings.push_max_subscribers,
+    keepalive_seconds=settings.push_keepalive_seconds,
+)
+
+jobs = JobManager(
+    executor,
+    create_result_store(
+        settings.job_store,
+        path=settings.job_store_path,
+        max_entries=settings.job_store_max_entries,
+    ),
+    serialize=lambda result, digest: _to_response(result, digest).model_dump(),
+    ttl_seconds=settings.job_ttl_seconds,
+    options=pipeline_options,
+    cache=result_cache if result_cache.enabled else None,
+    fingerprint=PIPELINE_FINGERPRINT,
+    hub=push_hub,
+    incidents=incidents,
+    evidence=evidence,
+    features=features,
+)
+
+# Live camera / replayed-file analysis sessions.
+live = LiveManager(
+    pipeline_options,
+    max_sessions=settings.stream_max_sessions,
+    buffer_seconds=settings.stream_buffer_seconds,
+    history=settings.stream_history,
+    file_root=settings.stream_file_root,
+    hub=push_hub,
+    min_fps=settings.scheduler_min_fps,
+    max_queue_seconds=settings.scheduler_max_queue_seconds,
+    boost_factor=settings.scheduler_boost_factor,
+    boost_seconds=settings.scheduler_boost_seconds,
+    summary_window_seconds=settings.summary_window_seconds,
+    summary_cache_entries=settings.summary_cache_entries,
+    incidents=incidents,
+)
+
+
+async def _purge_expired_jobs() -> None:
+    while True:
+        await asyncio.sleep(60)
+        try:
+            jobs.store.purge_expired()
+        except Exception as e:
+            logger.warning(f"Failed to purge expired jobs: {e}")
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    warming: Optional[asyncio.Task] = None
+    if model_warmup.mode == "eager":
+        # Load and warm the models once at startup instead of on the first request.
+        await model_warmup.run(executor)
+        logger.info(f"Detector backend '{pipeline_options.detector.backend}' ready")
+    elif model_warmup.mode == "background":
+        warming = asyncio.create_task(model_warmup.run(executor, raise_errors=False))
+    push_hub.bind(asyncio.get_running_loop())
+    purger = asyncio.create_task(_purge_expired_jobs())
+    yield
+    purger.cancel()
+    if warming is not None:
+        warming.cancel()
+    push_hub.shutdown()
+    await jobs.shutdown()
+    live.shutdown()
+    if incidents is not None:
+        incidents.close()
+    if evidence is not None:
+        evidence.shutdown()
+    executor.shutdown()
+    shutdown_shard_pool()
 
 
 app = FastAPI(
+    lifespan=lifespan,
     title="AI CCTV Incident Summarization API",
     description=(
         "Backend for AI-based CCTV incident narrative summarization.\n\n"
@@ -96,142 +424,504 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Reject before the multipart body is parsed and spooled to disk.
+    if request.url.path in UPLOAD_PATHS and content_length_exceeds(request.headers, settings.max_upload_bytes):
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Uploaded file exceeds the maximum allowed size of {settings.max_upload_bytes} bytes"},
+        )
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Outermost middleware: every response carries its request id and span timings.
+    trace = start_trace(request.headers.get("x-request-id"))
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = trace.request_id
+    timing = trace.server_timing()
+    if timing:
+        response.headers["Server-Timing"] = timing
+    return response
+
+
+@app.exception_handler(PoolSaturatedError)
+async def pool_saturated_handler(_request: Request, exc: PoolSaturatedError) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after_seconds)},
+    )
+
+
 @app.get("/health")
 def health_check() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/ready", response_model=Readiness)
+def readiness_check() -> JSONResponse:
+    """200 once this worker can run analyses without loading models first, else 503."""
+    body = Readiness(
+        ready=model_warmup.ready,
+        model_loading=model_warmup.mode,
+        pid=os.getpid(),
+        models={name: ModelStatus(**asdict(state)) for name, state in model_warmup.status().items()},
+    )
+    return JSONResponse(status_code=200 if body.ready else 503, content=body.model_dump())
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> str:
+    return REGISTRY.render()
+
+
+def _require_profiling() -> None:
+    if not settings.profiling:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set CCTV_PROFILING=1)")
+
+
+def _profiler_status() -> ProfilerStatus:
+    return ProfilerStatus(
+        armed_requests=PROFILER.remaining, interval_ms=PROFILER.interval_ms, profiles=PROFILER.request_ids()
+    )
+
+
+@app.post("/debug/profile", response_model=ProfilerStatus)
+def arm_profiler(request: ProfileRequest) -> ProfilerStatus:
+    """Profile the next ``requests`` analyses (``/analyze-video`` or jobs)."""
+    _require_profiling()
+    if request.requests < 0 or not 0.5 <= request.interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="requests must be >= 0 and interval_ms in [0.5, 1000]")
+    PROFILER.arm(request.requests, request.interval_ms)
+    return _profiler_status()
+
+
+@app.get("/debug/profile", response_model=ProfilerStatus)
+def profiler_status() -> ProfilerStatus:
+    _require_profiling()
+    return _profiler_status()
+
+
+@app.delete("/debug/profile", response_model=ProfilerStatus)
+def disarm_profiler() -> ProfilerStatus:
+    _require_profiling()
+    PROFILER.arm(0, PROFILER.interval_ms)
+    return _profiler_status()
+
+
+@app.get("/debug/profiles/{request_id}", response_class=PlainTextResponse)
+def get_profile(request_id: str) -> str:
+    """Folded stacks of one profiled request (request id or job id), for flamegraph.pl or speedscope."""
+    _require_profiling()
+    profile = PROFILER.get(request_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No profile for this request")
+    return profile.folded()
+
+
+def _require_evidence() -> EvidenceExtractor:
+    if evidence is None:
+        raise HTTPException(status_code=404, detail="Evidence extraction is disabled (set CCTV_EVIDENCE_DIR)")
+    return evidence
+
+
+def _evidence_response(path: Optional[str], media_type: str) -> FileResponse:
+    if path is None:
+        raise HTTPException(status_code=404, detail="No evidence for this video and time")
+    # Files never change under a name, so clients may keep them.
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": "public, max-age=86400, immutable"})
+
+
+@app.get("/evidence/{video_sha256}/{time_ms}/thumbnail.jpg", response_class=FileResponse)
+def get_evidence_thumbnail(video_sha256: str, time_ms: int) -> FileResponse:
+    """JPEG of the frame at an alert (the alert's ``thumbnail_url``)."""
+    extractor = _require_evidence()
+    path = extractor.thumbnail_path(video_sha256, time_ms) if valid_digest(video_sha256) else None
+    return _evidence_response(path, "image/jpeg")
+
+
+@app.get("/evidence/{video_sha256}/{time_ms}/clip.mp4", response_class=FileResponse)
+def get_evidence_clip(video_sha256: str, time_ms: int) -> FileResponse:
+    """Short clip around an alert (the alert's ``clip_url``)."""
+    extractor = _require_evidence()
+    path = extractor.clip_path(video_sha256, time_ms) if valid_digest(video_sha256) else None
+    return _evidence_response(path, "video/mp4")
+
+
 @app.post("/analyze-video", response_model=AnalysisResponse)
-async def analyze_video(file: UploadFile = File(...)) -> AnalysisResponse:
+async def analyze_video(
+    file: UploadFile = File(...),
+    camera_id: Optional[str] = Form(None),
+    recorded_at: Optional[float] = Form(None),
+) -> AnalysisResponse:
     """
     Main analysis endpoint.
 
-    1. Save uploaded file to a temporary location.
+    1. Stream the uploaded file to a temporary location.
     2. Extract video metadata (duration, fps, etc.).
     3. Run YOLO-style stub detection over coarse frames.
     4. Run LSTM-style temporal reasoning to build an activity timeline.
     5. Generate an LLM-style narrative summary.
     6. Assess risk level and derive alert notifications.
+
+    ``camera_id`` and ``recorded_at`` (epoch seconds the footage starts
+    at; default now) file the result in the incident history. A result
+    served from the cache was filed when it was computed and is not
+    filed again.
+    """
+    with track_peak_rss(ANALYSIS_PEAK_RSS_GROWTH):
+        with span("upload"):
+            tmp_dir, upload = await _save_upload(file)
+
+        try:
+            if result_cache.enabled:
+                with span("cache"):
+                    cached = await run_in_threadpool(result_cache.get, upload.sha256, PIPELINE_FINGERPRINT)
+                if cached is not None:
+                    logger.info(f"Result cache hit for sha256={upload.sha256}")
+                    if evidence is not None:
+                        # Re-extract evidence evicted since the result was cached.
+                        cached = {**cached, "alerts": [dict(alert) for alert in cached["alerts"]]}
+                        with span("evidence"):
+                            await evidence.annotate(
+                                cached["alerts"], upload.path, upload.sha256, cached["video_duration_seconds"]
+                            )
+                    return AnalysisResponse(**cached)
+
+            # Run the pipeline stages on the worker pool, waiting for a slot if needed
+            async with executor.admit():
+                with PROFILER.profile(current_request_id() or ""):
+                    result = await run_analysis(
+                        upload.path, executor, options=pipeline_options, features=features, digest=upload.sha256
+                    )
+
+            response = _to_response(result, upload.sha256)
+            if evidence is not None:
+                with span("evidence"):
+                    alerts = [alert.model_dump() for alert in response.alerts]
+                    await evidence.annotate(alerts, upload.path, upload.sha256, result.metadata.duration_seconds)
+                    response.alerts = [Alert(**alert) for alert in alerts]
+
+            with span("serialize"):
+                if result_cache.enabled:
+                    # Encoding and writing a large result would stall the event loop.
+                    await run_in_threadpool(result_cache.put, upload.sha256, PIPELINE_FINGERPRINT, response.model_dump())
+                _record_incidents(response.model_dump(), camera_id, recorded_at, upload.sha256)
+
+            logger.info("Analysis complete, returning results")
+            return response
+
+        except Exception as e:
+            logger.error(f"Analysis error: {e}", exc_info=True)
+            raise
+        finally:
+            _cleanup(tmp_dir)
+
+
+@app.post("/jobs", response_model=JobSubmitted, status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    camera_id: Optional[str] = Form(None),
+    recorded_at: Optional[float] = Form(None),
+) -> JobSubmitted:
+    """
+    Queue a video for background analysis and return its job id at once.
+
+    Poll ``GET /jobs/{job_id}`` for per-stage progress and the final
+    ``AnalysisResponse``.
+    """
+    tmp_dir, upload = await _save_upload(file)
+    try:
+        job = jobs.submit(
+            upload.path,
+            digest=upload.sha256,
+            cleanup_dir=tmp_dir,
+            camera_id=camera_id,
+            recorded_at=recorded_at,
+        )
+    except Exception:
+        _cleanup(tmp_dir)
+        raise
+    logger.info(f"Queued job {job.id} for {file.filename}")
+    return JobSubmitted(job_id=job.id, status=job.status)
+
+
+def _record_incidents(response: dict, camera_id: Optional[str], recorded_at: Optional[float], digest: str) -> None:
+    if incidents is not None:
+        incidents.record_response(response, camera=camera_id, recorded_at=recorded_at, source="upload", ref=digest)
+
+
+@app.get("/incidents", response_model=IncidentPage)
+def search_incidents(
+    camera: Optional[str] = None,
+    kind: Optional[str] = None,
+    severity: Optional[str] = None,
+    label: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> IncidentPage:
+    """
+    Past activities and alerts, newest first, filtered by any of camera,
+    kind, severity (activity type or alert severity), label and an epoch
+    time range (``since`` inclusive, ``until`` exclusive). Follow
+    ``next_cursor`` for older pages.
+    """
+    if incidents is None:
+        raise HTTPException(status_code=404, detail="Incident history is disabled (set CCTV_INCIDENT_DB)")
+    try:
+        items, next_cursor = incidents.query(
+            camera=camera,
+            kind=kind,
+            severity=severity,
+            label=label,
+            since=since,
+            until=until,
+            limit=max(1, min(limit, 1000)),
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return IncidentPage(items=[Incident(**asdict(i)) for i in items], next_cursor=next_cursor)
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+def get_job(job_id: str) -> JobStatus:
+    record = jobs.get(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found or expired")
+    return JobStatus(**record)
+
+
+@app.post("/narrative", response_class=StreamingResponse)
+def stream_narrative(request: NarrativeRequest) -> StreamingResponse:
+    """
+    Narrative for a timeline (e.g. a job result's activities), streamed
+    as plain text while the configured summarizer produces it.
+    """
+    summarizer = get_summarizer(pipeline_options.summarizer)
+    activities = [ActivityItem.from_dict(a.model_dump()) for a in request.activities]
+    return StreamingResponse(
+        summarizer.stream(activities, request.duration_seconds),
+        media_type="text/plain; charset=utf-8",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.delete("/cache", response_model=CacheInvalidated)
+def invalidate_cache() -> CacheInvalidated:
+    """Drop every cached analysis result."""
+    return CacheInvalidated(invalidated=result_cache.invalidate())
+
+
+@app.delete("/cache/{video_sha256}", response_model=CacheInvalidated)
+def invalidate_cached_video(video_sha256: str) -> CacheInvalidated:
+    """Drop cached results for one video (as reported in ``video_sha256``)."""
+    if not valid_digest(video_sha256):
+        raise HTTPException(status_code=422, detail="video_sha256 must be a lowercase hex SHA-256 digest")
+    return CacheInvalidated(invalidated=result_cache.invalidate(video_sha256))
+
+
+@app.post("/streams", response_model=StreamStatus, status_code=201)
+async def start_stream(request: StreamRequest) -> StreamStatus:
+    """
+    Start analysing a live camera URL or a local file replayed in real time.
+
+    Activities and alerts are produced as they happen; fetch them with
+    ``GET /streams/{stream_id}/items``.
+    """
+    session = await run_in_threadpool(
+        live.start, request.source, camera_id=request.camera_id, realtime=request.realtime, weight=request.weight
+    )
+    return StreamStatus(**session.to_dict())
+
+
+@app.get("/streams", response_model=List[StreamStatus])
+def list_streams() -> List[StreamStatus]:
+    return [StreamStatus(**s.to_dict()) for s in live.list()]
+
+
+@app.get("/streams/{stream_id}", response_model=StreamStatus)
+def get_stream(stream_id: str) -> StreamStatus:
+    session = live.get(stream_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Stream not found")
+    return StreamStatus(**session.to_dict())
+
+
+@app.get("/streams/{stream_id}/items", response_model=StreamItems)
+def get_stream_items(stream_id: str, after: int = -1, limit: int = 100) -> StreamItems:
+    """Activities and alerts with a sequence number greater than ``after``."""
+    session = live.get(stream_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Stream not found")
+    items = session.items_after(after, limit=max(1, min(limit, 1000)))
+    return StreamItems(
+        stream_id=stream_id,
+        items=[StreamItem(**item.to_dict()) for item in items],
+        next_after=items[-1].seq if items else after,
+    )
+
+
+@app.get("/streams/{stream_id}/narrative", response_model=StreamNarrative)
+def get_stream_narrative(stream_id: str) -> StreamNarrative:
+    """The stream's narrative so far, plus a summary per closed time window."""
+    session = live.get(stream_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Stream not found")
+    return StreamNarrative(
+        stream_id=stream_id,
+        narrative=session.summarizer.narrative(),
+        windows=session.summarizer.window_summaries(),
+    )
+
+
+@app.delete("/streams/{stream_id}", response_model=StreamStatus)
+async def stop_stream(stream_id: str) -> StreamStatus:
+    session = await run_in_threadpool(live.remove, stream_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Stream not found")
+    return StreamStatus(**session.to_dict())
+
+
+def _subscribe_job(job_id: str) -> Subscription:
+    """
+    Subscribe to a job's topic. A job that has already finished gets its
+    final status and ``end`` straight away.
+    """
+    subscription = push_hub.subscribe(job_topic(job_id))
+    record = jobs.get(job_id)
+    if record is None:
+        push_hub.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found or expired")
+    if record["status"] in ("completed", "failed"):
+        record.pop("result", None)
+        subscription.offer(PushMessage.build(-1, "status", record))
+        subscription.offer(PushMessage.build(-1, "end", {"topic": subscription.topic}))
+        subscription.close()
+    return subscription
+
+
+async def _sse_stream(subscription: Subscription) -> AsyncIterator[bytes]:
+    try:
+        yield b"retry: 3000\n\n"
+        async for message in subscription.messages(push_hub.keepalive_seconds):
+            yield message.sse if message is not None else b": keepalive\n\n"
+    finally:
+        push_hub.unsubscribe(subscription)
+
+
+def _sse_response(subscription: Subscription) -> StreamingResponse:
+    return StreamingResponse(
+        _sse_stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _serve_websocket(websocket: WebSocket, subscription: Subscription) -> None:
+    async def watch_disconnect() -> None:
+        # Clients only listen; a receive returning means they went away.
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+        subscription.close()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        async for message in subscription.messages(push_hub.keepalive_seconds):
+            await websocket.send_text(message.payload if message is not None else '{"kind":"keepalive"}')
+        await websocket.close()
+    except Exception:
+        pass  # client disconnected mid-send
+    finally:
+        watcher.cancel()
+        push_hub.unsubscribe(subscription)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str) -> StreamingResponse:
+    """
+    Server-sent events for a job: ``status`` on every stage change, then
+    the result's ``activity`` and ``alert`` events and ``end``. The same
+    messages are available over a WebSocket on this path.
+    """
+    return _sse_response(_subscribe_job(job_id))
+
+
+@app.websocket("/jobs/{job_id}/events")
+async def job_events_ws(websocket: WebSocket, job_id: str) -> None:
+    await websocket.accept()
+    try:
+        subscription = _subscribe_job(job_id)
+    except HTTPException as e:
+        await websocket.close(code=4000 + e.status_code, reason=str(e.detail))
+        return
+    await _serve_websocket(websocket, subscription)
+
+
+@app.get("/cameras/{camera_id}/events")
+async def camera_events(camera_id: str) -> StreamingResponse:
+    """
+    Server-sent ``activity`` and ``alert`` events from the live streams of
+    ``camera_id`` (see ``POST /streams``), as they are produced. The same
+    messages are available over a WebSocket on this path.
+    """
+    return _sse_response(push_hub.subscribe(camera_topic(camera_id)))
+
+
+@app.websocket("/cameras/{camera_id}/events")
+async def camera_events_ws(websocket: WebSocket, camera_id: str) -> None:
+    await websocket.accept()
+    try:
+        subscription = push_hub.subscribe(camera_topic(camera_id))
+    except HTTPException as e:
+        await websocket.close(code=4000 + e.status_code, reason=str(e.detail))
+        return
+    await _serve_websocket(websocket, subscription)
+
+
+async def _save_upload(file: UploadFile) -> Tuple[str, UploadResult]:
+    """
+    Stream ``file`` into a fresh temp directory so OpenCV / other libs can
+    read it. Returns the directory (owned by the caller) and upload info.
     """
     if not file.filename:
         raise HTTPException(status_code=400, detail="Uploaded file has no filename.")
 
-    # Persist upload to a temp file so OpenCV / other libs can read it.
     tmp_dir = tempfile.mkdtemp(prefix="cctv_")
-    tmp_path = os.path.join(tmp_dir, file.filename or "uploaded_video")
+    tmp_path = os.path.join(tmp_dir, os.path.basename(file.filename) or "uploaded_video")
 
     try:
         logger.info(f"Received video upload: {file.filename} ({file.size or 'unknown'} bytes)")
-        
-        # Read and save the uploaded file
-        with open(tmp_path, "wb") as buffer:
-            content = await file.read()
-            if not content:
-                raise HTTPException(status_code=400, detail="Uploaded file is empty")
-            buffer.write(content)
-            logger.info(f"Saved video to temporary file: {tmp_path}")
-
-        # Check if file exists and has content
-        if not os.path.exists(tmp_path):
-            raise HTTPException(status_code=500, detail=f"Failed to save uploaded file to {tmp_path}")
-        
-        file_size = os.path.getsize(tmp_path)
-        if file_size == 0:
-            raise HTTPException(status_code=400, detail="Uploaded file is empty")
-        
-        logger.info(f"Video file size: {file_size} bytes")
-
-        # Extract video metadata
-        try:
-            metadata = extract_video_metadata(tmp_path)
-            logger.info(f"Video metadata: duration={metadata.duration_seconds}s, fps={metadata.fps}, frames={metadata.frame_count}")
-        except Exception as e:
-            logger.error(f"Failed to extract video metadata: {e}")
-            raise HTTPException(status_code=400, detail=f"Invalid video file or unsupported format: {str(e)}")
-
-        # Step 1: run YOLO-style detection stub (returns coarse detection events)
-        try:
-            detection_events = run_yolo_stub_detection(
-                video_path=tmp_path,
-                duration_seconds=metadata.duration_seconds,
-            )
-            logger.info(f"Generated {len(detection_events)} detection events")
-        except Exception as e:
-            logger.error(f"Detection failed: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to run detection: {str(e)}")
-
-        # Step 2: build activity timeline (LSTM-style high level activities)
-        try:
-            activities = build_activity_timeline(
-                detection_events=detection_events,
-                duration_seconds=metadata.duration_seconds,
-            )
-            logger.info(f"Generated {len(activities)} activities")
-        except Exception as e:
-            logger.error(f"Activity recognition failed: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to build activity timeline: {str(e)}")
 
-        # Step 3: generate narrative summary (LLM-style)
-        try:
-            narrative = generate_narrative_summary(
-                activities=activities,
-                duration_seconds=metadata.duration_seconds,
-            )
-            logger.info(f"Generated narrative summary ({len(narrative)} characters)")
-        except Exception as e:
-            logger.error(f"Summarization failed: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to generate narrative: {str(e)}")
-
-        # Step 4: risk level + alerts
-        try:
-            risk_level, alerts = assess_risk_and_alerts(activities)
-            logger.info(f"Risk level: {risk_level}, Alerts: {len(alerts)}")
-        except Exception as e:
-            logger.error(f"Risk assessment failed: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to assess risk: {str(e)}")
-
-        # Adapt to response models
-        activity_models = [
-            Activity(
-                timestamp=a.timestamp,
-                label=a.label,
-                type=a.type,
-                confidence=a.confidence,
-            )
-            for a in activities
-        ]
-
-        alert_models = [
-            Alert(
-                id=alert.id,
-                title=alert.title,
-                message=alert.message,
-                severity=alert.severity,
-                timestamp=alert.timestamp,
-                is_new=alert.is_new,
-            )
-            for alert in alerts
-        ]
-
-        logger.info("Analysis complete, returning results")
-        return AnalysisResponse(
-            video_duration_seconds=metadata.duration_seconds,
-            activities=activity_models,
-            narrative_summary=narrative,
-            risk_level=risk_level,
-            alerts=alert_models,
+        # Stream the upload to disk in chunks, hashing it on the way
+        upload = await stream_upload_to_disk(
+            file,
+            tmp_path,
+            max_bytes=settings.max_upload_bytes,
+            chunk_size=settings.upload_chunk_bytes,
         )
-
-    except Exception as e:
-        logger.error(f"Analysis error: {e}", exc_info=True)
+        logger.info(
+            f"Saved video to temporary file: {tmp_path} "
+            f"({upload.size_bytes} bytes, sha256={upload.sha256}, peak buffer={upload.peak_buffer_bytes} bytes)"
+        )
+    except Exception:
+        _cleanup(tmp_dir)
         raise
-    finally:
-        try:
-            if os.path.exists(tmp_dir):
-                shutil.rmtree(tmp_dir)
-                logger.info(f"Cleaned up temporary directory: {tmp_dir}")
-        except Exception as cleanup_err:
-            logger.warning(f"Failed to cleanup temp directory: {cleanup_err}")
+    return tmp_dir, upload
+
+
+def _cleanup(tmp_dir: str) -> None:
+    try:
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+            logger.info(f"Cleaned up temporary directory: {tmp_dir}")
+    except Exception as cleanup_err:
+        logger.warning(f"Failed to cleanup temp directory: {cleanup_err}")
 
 
 if __name__ == "__main__":
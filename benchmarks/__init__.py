@@ -0,0 +1 @@
+# Benchmarks for pipeline components (run as python -m benchmarks.<name>)
@@ -0,0 +1,151 @@
+"""
+Benchmark for the columnar event and activity tables.
+
+Builds a synthetic timeline of N activities and compares three
+representations: a list of plain (dict-backed) dataclasses with ``mm:ss``
+string timestamps, as activities used to be stored; a list of the current
+slotted ``ActivityItem``; and an ``ActivityTable``. For each it reports the
+memory per million activities (tracemalloc) and the time to sort
+chronologically, filter warning/danger activities in a time range and
+count activities per one-minute window and type. The same is reported
+for detection events as ``DetectionEvent`` lists and an ``EventTable``.
+
+    python -m benchmarks.events [--events 1000000] [--labels 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Tuple
+
+from detection.event_table import EventTable
+from detection.yolo_pipeline import DetectionEvent
+from recognition.activity_recognition import ActivityItem, ActivityTable, format_timestamp
+from recognition.rules import ACTIVITY_TYPES
+
+WINDOW_SECONDS = 60.0
+
+
+@dataclass
+class LegacyActivity:
+    """An activity as it was stored before: no slots, preformatted timestamp."""
+
+    timestamp: str
+    label: str
+    type: str
+    confidence: float
+
+
+def measure(build: Callable[[], object]) -> Tuple[object, int]:
+    """Build an object and return it with the bytes allocated for it."""
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+
+def timed(fn: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--labels", type=int, default=50)
+    parser.add_argument("--hours", type=float, default=24.0, help="time span the events are spread over")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    n = args.events
+    span = args.hours * 3600.0
+    label_names = [f"Synthetic activity {i}" for i in range(args.labels)]
+    times = [rng.random() * span for _ in range(n)]
+    labels = [rng.choice(label_names) for _ in range(n)]
+    types = [rng.choice(ACTIVITY_TYPES) for _ in range(n)]
+    confidences = [rng.random() for _ in range(n)]
+    since, until = span * 0.25, span * 0.5
+
+    legacy, legacy_bytes = measure(
+        lambda: [LegacyActivity(format_timestamp(t), l, ty, c) for t, l, ty, c in zip(times, labels, types, confidences)]
+    )
+    items, items_bytes = measure(
+        lambda: [ActivityItem(t, l, ty, c) for t, l, ty, c in zip(times, labels, types, confidences)]
+    )
+    table, table_bytes = measure(lambda: ActivityTable.from_items(items))
+
+    def parse(ts: str) -> float:
+        m, s = ts.split(":")
+        return int(m) * 60 + int(s)
+
+    def window_counts_objects(activities: list, seconds: Callable) -> Counter:
+        return Counter((int(seconds(a) // WINDOW_SECONDS), a.type) for a in activities)
+
+    results = [
+        (
+            "legacy dataclass list",
+            legacy_bytes,
+            # The string key is what the timeline used to sort by (wrong past 99 minutes).
+            lambda: sorted(legacy, key=lambda a: a.timestamp),
+            lambda: [
+                a for a in legacy if a.type in ("warning", "danger") and since <= parse(a.timestamp) < until
+            ],
+            lambda: window_counts_objects(legacy, lambda a: parse(a.timestamp)),
+        ),
+        (
+            "slotted ActivityItem list",
+            items_bytes,
+            lambda: sorted(items, key=lambda a: a.time_seconds),
+            lambda: [a for a in items if a.type in ("warning", "danger") and since <= a.time_seconds < until],
+            lambda: window_counts_objects(items, lambda a: a.time_seconds),
+        ),
+        (
+            "ActivityTable",
+            table_bytes,
+            lambda: table.sorted(),
+            lambda: table.select(types=("warning", "danger"), since=since, until=until),
+            lambda: table.window_counts(WINDOW_SECONDS),
+        ),
+    ]
+
+    per_million = 1_000_000 / n
+    print(f"{n} activities, {args.labels} labels over {args.hours:g} h")
+    print(f"{'representation':<28} {'MB/1M':>8} {'sort ms':>9} {'filter ms':>10} {'windows ms':>11}")
+    for name, nbytes, sort, select, windows in results:
+        print(
+            f"{name:<28} {nbytes * per_million / 1e6:>8.1f} {timed(sort):>9.1f} "
+            f"{timed(select):>10.1f} {timed(windows):>11.1f}"
+        )
+
+    events, events_bytes = measure(
+        lambda: [DetectionEvent(t, l, c, t + 5.0, i) for i, (t, l, c) in enumerate(zip(times, labels, confidences))]
+    )
+    event_table, event_table_bytes = measure(lambda: EventTable.from_events(events))
+    print()
+    print(f"{'representation':<28} {'MB/1M':>8} {'sort ms':>9} {'filter ms':>10}")
+    for name, nbytes, sort, select in (
+        (
+            "DetectionEvent list",
+            events_bytes,
+            lambda: sorted(events, key=lambda e: (e.time_seconds, e.track_id)),
+            lambda: [e for e in events if since <= e.time_seconds < until and e.confidence >= 0.5],
+        ),
+        (
+            "EventTable",
+            event_table_bytes,
+            lambda: event_table.sorted(),
+            lambda: event_table.select(since=since, until=until, min_confidence=0.5),
+        ),
+    ):
+        print(f"{name:<28} {nbytes * per_million / 1e6:>8.1f} {timed(sort):>9.1f} {timed(select):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark for the SQLite incident store.
+
+Fills a fresh database with synthetic activities and alerts through the
+batching writer (measuring sustained inserts/second), then times the
+query shapes the dashboard uses against it: one camera's recent history,
+critical alerts on a camera over a week, a label over a day, and paging
+deep into a result with the cursor.
+
+    python -m benchmarks.incidents [--rows 1000000] [--cameras 50] [--db /tmp/incidents.sqlite3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Callable, List
+
+from service.incidents import IncidentStore
+
+LABELS = (
+    "Person enters building", "Loitering near entrance", "Unauthorized access attempt",
+    "Suspicious object left", "Vehicle parked", "Person exits building",
+)
+SEVERITIES = {"activity": ("normal", "warning", "danger"), "alert": ("warning", "critical")}
+WEEK = 7 * 86400.0
+
+
+def synthetic_rows(count: int, cameras: int, end: float, span: float, rng: random.Random) -> List[tuple]:
+    """Rows in arrival (time) order, as a live system inserts them."""
+    rows = []
+    for _ in range(count):
+        kind = "alert" if rng.random() < 0.2 else "activity"
+        rows.append(
+            (
+                end - rng.random() * span,
+                f"cam{rng.randrange(cameras)}",
+                kind,
+                rng.choice(LABELS),
+                rng.choice(SEVERITIES[kind]),
+                rng.random() if kind == "activity" else None,
+                None,
+                "job",
+                None,
+            )
+        )
+    rows.sort(key=lambda row: row[0])
+    return rows
+
+
+def timed(fn: Callable[[], object], repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1e3)
+    times.sort()
+    return {"p50_ms": statistics.median(times), "max_ms": times[-1]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--cameras", type=int, default=50)
+    parser.add_argument("--days", type=float, default=90.0, help="time span the rows are spread over")
+    parser.add_argument("--chunk", type=int, default=200, help="rows per record() call (one analysis' worth)")
+    parser.add_argument("--db", default="", help="database file (default: a temporary file)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="incidents-bench-"), "incidents.sqlite3")
+    rng = random.Random(0)
+    now = time.time()
+    rows = synthetic_rows(args.rows, args.cameras, now, args.days * 86400.0, rng)
+
+    store = IncidentStore(path)
+    started = time.perf_counter()
+    for start in range(0, len(rows), args.chunk):
+        store.record(rows[start:start + args.chunk])
+    store.flush()
+    elapsed = time.perf_counter() - started
+    print(f"inserted {args.rows} rows in {elapsed:.2f}s ({args.rows / elapsed:,.0f} rows/s) -> {path}")
+
+    def deep_page() -> None:
+        cursor = None
+        for _ in range(20):
+            _, cursor = store.query(camera="cam7", limit=100, cursor=cursor)
+
+    queries = {
+        "camera, latest 100": lambda: store.query(camera="cam7", limit=100),
+        "critical alerts on camera, last week": lambda: store.query(
+            camera="cam7", kind="alert", severity="critical", since=now - WEEK, limit=100
+        ),
+        "label, last day": lambda: store.query(label="Unauthorized access attempt", since=now - 86400.0, limit=100),
+        "all critical, latest 100": lambda: store.query(severity="critical", limit=100),
+        "camera, 20 pages of 100": deep_page,
+    }
+    print(f"{'query':<40} {'p50 ms':>8} {'max ms':>8}")
+    for name, fn in queries.items():
+        r = timed(fn, args.repeat)
+        print(f"{name:<40} {r['p50_ms']:>8.2f} {r['max_ms']:>8.2f}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
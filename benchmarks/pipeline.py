@@ -0,0 +1,370 @@
+"""
+End-to-end pipeline benchmark.
+
+Generates synthetic clips (see ``benchmarks.synthetic_video``), then
+
+1. times each pipeline stage in-process with the service's configuration
+   (``CCTV_*`` environment variables): metadata, decode (sampling frames
+   at the detector's rate and size), detection, timeline, narrative and
+   risk, over ``--repeat`` runs per clip;
+2. measures ``POST /analyze-video`` latency percentiles and throughput at
+   each ``--concurrency`` level against ``app.py``: a server started
+   in-process on a free port (result cache disabled, so every request
+   runs the pipeline), or an already running one given with ``--url``
+   (distinct clips are cycled, but a server with its result cache on
+   will answer repeats from it).
+
+Results are printed and, with ``--output``, written as JSON. Pass an
+earlier JSON file as ``--baseline`` to compare: every metric is shown
+with its change, and the exit status is 1 if any got worse by more than
+``--tolerance``.
+
+    python -m benchmarks.pipeline [--seconds 60] [--width 1280] [--height 720] [--fps 15]
+        [--motion-density 0.3] [--videos 4] [--repeat 3] [--concurrency 1 4 8] [--requests 16]
+        [--url http://localhost:8000] [--output results.json] [--baseline old.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic_video import SyntheticVideo, generate_video
+
+STAGES = ("metadata", "decode", "detection", "timeline", "narrative", "risk", "total")
+
+# Latency changes smaller than this are noise, whatever their relative size.
+NOISE_FLOOR_MS = 1.0
+
+
+def percentiles(values: Sequence[float]) -> dict:
+    if not values:
+        return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0, "mean": 0.0}
+    data = np.asarray(values, dtype=np.float64)
+    p50, p90, p99 = np.percentile(data, [50, 90, 99])
+    return {
+        "p50": float(p50),
+        "p90": float(p90),
+        "p99": float(p99),
+        "max": float(data.max()),
+        "mean": float(data.mean()),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "git_commit": _git_commit(),
+    }
+
+
+# -- per-stage timing ----------------------------------------------------------
+
+
+def time_stages(videos: Sequence[SyntheticVideo], repeat: int) -> dict:
+    from preprocessing.video import extract_video_metadata, iter_frame_batches
+    from service.analysis import (
+        PipelineOptions,
+        run_detection_stage,
+        run_narrative_stage,
+        run_risk_stage,
+        run_timeline_stage,
+    )
+    from service.settings import Settings
+
+    options = PipelineOptions.from_settings(Settings.from_env())
+    timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+
+    def timed(stage: str, fn: Callable, *args, **kwargs):
+        started = time.perf_counter()
+        value = fn(*args, **kwargs)
+        elapsed = (time.perf_counter() - started) * 1e3
+        timings[stage].append(elapsed)
+        return value, elapsed
+
+    def decode(path: str) -> int:
+        frames = 0
+        for batch in iter_frame_batches(
+            path, target_fps=options.detector.sample_fps, frame_size=options.detector.input_size
+        ):
+            frames += len(batch.timestamps)
+        return frames
+
+    for run in range(repeat):
+        for video in videos:
+            total = 0.0
+            metadata, ms = timed("metadata", extract_video_metadata, video.path)
+            total += ms
+            _, ms = timed("decode", decode, video.path)
+            total += ms
+            (events, _, _), ms = timed("detection", run_detection_stage, video.path, metadata, options)
+            total += ms
+            activities, ms = timed("timeline", run_timeline_stage, events, metadata.duration_seconds, options)
+            total += ms
+            _, ms = timed(
+                "narrative", run_narrative_stage, activities, metadata.duration_seconds, options.summarizer
+            )
+            total += ms
+            _, ms = timed("risk", run_risk_stage, activities, options.rules_path)
+            total += ms
+            timings["total"].append(total)
+        print(f"  stage run {run + 1}/{repeat} done", file=sys.stderr)
+
+    return {
+        "detector": options.detector.backend,
+        "motion_gating": options.motion_gating,
+        "stages_ms": {stage: percentiles(values) for stage, values in timings.items()},
+    }
+
+
+# -- load against the HTTP service ---------------------------------------------
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server() -> Tuple[str, Callable[[], None]]:
+    """Run ``app.py`` with uvicorn in a background thread; returns its URL and a stop function."""
+    import uvicorn
+
+    # Every request must run the pipeline, not hit the result cache.
+    os.environ["CCTV_CACHE_MEMORY_BYTES"] = "0"
+    os.environ["CCTV_CACHE_DIR"] = ""
+    from app import app
+
+    # The service logs every request at INFO; keep the report readable.
+    logging.getLogger().setLevel(logging.WARNING)
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="benchmark-server", daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 120.0
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError("The benchmark server did not start")
+        time.sleep(0.05)
+
+    def stop() -> None:
+        server.should_exit = True
+        thread.join(30.0)
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+async def _load(url: str, videos: Sequence[SyntheticVideo], concurrency: int, requests: int) -> dict:
+    import httpx
+
+    payloads = []
+    for video in videos:
+        with open(video.path, "rb") as f:
+            payloads.append((os.path.basename(video.path), f.read(), video.seconds))
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    video_seconds = 0.0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(client: httpx.AsyncClient, i: int) -> None:
+        nonlocal video_seconds
+        name, data, seconds = payloads[i % len(payloads)]
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"{url}/analyze-video", files={"file": (name, data, "video/mp4")})
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - started) * 1e3
+        statuses[status] += 1
+        if status == "200":
+            latencies.append(elapsed)
+            video_seconds += seconds
+
+    async with httpx.AsyncClient(timeout=600.0) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(requests)))
+        wall = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": statuses.get("200", 0),
+        "statuses": dict(statuses),
+        "wall_seconds": wall,
+        "throughput_rps": len(latencies) / wall,
+        "video_seconds_per_second": video_seconds / wall,
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def run_load(url: str, videos: Sequence[SyntheticVideo], levels: Sequence[int], requests: int) -> List[dict]:
+    results = []
+    for concurrency in levels:
+        result = asyncio.run(_load(url, videos, concurrency, max(requests, concurrency)))
+        print(f"  concurrency {concurrency} done", file=sys.stderr)
+        results.append(result)
+    return results
+
+
+# -- reporting -------------------------------------------------------------------
+
+
+def metrics(results: dict) -> Dict[str, Tuple[float, bool]]:
+    """Flat metric name -> (value, higher is better)."""
+    flat: Dict[str, Tuple[float, bool]] = {}
+    for stage, values in results.get("stages", {}).get("stages_ms", {}).items():
+        flat[f"stage.{stage}.p50_ms"] = (values["p50"], False)
+    for level in results.get("load", []):
+        prefix = f"load.c{level['concurrency']}"
+        flat[f"{prefix}.p50_ms"] = (level["latency_ms"]["p50"], False)
+        flat[f"{prefix}.p99_ms"] = (level["latency_ms"]["p99"], False)
+        flat[f"{prefix}.throughput_rps"] = (level["throughput_rps"], True)
+    return flat
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    tolerance: float,
+    flatten: Callable[[dict], Dict[str, Tuple[float, bool]]] = metrics,
+) -> bool:
+    """Print every shared metric with its change; False if any regressed beyond ``tolerance``."""
+    old, new = flatten(baseline), flatten(current)
+    ok = True
+    print(f"{'metric':<34} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, (value, higher_is_better) in new.items():
+        if name not in old:
+            continue
+        before = old[name][0]
+        change = (value - before) / before if before else 0.0
+        worse = -change if higher_is_better else change
+        if not higher_is_better and value - before < NOISE_FLOOR_MS:
+            worse = 0.0
+        flag = ""
+        if worse > tolerance:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{name:<34} {before:>10.2f} {value:>10.2f} {change:>+7.1%}{flag}")
+    return ok
+
+
+def report(results: dict) -> None:
+    stages = results.get("stages")
+    if stages:
+        print(f"\nstages ({stages['detector']} detector, ms per clip)")
+        print(f"{'stage':<12} {'p50':>9} {'p90':>9} {'max':>9}")
+        for stage, values in stages["stages_ms"].items():
+            print(f"{stage:<12} {values['p50']:>9.1f} {values['p90']:>9.1f} {values['max']:>9.1f}")
+    if results.get("load"):
+        print("\nPOST /analyze-video")
+        print(f"{'conc':>5} {'ok':>5} {'req/s':>7} {'video s/s':>10} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+        for level in results["load"]:
+            latency = level["latency_ms"]
+            print(
+                f"{level['concurrency']:>5} {level['ok']:>5} {level['throughput_rps']:>7.2f} "
+                f"{level['video_seconds_per_second']:>10.1f} {latency['p50']:>9.1f} {latency['p90']:>9.1f} "
+                f"{latency['p99']:>9.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=60.0, help="length of each synthetic clip")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument("--motion-density", type=float, default=0.3)
+    parser.add_argument("--videos", type=int, default=4, help="distinct clips (different seeds)")
+    parser.add_argument("--video-dir", default="", help="where to write the clips (default: a temporary directory)")
+    parser.add_argument("--repeat", type=int, default=3, help="in-process stage runs per clip (0 skips)")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 4, 8], help="load levels (none skips)")
+    parser.add_argument("--requests", type=int, default=16, help="requests per load level")
+    parser.add_argument("--url", default="", help="benchmark a running server instead of starting one")
+    parser.add_argument("--output", default="", help="write the results as JSON")
+    parser.add_argument("--baseline", default="", help="earlier JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression per metric")
+    args = parser.parse_args()
+
+    video_dir = args.video_dir or tempfile.mkdtemp(prefix="cctv-bench-")
+    os.makedirs(video_dir, exist_ok=True)
+    videos = []
+    for seed in range(args.videos):
+        path = os.path.join(
+            video_dir,
+            f"synthetic-{args.width}x{args.height}-{args.fps:g}fps-{args.seconds:g}s"
+            f"-m{args.motion_density:g}-{seed}.mp4",
+        )
+        videos.append(
+            generate_video(
+                path,
+                seconds=args.seconds,
+                width=args.width,
+                height=args.height,
+                fps=args.fps,
+                motion_density=args.motion_density,
+                seed=seed,
+            )
+        )
+    print(f"generated {len(videos)} clips in {video_dir}", file=sys.stderr)
+
+    results: dict = {
+        "benchmark": "pipeline",
+        "created_at": time.time(),
+        "environment": environment(),
+        "videos": [video.to_dict() for video in videos],
+    }
+    if args.repeat > 0:
+        results["stages"] = time_stages(videos, args.repeat)
+    if args.concurrency:
+        url, stop = (args.url.rstrip("/"), lambda: None) if args.url else start_server()
+        try:
+            results["load"] = run_load(url, videos, args.concurrency, args.requests)
+        finally:
+            stop()
+
+    report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nwrote {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print()
+        if not compare(baseline, results, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Microbenchmark for the compiled label rule engine.
+
+Builds synthetic rule sets of growing size and measures the per-event
+classification cost for a fixed label taxonomy (the steady state: every
+label already in the lookup table) and for labels seen for the first time
+(one scan of the combined pattern). The steady-state cost should stay
+flat as the number of rules grows.
+
+    python -m benchmarks.rules [--rules 10 100 1000] [--events 200000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import List
+
+from recognition.rules import RuleSet
+
+
+def synthetic_rules(count: int) -> dict:
+    return {
+        "default_type": "normal",
+        "rules": [
+            {
+                "name": f"rule{i}",
+                "patterns": [f"activity{i:05d}", f"alias{i:05d}"],
+                "type": ("normal", "warning", "danger")[i % 3],
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def synthetic_labels(rule_count: int, taxonomy: int, rng: random.Random) -> List[str]:
+    # Half the labels hit a rule somewhere in the set, half match nothing.
+    labels = [f"Person activity{rng.randrange(rule_count):05d} near door" for _ in range(taxonomy // 2)]
+    labels += [f"Unlisted event {i}" for i in range(taxonomy - len(labels))]
+    return labels
+
+
+def bench(rule_count: int, events: int, taxonomy: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    rules = RuleSet.from_dict(synthetic_rules(rule_count))
+    compile_seconds = time.perf_counter() - started
+
+    labels = synthetic_labels(rule_count, taxonomy, rng)
+    started = time.perf_counter()
+    for label in labels:
+        rules.activity_type(label)
+    cold_seconds = time.perf_counter() - started
+
+    stream = [rng.choice(labels) for _ in range(events)]
+    started = time.perf_counter()
+    for label in stream:
+        rules.activity_type(label)
+    warm_seconds = time.perf_counter() - started
+
+    return {
+        "rules": rule_count,
+        "compile_ms": compile_seconds * 1e3,
+        "first_sight_us_per_label": cold_seconds / len(labels) * 1e6,
+        "steady_ns_per_event": warm_seconds / events * 1e9,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--taxonomy", type=int, default=500, help="distinct labels in the event stream")
+    args = parser.parse_args()
+
+    print(f"{'rules':>7} {'compile ms':>11} {'first sight us/label':>21} {'steady ns/event':>16}")
+    for count in args.rules:
+        r = bench(count, args.events, args.taxonomy)
+        print(
+            f"{r['rules']:>7} {r['compile_ms']:>11.2f} "
+            f"{r['first_sight_us_per_label']:>21.2f} {r['steady_ns_per_event']:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
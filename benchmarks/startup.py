@@ -0,0 +1,256 @@
+"""
+Cold-start benchmark.
+
+Starts the service from scratch ``--repeat`` times per configuration,
+each in a fresh interpreter with the current ``CCTV_*`` settings (result
+cache off), and measures from process start:
+
+- ``import``: importing ``app`` alone (a separate interpreter per run,
+  lazy model loading), and which model libraries that already loads;
+- ``health``: until ``GET /health`` answers, i.e. the server accepts
+  connections;
+- ``ready``: until ``GET /ready`` answers 200 (every worker ready, for a
+  pre-forked server);
+- ``first``: latency of the first ``POST /analyze-video`` once ready,
+  and ``warm``: of the one after it;
+- the memory of the server's process tree once warm (summed PSS, Linux
+  only), which shows what pre-forking shares.
+
+Configurations: one uvicorn process per ``--modes`` entry
+(``CCTV_MODEL_LOADING``), and ``service.server`` with ``--workers``
+workers, with and without preloading, in ``eager`` mode. Results are
+printed and, with ``--output``, written as JSON; ``--baseline`` compares
+like ``benchmarks.pipeline``.
+
+    python -m benchmarks.startup [--modes eager background lazy] [--workers 2] [--repeat 3]
+        [--seconds 10] [--output results.json] [--baseline old.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from benchmarks.pipeline import _free_port, compare, environment, percentiles
+from benchmarks.synthetic_video import SyntheticVideo, generate_video
+
+MEASURES = ("health", "ready", "first", "warm")
+
+
+# Libraries only the models need; importing ``app`` should load none of them.
+HEAVY_MODULES = ("cv2", "onnxruntime", "torch", "transformers")
+
+
+def time_import(repeat: int) -> Tuple[dict, List[str]]:
+    """
+    Time ``import app`` with ``CCTV_MODEL_LOADING=lazy`` (nothing but the
+    import itself), and list the heavy libraries it loaded.
+    """
+    code = (
+        "import sys, time; t = time.perf_counter(); import app; seconds = time.perf_counter() - t; "
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules)); print(seconds)"
+    )
+    env = {**os.environ, "CCTV_MODEL_LOADING": "lazy"}
+    seconds = []
+    loaded: List[str] = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout
+        modules, elapsed = out.rstrip("\n").split("\n")[-2:]
+        loaded = modules.split()
+        seconds.append(float(elapsed) * 1e3)
+    return percentiles(seconds), loaded
+
+
+def _tree_pss_kb(pid: int) -> Optional[int]:
+    """Summed proportional set size of ``pid`` and its descendants, or None off Linux."""
+    total = 0
+    pending = [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/smaps_rollup", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        total += int(line.split()[1])
+                        break
+            with open(f"/proc/{current}/task/{current}/children", encoding="utf-8") as f:
+                pending.extend(int(child) for child in f.read().split())
+    except (FileNotFoundError, PermissionError):
+        return None
+    return total
+
+
+def _wait_until(deadline: float, check) -> None:
+    while not check():
+        if time.monotonic() > deadline:
+            raise RuntimeError("The server did not come up in time")
+        time.sleep(0.01)
+
+
+def start_once(command: List[str], env: Dict[str, str], url: str, video: SyntheticVideo, workers: int) -> dict:
+    """Start one server, take every measure, stop it; all times in ms from process start."""
+    import httpx
+
+    with open(video.path, "rb") as f:
+        payload = f.read()
+    client = httpx.Client(timeout=600.0)
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result: dict = {}
+    try:
+        deadline = time.monotonic() + 300.0
+        ready_pids: set = set()
+
+        def get(path: str) -> Optional[httpx.Response]:
+            if process.poll() is not None:
+                raise RuntimeError(f"The server exited with status {process.returncode}")
+            try:
+                # A new connection per poll, so a pre-forked server's workers all get asked.
+                return httpx.get(f"{url}{path}", timeout=5.0)
+            except httpx.HTTPError:
+                return None
+
+        def all_ready() -> bool:
+            response = get("/ready")
+            if response is not None and response.status_code == 200:
+                ready_pids.add(response.json()["pid"])
+            return len(ready_pids) >= workers
+
+        _wait_until(deadline, lambda: get("/health") is not None)
+        result["health"] = (time.perf_counter() - started) * 1e3
+        _wait_until(deadline, all_ready)
+        result["ready"] = (time.perf_counter() - started) * 1e3
+        for measure in ("first", "warm"):
+            request_started = time.perf_counter()
+            response = client.post(f"{url}/analyze-video", files={"file": ("clip.mp4", payload, "video/mp4")})
+            response.raise_for_status()
+            result[measure] = (time.perf_counter() - request_started) * 1e3
+        result["pss_kb"] = _tree_pss_kb(process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(30.0)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        client.close()
+    return result
+
+
+def run_config(
+    name: str,
+    command: List[str],
+    env: Dict[str, str],
+    url: str,
+    video: SyntheticVideo,
+    workers: int,
+    repeat: int,
+) -> dict:
+    runs = [start_once(command, env, url, video, workers) for _ in range(repeat)]
+    print(f"  {name} done", file=sys.stderr)
+    pss = [run["pss_kb"] for run in runs if run["pss_kb"] is not None]
+    return {
+        "name": name,
+        "workers": workers,
+        "ms": {measure: percentiles([run[measure] for run in runs]) for measure in MEASURES},
+        "pss_mb": max(pss) / 1024 if pss else None,
+    }
+
+
+def configurations(modes: Sequence[str], workers: int) -> List[Tuple[str, str, List[str], int]]:
+    """(name, CCTV_MODEL_LOADING, command with a {port} placeholder, workers)."""
+    configs = [
+        (f"uvicorn-{mode}", mode, [sys.executable, "-m", "uvicorn", "app:app", "--port", "{port}"], 1)
+        for mode in modes
+    ]
+    if workers > 0:
+        server = [sys.executable, "-m", "service.server", "--workers", str(workers), "--port", "{port}"]
+        configs.append((f"prefork-{workers}", "eager", server, workers))
+        configs.append((f"prefork-{workers}-no-preload", "eager", server + ["--no-preload"], workers))
+    return configs
+
+
+def metrics(results: dict) -> Dict[str, Tuple[float, bool]]:
+    flat: Dict[str, Tuple[float, bool]] = {}
+    if "import_ms" in results:
+        flat["import.p50_ms"] = (results["import_ms"]["p50"], False)
+    for config in results.get("configs", []):
+        for measure in MEASURES:
+            flat[f"{config['name']}.{measure}.p50_ms"] = (config["ms"][measure]["p50"], False)
+    return flat
+
+
+def report(results: dict) -> None:
+    heavy = ", ".join(results["import_heavy_modules"]) or "none"
+    print(f"\nimport app: {results['import_ms']['p50']:.0f} ms (p50), model libraries loaded: {heavy}")
+    print(f"\n{'config':<28} {'health ms':>10} {'ready ms':>10} {'first ms':>10} {'warm ms':>10} {'PSS MB':>8}")
+    for config in results["configs"]:
+        ms = config["ms"]
+        pss = f"{config['pss_mb']:.0f}" if config["pss_mb"] is not None else "-"
+        print(
+            f"{config['name']:<28} {ms['health']['p50']:>10.0f} {ms['ready']['p50']:>10.0f} "
+            f"{ms['first']['p50']:>10.0f} {ms['warm']['p50']:>10.0f} {pss:>8}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="*", default=["eager", "background", "lazy"], help="CCTV_MODEL_LOADING values")
+    parser.add_argument("--workers", type=int, default=2, help="workers of the pre-forked server (0 skips it)")
+    parser.add_argument("--repeat", type=int, default=3, help="cold starts per configuration")
+    parser.add_argument("--seconds", type=float, default=10.0, help="length of the synthetic clip analysed")
+    parser.add_argument("--output", default="", help="write the results as JSON")
+    parser.add_argument("--baseline", default="", help="earlier JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression per metric")
+    args = parser.parse_args()
+
+    video = generate_video(
+        os.path.join(tempfile.mkdtemp(prefix="cctv-bench-"), "startup.mp4"),
+        seconds=args.seconds,
+        width=640,
+        height=360,
+    )
+    env = {**os.environ, "CCTV_CACHE_MEMORY_BYTES": "0", "CCTV_CACHE_DIR": ""}
+    results: dict = {
+        "benchmark": "startup",
+        "created_at": time.time(),
+        "environment": environment(),
+        "video": video.to_dict(),
+        "configs": [],
+    }
+    results["import_ms"], results["import_heavy_modules"] = time_import(args.repeat)
+    for name, mode, command, workers in configurations(args.modes, args.workers):
+        port = _free_port()
+        command = [part.replace("{port}", str(port)) for part in command]
+        results["configs"].append(
+            run_config(
+                name,
+                command,
+                {**env, "CCTV_MODEL_LOADING": mode},
+                f"http://127.0.0.1:{port}",
+                video,
+                workers,
+                args.repeat,
+            )
+        )
+
+    report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nwrote {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print()
+        if not compare(baseline, results, args.tolerance, metrics):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+"""
+Pluggable detector backends.
+
+A ``Detector`` takes a batch of frames (N, H, W, 3) and returns boxes,
+class ids and scores for every frame. Backends are selected by
+``DetectorConfig.backend``:
+
+- ``stub``: no model; keeps today's synthetic template events
+  (see ``run_yolo_stub_detection``) so the demo stack runs anywhere.
+- ``onnx``: a YOLOv8-style ONNX export run on CPU with ONNX Runtime,
+  with configurable batch size and intra-/inter-op thread counts.
+
+``get_detector`` builds each configuration once per process and keeps
+it resident, so model load and warm-up are paid once per worker rather
+than once per request.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Protocol, Sequence, Set, Tuple
+
+import numpy as np
+
+from preprocessing.video import DecodeStats
+
+COCO_LABELS: Tuple[str, ...] = (
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat", "dog",
+    "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "backpack", "umbrella",
+    "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard", "sports ball", "kite",
+    "baseball bat", "baseball glove", "skateboard", "surfboard", "tennis racket", "bottle",
+    "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple", "sandwich", "orange",
+    "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair", "couch", "potted plant",
+    "bed", "dining table", "toilet", "tv", "laptop", "mouse", "remote", "keyboard", "cell phone",
+    "microwave", "oven", "toaster", "sink", "refrigerator", "book", "clock", "vase", "scissors",
+    "teddy bear", "hair drier", "toothbrush",
+)
+
+
+@dataclass
+class FrameDetections:
+    """Detections for one frame; boxes are (x1, y1, x2, y2) normalized to 0-1."""
+
+    time_seconds: float
+    boxes: np.ndarray  # (k, 4) float32
+    class_ids: np.ndarray  # (k,) int32
+    scores: np.ndarray  # (k,) float32
+
+
+@dataclass
+class DetectionStats:
+    frames: int = 0
+    batches: int = 0
+    detections: int = 0  # boxes returned, before tracking
+    inference_seconds: float = 0.0
+    threads: int = 1
+    batch_sizes: Dict[int, int] = field(default_factory=dict)  # frames per detector call -> calls
+    decode: DecodeStats = field(default_factory=DecodeStats)  # frames sampled for detection or gating
+
+    def add(self, other: "DetectionStats") -> None:
+        """Accumulate ``other`` (e.g. one shard's stats) into these."""
+        self.frames += other.frames
+        self.batches += other.batches
+        self.detections += other.detections
+        self.inference_seconds += other.inference_seconds
+        self.threads = other.threads
+        for size, count in other.batch_sizes.items():
+            self.batch_sizes[size] = self.batch_sizes.get(size, 0) + count
+        self.decode.frames_decoded += other.decode.frames_decoded
+        self.decode.frames_skipped += other.decode.frames_skipped
+        self.decode.seeks += other.decode.seeks
+        self.decode.batches += other.decode.batches
+        self.decode.decode_seconds += other.decode.decode_seconds
+
+    @property
+    def frames_per_second(self) -> float:
+        if self.inference_seconds <= 0:
+            return 0.0
+        return self.frames / self.inference_seconds
+
+    @property
+    def frames_per_second_per_core(self) -> float:
+        return self.frames_per_second / max(self.threads, 1)
+
+
+@dataclass(frozen=True)
+class DetectorConfig:
+    backend: str = "stub"  # "stub" | "onnx"
+    model_path: str = ""
+    labels_path: str = ""  # one label per line; COCO names if empty
+    batch_size: int = 8
+    input_size: Tuple[int, int] = (640, 640)  # (width, height)
+    intra_op_threads: int = 0  # 0 lets ONNX Runtime decide
+    inter_op_threads: int = 0
+    score_threshold: float = 0.35
+    iou_threshold: float = 0.45
+    sample_fps: float = 2.0
+    warmup_runs: int = 2
+
+
+class Detector(Protocol):
+    name: str
+    labels: Sequence[str]
+    batch_size: int
+    input_size: Tuple[int, int]
+    # False for backends that synthesize events without looking at frames.
+    needs_frames: bool
+    threads: int
+
+    def warmup(self) -> None: ...
+
+    def detect(self, frames: np.ndarray, timestamps: np.ndarray) -> List[FrameDetections]: ...
+
+
+def _empty_detections(time_seconds: float) -> FrameDetections:
+    return FrameDetections(
+        time_seconds=time_seconds,
+        boxes=np.zeros((0, 4), dtype=np.float32),
+        class_ids=np.zeros(0, dtype=np.int32),
+        scores=np.zeros(0, dtype=np.float32),
+    )
+
+
+class StubDetector:
+    """
+    Model-free backend. ``needs_frames`` is False, so the detection entry
+    point keeps using the synthetic template events and never decodes.
+    """
+
+    name = "stub"
+    needs_frames = False
+    threads = 1
+
+    def __init__(self, config: DetectorConfig) -> None:
+        self.labels: Sequence[str] = ()
+        self.batch_size = config.batch_size
+        self.input_size = config.input_size
+
+    def warmup(self) -> None:
+        return None
+
+    def detect(self, frames: np.ndarray, timestamps: np.ndarray) -> List[FrameDetections]:
+        return [_empty_detections(float(t)) for t in timestamps]
+
+
+class OnnxDetector:
+    """
+    YOLOv8-style ONNX model on the CPU execution provider.
+
+    Expects input (N, 3, H, W) float32 RGB in [0, 1] and output
+    (N, 4 + num_classes, anchors) with (cx, cy, w, h) boxes in input
+    pixels, which is what ``yolo export format=onnx`` produces.
+    """
+
+    name = "onnx"
+    needs_frames = True
+
+    def __init__(self, config: DetectorConfig) -> None:
+        import cv2
+
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                "The 'onnx' detector backend requires onnxruntime: pip install onnxruntime"
+            ) from e
+        if not config.model_path:
+            raise ValueError("The 'onnx' detector backend needs a model path (CCTV_DETECTOR_MODEL)")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if config.intra_op_threads > 0:
+            options.intra_op_num_threads = config.intra_op_threads
+        if config.inter_op_threads > 0:
+            options.inter_op_num_threads = config.inter_op_threads
+
+        self.config = config
+        self.session = ort.InferenceSession(config.model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self._input_name = model_input.name
+        # Models exported with a static batch dimension can only take that many frames per run.
+        static_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+        self._static_batch = static_batch is not None
+        self.batch_size = static_batch or max(1, config.batch_size)
+        self.input_size = config.input_size
+        self._nms = cv2.dnn.NMSBoxesBatched
+        self.threads = config.intra_op_threads or cv2.getNumberOfCPUs()
+        self.labels = _load_labels(config.labels_path)
+        width, height = config.input_size
+        self._input = np.empty((self.batch_size, 3, height, width), dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def warmup(self) -> None:
+        self._input.fill(0.0)
+        for _ in range(max(1, self.config.warmup_runs)):
+            self.session.run(None, {self._input_name: self._input})
+
+    def detect(self, frames: np.ndarray, timestamps: np.ndarray) -> List[FrameDetections]:
+        results: List[FrameDetections] = []
+        # The input buffer is shared, so one batch at a time per detector.
+        with self._lock:
+            for start in range(0, len(frames), self.batch_size):
+                chunk = frames[start:start + self.batch_size]
+                n = len(chunk)
+                # NHWC -> NCHW into the preallocated input buffer.
+                np.copyto(self._input[:n], chunk.transpose(0, 3, 1, 2), casting="unsafe")
+                feed = self._input if self._static_batch else self._input[:n]
+                (output,) = self.session.run(None, {self._input_name: feed})[:1]
+                for i in range(n):
+                    results.append(self._postprocess(output[i], float(timestamps[start + i])))
+        return results
+
+    def _postprocess(self, prediction: np.ndarray, time_seconds: float) -> FrameDetections:
+        # (4 + C, A) -> (A, 4 + C)
+        prediction = prediction.T
+        class_scores = prediction[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        keep = scores >= self.config.score_threshold
+        if not keep.any():
+            return _empty_detections(time_seconds)
+
+        xywh = prediction[keep, :4]
+        scores = scores[keep].astype(np.float32)
+        class_ids = class_ids[keep].astype(np.int32)
+        top_left = xywh[:, :2] - xywh[:, 2:] / 2.0
+        nms_boxes = np.concatenate([top_left, xywh[:, 2:]], axis=1)
+        kept = self._nms(
+            nms_boxes.tolist(),
+            scores.tolist(),
+            class_ids.tolist(),
+            self.config.score_threshold,
+            self.config.iou_threshold,
+        )
+        kept = np.asarray(kept, dtype=np.int64).reshape(-1)
+
+        width, height = self.input_size
+        scale = np.array([width, height, width, height], dtype=np.float32)
+        boxes = np.concatenate([top_left, top_left + xywh[:, 2:]], axis=1)[kept] / scale
+        return FrameDetections(
+            time_seconds=time_seconds,
+            boxes=np.clip(boxes, 0.0, 1.0).astype(np.float32),
+            class_ids=class_ids[kept],
+            scores=scores[kept],
+        )
+
+
+def _load_labels(path: str) -> Sequence[str]:
+    if not path:
+        return COCO_LABELS
+    with open(path, "r", encoding="utf-8") as f:
+        return tuple(line.strip() for line in f if line.strip())
+
+
+_BACKENDS = {"stub": StubDetector, "onnx": OnnxDetector}
+_instances: Dict[DetectorConfig, Detector] = {}
+_warmed: Set[DetectorConfig] = set()
+_instances_lock = threading.Lock()
+
+
+def create_detector(config: DetectorConfig) -> Detector:
+    backend = _BACKENDS.get(config.backend)
+    if backend is None:
+        raise ValueError(f"Unknown detector backend: {config.backend!r} (expected one of {sorted(_BACKENDS)})")
+    return backend(config)
+
+
+def get_detector(config: DetectorConfig, *, warm: bool = True) -> Detector:
+    """
+    Process-wide detector for ``config``, created (and warmed up) on first
+    use and reused afterwards. One created with ``warm=False`` (e.g. loaded
+    before forking workers) is warmed by the first call that wants it warm.
+    """
+    detector: Optional[Detector] = _instances.get(config)
+    if detector is not None and (not warm or config in _warmed):
+        return detector
+    with _instances_lock:
+        detector = _instances.get(config)
+        if detector is None:
+            detector = create_detector(config)
+            _instances[config] = detector
+        if warm and config not in _warmed:
+            detector.warmup()
+            _warmed.add(config)
+    return detector
+
+
+def warm_detector(config: DetectorConfig) -> None:
+    """Load and warm the detector for ``config`` in the calling process."""
+    get_detector(config)
+
+
+def detector_loaded(config: DetectorConfig) -> bool:
+    """True once the detector for ``config`` is loaded and warm in this process."""
+    return config in _warmed
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+"""
+Columnar detection events.
+
+``EventTable`` stores detection events as one NumPy structured array
+instead of a list of ``DetectionEvent`` objects: float64 start/end times
+(NaN end for point events), int32 track ids (-1 for none), int32 label
+ids interned in a ``LabelVocab`` and float32 confidences, 28 bytes per
+event. Sorting, filtering and per-window aggregation are single
+vectorized operations over the columns.
+
+Label ids are only meaningful within one process (the vocabulary is
+process-wide and grows as labels are first seen), so tables are built
+where they are used and events cross process boundaries as
+``DetectionEvent`` lists.
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from detection.yolo_pipeline import DetectionEvent
+
+EVENT_DTYPE = np.dtype(
+    [
+        ("time", np.float64),  # seconds into the video the event starts at
+        ("end", np.float64),  # last seen, NaN for point events
+        ("track", np.int32),  # -1 for untracked events
+        ("label", np.int32),  # id in the table's LabelVocab
+        ("confidence", np.float32),
+    ]
+)
+
+
+class LabelVocab:
+    """Thread-safe interning of label strings to dense int32 ids."""
+
+    __slots__ = ("_ids", "_labels", "_lock")
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self._labels: List[str] = []
+        self._lock = threading.Lock()
+
+    def id(self, label: str) -> int:
+        label_id = self._ids.get(label)
+        if label_id is not None:
+            return label_id
+        with self._lock:
+            label_id = self._ids.get(label)
+            if label_id is None:
+                label_id = len(self._labels)
+                self._labels.append(label)
+                self._ids[label] = label_id
+        return label_id
+
+    def ids(self, labels: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.id(label) for label in labels), dtype=np.int32)
+
+    def label(self, label_id: int) -> str:
+        return self._labels[label_id]
+
+    def labels(self, ids: np.ndarray) -> List[str]:
+        labels = self._labels
+        return [labels[i] for i in ids.tolist()]
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+
+# Process-wide vocabulary shared by every table unless one is given.
+LABELS = LabelVocab()
+
+
+class EventTable:
+    """Detection events as a structured array (see the module docstring)."""
+
+    __slots__ = ("rows", "vocab")
+
+    def __init__(self, rows: Optional[np.ndarray] = None, vocab: LabelVocab = LABELS) -> None:
+        self.rows = rows if rows is not None else np.empty(0, dtype=EVENT_DTYPE)
+        self.vocab = vocab
+
+    @classmethod
+    def from_events(cls, events: Sequence[DetectionEvent], vocab: LabelVocab = LABELS) -> "EventTable":
+        rows = np.empty(len(events), dtype=EVENT_DTYPE)
+        rows["time"] = [e.time_seconds for e in events]
+        rows["end"] = [np.nan if e.end_seconds is None else e.end_seconds for e in events]
+        rows["track"] = [-1 if e.track_id is None else e.track_id for e in events]
+        rows["label"] = vocab.ids(e.label for e in events)
+        rows["confidence"] = [e.confidence for e in events]
+        return cls(rows, vocab)
+
+    def to_events(self) -> List[DetectionEvent]:
+        rows = self.rows
+        columns = zip(
+            rows["time"].tolist(),
+            self.vocab.labels(rows["label"]),
+            confidence_list(rows["confidence"]),
+            rows["end"].tolist(),
+            rows["track"].tolist(),
+        )
+        return [
+            DetectionEvent(
+                time_seconds=t,
+                label=label,
+                confidence=c,
+                end_seconds=None if end != end else end,  # NaN -> None
+                track_id=None if track < 0 else track,
+            )
+            for t, label, c, end, track in columns
+        ]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes
+
+    @property
+    def last_seen(self) -> np.ndarray:
+        """End time of spans, start time of point events."""
+        return np.where(np.isnan(self.rows["end"]), self.rows["time"], self.rows["end"])
+
+    def take(self, index: np.ndarray) -> "EventTable":
+        """Rows at ``index`` (integer positions or a boolean mask)."""
+        return EventTable(self.rows[index], self.vocab)
+
+    def sorted(self) -> "EventTable":
+        """Start-time order; ties by track id, then input order."""
+        return self.take(np.lexsort((self.rows["track"], self.rows["time"])))
+
+    def select(
+        self,
+        *,
+        labels: Optional[Iterable[str]] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        min_confidence: Optional[float] = None,
+    ) -> "EventTable":
+        """Events with one of ``labels``, starting in [since, until), at least ``min_confidence``."""
+        rows = self.rows
+        mask = np.ones(len(rows), dtype=bool)
+        if labels is not None:
+            mask &= np.isin(rows["label"], self.vocab.ids(labels))
+        if since is not None:
+            mask &= rows["time"] >= since
+        if until is not None:
+            mask &= rows["time"] < until
+        if min_confidence is not None:
+            mask &= rows["confidence"] >= min_confidence
+        return self.take(mask)
+
+    def window_counts(self, window_seconds: float, windows: Optional[int] = None) -> np.ndarray:
+        """
+        (windows, len(vocab)) count of events starting in each window of
+        ``window_seconds``, per label id.
+        """
+        n_labels = len(self.vocab)
+        window = np.floor(self.rows["time"] / window_seconds).astype(np.int64)
+        if windows is None:
+            windows = int(window.max()) + 1 if len(window) else 0
+        keep = (window >= 0) & (window < windows)
+        flat = window[keep] * n_labels + self.rows["label"][keep]
+        return np.bincount(flat, minlength=windows * n_labels).reshape(windows, n_labels)
+
+    @staticmethod
+    def concat(tables: Sequence["EventTable"]) -> "EventTable":
+        if not tables:
+            return EventTable()
+        return EventTable(np.concatenate([t.rows for t in tables]), tables[0].vocab)
+
+
+def confidence_list(values: np.ndarray) -> List[float]:
+    """Python floats for a float32 confidence column."""
+    # float32 storage; round so 0.94 comes back as 0.94, not 0.9399999976.
+    return [round(c, 6) for c in values.tolist()]
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+"""
+Multi-object tracking of per-frame detections.
+
+``Tracker`` is a small SORT-style tracker: every live track carries its
+last box and a smoothed velocity, boxes are predicted forward to the new
+frame's timestamp, and new detections are associated to predictions by
+IoU (falling back to centroid distance for small or fast objects, whose
+boxes may not overlap between sampled frames). Association is computed
+for all detection/track pairs at once with NumPy and resolved greedily,
+best match first; detections of a different class never match.
+
+Tracks that go unseen for longer than ``max_gap_seconds`` are closed and
+emitted as a single span ``DetectionEvent`` (start, end, track id, mean
+confidence), so a person standing in view for a minute is one event
+instead of one per sampled frame. Live consumers don't have to wait for
+a track to close: ``take_started`` hands out each track's event as soon
+as the track is confirmed, and that same object keeps its end time and
+confidence up to date until the track closes. A tracker that runs
+indefinitely must also drain the closed spans with ``take_finished``, or
+they pile up for ``events``.
+"""
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from detection.backends import FrameDetections
+from detection.yolo_pipeline import DetectionEvent
+
+
+def max_gap_for(sample_fps: float) -> float:
+    """Track gap tolerance for a sampling rate: 2 s, but never under two samples."""
+    return max(2.0, 2.0 / max(sample_fps, 1e-6))
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (n, 4) and (m, 4) x1, y1, x2, y2 boxes -> (n, m)."""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    wh = np.clip(bottom_right - top_left, 0.0, None)
+    inter = wh[..., 0] * wh[..., 1]
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-12), 0.0)
+
+
+def _centroids(boxes: np.ndarray) -> np.ndarray:
+    return (boxes[:, :2] + boxes[:, 2:]) / 2.0
+
+
+class Tracker:
+    """
+    Incremental tracker; feed ``FrameDetections`` in time order.
+
+    - ``iou_threshold``: minimum IoU between a detection and a track's
+      predicted box to continue the track.
+    - ``centroid_threshold``: detections whose centre is within this
+      (normalized) distance of a predicted centre still match when the
+      boxes don't overlap enough.
+    - ``max_gap_seconds``: a track unseen for longer than this is closed.
+    - ``min_hits``: tracks seen in fewer frames are dropped as flicker.
+    - ``velocity_smoothing``: weight of the previous velocity estimate.
+    """
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        *,
+        iou_threshold: float = 0.3,
+        centroid_threshold: float = 0.05,
+        max_gap_seconds: float = 2.0,
+        min_hits: int = 1,
+        velocity_smoothing: float = 0.5,
+    ) -> None:
+        self.labels = labels
+        self.iou_threshold = iou_threshold
+        self.centroid_threshold = centroid_threshold
+        self.max_gap_seconds = max_gap_seconds
+        self.min_hits = max(1, min_hits)
+        self.velocity_smoothing = velocity_smoothing
+        self.detections_seen = 0
+
+        # Live tracks, one row each.
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._class_ids = np.zeros(0, dtype=np.int32)
+        self._boxes = np.zeros((0, 4), dtype=np.float32)
+        self._velocity = np.zeros((0, 4), dtype=np.float32)  # box units per second
+        self._start = np.zeros(0, dtype=np.float64)
+        self._last_seen = np.zeros(0, dtype=np.float64)
+        self._hits = np.zeros(0, dtype=np.int64)
+        self._score_sum = np.zeros(0, dtype=np.float64)
+
+        # Event of each live track once it has min_hits, parallel to the rows above.
+        self._live: List[Optional[DetectionEvent]] = []
+
+        self._next_id = 0
+        self._finished: List[DetectionEvent] = []
+        self._started: List[DetectionEvent] = []
+
+    @property
+    def active_tracks(self) -> int:
+        return len(self._ids)
+
+    def update(self, frame: FrameDetections) -> List[DetectionEvent]:
+        """Associate one frame's detections; return the spans closed by it."""
+        t = frame.time_seconds
+        closed = self._close(self._last_seen < t - self.max_gap_seconds)
+
+        n_det = len(frame.class_ids)
+        self.detections_seen += n_det
+        if n_det == 0:
+            return closed
+
+        boxes = frame.boxes.astype(np.float32, copy=False)
+        det_track = np.full(n_det, -1, dtype=np.int64)
+        if len(self._ids):
+            dt = (t - self._last_seen).astype(np.float32)
+            predicted = self._boxes + self._velocity * dt[:, None]
+            affinity = self._affinity(boxes, frame.class_ids, predicted)
+            det_track = self._assign(affinity)
+
+        matched = det_track >= 0
+        if matched.any():
+            rows = det_track[matched]
+            new_boxes = boxes[matched]
+            dt = np.maximum(t - self._last_seen[rows], 1e-6).astype(np.float32)
+            velocity = (new_boxes - self._boxes[rows]) / dt[:, None]
+            s = self.velocity_smoothing
+            self._velocity[rows] = s * self._velocity[rows] + (1.0 - s) * velocity
+            self._boxes[rows] = new_boxes
+            self._last_seen[rows] = t
+            self._hits[rows] += 1
+            self._score_sum[rows] += frame.scores[matched]
+            for row in rows.tolist():
+                self._refresh(row)
+
+        new = ~matched
+        count = int(new.sum())
+        if count:
+            self._ids = np.concatenate([self._ids, np.arange(self._next_id, self._next_id + count)])
+            self._next_id += count
+            self._class_ids = np.concatenate([self._class_ids, frame.class_ids[new].astype(np.int32)])
+            self._boxes = np.concatenate([self._boxes, boxes[new]])
+            self._velocity = np.concatenate([self._velocity, np.zeros((count, 4), dtype=np.float32)])
+            self._start = np.concatenate([self._start, np.full(count, t)])
+            self._last_seen = np.concatenate([self._last_seen, np.full(count, t)])
+            self._hits = np.concatenate([self._hits, np.ones(count, dtype=np.int64)])
+            self._score_sum = np.concatenate([self._score_sum, frame.scores[new].astype(np.float64)])
+            self._live.extend([None] * count)
+            for row in range(len(self._ids) - count, len(self._ids)):
+                self._refresh(row)
+        return closed
+
+    def take_started(self) -> List[DetectionEvent]:
+        """
+        Events of tracks confirmed since the last call. Each is updated in
+        place (``end_seconds``, ``confidence``) while its track lives.
+        """
+        started, self._started = self._started, []
+        return started
+
+    def take_finished(self) -> List[DetectionEvent]:
+        """Spans closed since the last call; they are dropped from ``events``."""
+        finished, self._finished = self._finished, []
+        return finished
+
+    def flush(self) -> List[DetectionEvent]:
+        """Close every live track (end of video) and return the spans."""
+        return self._close(np.ones(len(self._ids), dtype=bool))
+
+    def events(self) -> List[DetectionEvent]:
+        """All spans closed so far (and not taken), in start-time order."""
+        return sorted(self._finished, key=lambda e: (e.time_seconds, e.track_id))
+
+    def _affinity(self, boxes: np.ndarray, class_ids: np.ndarray, predicted: np.ndarray) -> np.ndarray:
+        """(detections, tracks) match score; 0 means "may not match"."""
+        iou = iou_matrix(boxes, predicted)
+        distance = np.linalg.norm(_centroids(boxes)[:, None, :] - _centroids(predicted)[None, :, :], axis=2)
+        # Centroid-only matches rank below any IoU match.
+        near = self.iou_threshold * np.clip(1.0 - distance / max(self.centroid_threshold, 1e-6), 0.0, 1.0)
+        affinity = np.where(iou >= self.iou_threshold, iou, near)
+        affinity[class_ids[:, None] != self._class_ids[None, :]] = 0.0
+        return affinity
+
+    @staticmethod
+    def _assign(affinity: np.ndarray) -> np.ndarray:
+        """Greedy best-first assignment; returns the track row per detection (-1 = none)."""
+        det_track = np.full(affinity.shape[0], -1, dtype=np.int64)
+        candidates = np.flatnonzero(affinity > 0)
+        if len(candidates) == 0:
+            return det_track
+        candidates = candidates[np.argsort(-affinity.ravel()[candidates], kind="stable")]
+        track_taken = np.zeros(affinity.shape[1], dtype=bool)
+        for det, track in zip(*np.unravel_index(candidates, affinity.shape)):
+            if det_track[det] < 0 and not track_taken[track]:
+                det_track[det] = track
+                track_taken[track] = True
+        return det_track
+
+    def _refresh(self, row: int) -> None:
+        """Create (on confirmation) or update the event of live track ``row``."""
+        if self._hits[row] < self.min_hits:
+            return
+        event = self._live[row]
+        if event is None:
+            class_id = int(self._class_ids[row])
+            label = self.labels[class_id] if 0 <= class_id < len(self.labels) else f"class {class_id}"
+            event = DetectionEvent(
+                time_seconds=float(self._start[row]),
+                label=label,
+                confidence=0.0,
+                track_id=int(self._ids[row]),
+            )
+            self._live[row] = event
+            self._started.append(event)
+        event.end_seconds = float(self._last_seen[row])
+        event.confidence = float(self._score_sum[row] / self._hits[row])
+
+    def _close(self, mask: np.ndarray) -> List[DetectionEvent]:
+        if not mask.any():
+            return []
+        closed = [self._live[row] for row in np.flatnonzero(mask).tolist() if self._live[row] is not None]
+        keep = ~mask
+        self._ids = self._ids[keep]
+        self._class_ids = self._class_ids[keep]
+        self._boxes = self._boxes[keep]
+        self._velocity = self._velocity[keep]
+        self._start = self._start[keep]
+        self._last_seen = self._last_seen[keep]
+        self._hits = self._hits[keep]
+        self._score_sum = self._score_sum[keep]
+        self._live = [event for event, kept in zip(self._live, keep.tolist()) if kept]
+        self._finished.extend(closed)
+        return closed
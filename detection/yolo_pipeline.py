@@ -1,27 +1,59 @@
 from __future__ import annotations
 
 """
-YOLO-style detection pipeline (stub implementation).
+YOLO-style detection pipeline.
 
-This module is structured so you can later plug in a real YOLO model
-from Ultralytics or another implementation. For now, it generates
-synthetic detection events spread over the video duration, which keeps
-the frontend and backend fully functional for demonstrations.
+``run_detection`` is the entry point used by the service. It takes a
+``Detector`` backend (see ``detection.backends``):
+- the stub backend generates synthetic detection events spread over the
+  video duration, which keeps the frontend and backend fully functional
+  for demonstrations without any model;
+- frame-based backends (e.g. ONNX Runtime) are fed sampled, optionally
+  motion-gated frame batches and their per-frame detections are
+  tracked across frames (see ``detection.tracking``) into span
+  ``DetectionEvent`` instances. Decode, inference and tracking run as
+  overlapping stages (see ``pipeline.runner``).
 """
 
+import time
 from dataclasses import dataclass
-from typing import List
+from functools import partial
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
 
+from detection.backends import DetectionStats, Detector, FrameDetections
+from pipeline.runner import run_stages
+from preprocessing.motion import GateStats, MotionGate, MotionSegment, detect_motion_segments
+from preprocessing.video import DecodeStats, FrameBatch, FrameSource, iter_frame_batches
 
-@dataclass
+if TYPE_CHECKING:
+    from detection.tracking import Tracker
+
+
+@dataclass(slots=True)
 class DetectionEvent:
     """
     Coarse detection event summarizing what YOLO saw in a time window.
+
+    Tracked detections are spans: ``time_seconds`` is when the object was
+    first seen, ``end_seconds`` when it was last seen and ``track_id``
+    identifies the track. Synthetic events are single points (both None).
     """
 
     time_seconds: float
     label: str
     confidence: float
+    end_seconds: Optional[float] = None
+    track_id: Optional[int] = None
+
+
+# Normalized template events similar to your sample output.
+_TEMPLATE = [
+    ("Person enters building", 0.94),
+    ("Loitering near entrance", 0.87),
+    ("Unauthorized access attempt", 0.92),
+    ("Theft / object removed", 0.89),
+    ("Person exits building", 0.96),
+]
 
 
 def run_yolo_stub_detection(
@@ -29,6 +61,7 @@ def run_yolo_stub_detection(
     duration_seconds: float,
     *,
     num_events: int = 5,
+    active_segments: Optional[List[MotionSegment]] = None,
 ) -> List[DetectionEvent]:
     """
     Stub implementation that returns a fixed set of plausible events
@@ -39,21 +72,19 @@ def run_yolo_stub_detection(
       - Sample frames from the video
       - Run detection on each sampled frame
       - Aggregate detections into higher-level DetectionEvent instances
+
+    If ``active_segments`` (from motion gating) is given, events are only
+    placed inside those segments, mirroring a detector that never sees the
+    static parts of the video; no segments means no events.
     """
     if duration_seconds <= 0:
         duration_seconds = 300.0
 
-    # Normalized template events similar to your sample output.
-    template = [
-        ("Person enters building", 0.94),
-        ("Loitering near entrance", 0.87),
-        ("Unauthorized access attempt", 0.92),
-        ("Theft / object removed", 0.89),
-        ("Person exits building", 0.96),
-    ]
+    if active_segments is not None:
+        return _place_in_segments(active_segments, num_events)
 
     # Clamp to requested num_events
-    template = template[:num_events]
+    template = _TEMPLATE[:num_events]
     interval = duration_seconds / max(len(template), 1)
 
     events: List[DetectionEvent] = []
@@ -69,3 +100,155 @@ def run_yolo_stub_detection(
 
     return events
 
+
+def _place_in_segments(segments: List[MotionSegment], num_events: int) -> List[DetectionEvent]:
+    """Spread the template events evenly over the active time only."""
+    active_total = sum(max(0.0, seg.end_seconds - seg.start_seconds) for seg in segments)
+    template = _TEMPLATE[:num_events]
+    if active_total <= 0 or not template:
+        return []
+
+    interval = active_total / len(template)
+    events: List[DetectionEvent] = []
+    seg_idx = 0
+    seg_offset = 0.0  # active time covered by segments before seg_idx
+    for idx, (label, conf) in enumerate(template):
+        offset = idx * interval
+        while seg_idx < len(segments) - 1 and offset >= seg_offset + (
+            segments[seg_idx].end_seconds - segments[seg_idx].start_seconds
+        ):
+            seg_offset += segments[seg_idx].end_seconds - segments[seg_idx].start_seconds
+            seg_idx += 1
+        events.append(
+            DetectionEvent(
+                time_seconds=segments[seg_idx].start_seconds + (offset - seg_offset),
+                label=label,
+                confidence=conf,
+            )
+        )
+    return events
+
+
+def stub_event(index: int, time_seconds: float) -> DetectionEvent:
+    """The ``index``-th template event (cycling), for live streams on the stub backend."""
+    label, conf = _TEMPLATE[index % len(_TEMPLATE)]
+    return DetectionEvent(time_seconds=time_seconds, label=label, confidence=conf)
+
+
+def detect_frames(
+    video_path: str,
+    detector: Detector,
+    *,
+    sample_fps: float = 2.0,
+    gate: Optional[MotionGate] = None,
+    queue_size: int = 2,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+    stats: Optional[DetectionStats] = None,
+    decode_stats: Optional[DecodeStats] = None,
+    frames: Optional[FrameSource] = None,
+) -> "Tracker":
+    """
+    Run a frame-based ``detector`` over ``video_path`` (optionally only
+    frames ``start_frame``..``end_frame``) and return the tracker holding
+    the resulting span events. ``frames`` replaces decoding the video
+    (whole-video passes only, see ``FrameSource``).
+
+    Decoding, (gating +) inference and tracking run as concurrent stages
+    connected by queues holding at most ``queue_size`` items, so decode
+    I/O overlaps inference and memory stays flat regardless of video
+    length.
+    """
+    # Imported here: detection.tracking builds on DetectionEvent above.
+    from detection.tracking import Tracker, max_gap_for
+
+    if stats is None:
+        stats = DetectionStats()
+    stats.threads = detector.threads
+
+    # Batches in flight: one being decoded, ``queue_size`` queued, one in inference.
+    if frames is None:
+        frames = partial(iter_frame_batches, video_path, start_frame=start_frame, end_frame=end_frame)
+    source = frames(
+        target_fps=sample_fps,
+        batch_size=detector.batch_size,
+        frame_size=detector.input_size,
+        normalize=True,
+        num_buffers=queue_size + 2,
+        stats=decode_stats,
+    )
+
+    def detect_stage(batches: Iterator[FrameBatch]) -> Iterator[List[FrameDetections]]:
+        for batch in batches:
+            if gate is not None:
+                batch = gate.filter(batch)
+                if batch is None:
+                    continue
+            started = time.perf_counter()
+            detections = detector.detect(batch.frames, batch.timestamps)
+            stats.inference_seconds += time.perf_counter() - started
+            stats.frames += len(batch.frames)
+            stats.batches += 1
+            stats.batch_sizes[len(batch.frames)] = stats.batch_sizes.get(len(batch.frames), 0) + 1
+            stats.detections += sum(len(frame.class_ids) for frame in detections)
+            yield detections
+
+    def track_stage(detections: Iterator[List[FrameDetections]]) -> Iterator[Tracker]:
+        tracker = Tracker(detector.labels, max_gap_seconds=max_gap_for(sample_fps))
+        for frame_list in detections:
+            for frame in frame_list:
+                tracker.update(frame)
+        tracker.flush()
+        yield tracker
+
+    (tracker,) = run_stages(
+        source,
+        [("detect", detect_stage), ("track", track_stage)],
+        queue_size=queue_size,
+    )
+    return tracker
+
+
+def run_detection(
+    video_path: str,
+    duration_seconds: float,
+    detector: Detector,
+    *,
+    sample_fps: float = 2.0,
+    gate: Optional[MotionGate] = None,
+    queue_size: int = 2,
+    stats: Optional[DetectionStats] = None,
+    decode_stats: Optional[DecodeStats] = None,
+    frames: Optional[FrameSource] = None,
+) -> Tuple[List[DetectionEvent], Optional[GateStats]]:
+    """
+    Run ``detector`` over ``video_path`` and return detection events plus
+    the motion gate statistics (None without a gate).
+
+    With a ``gate`` only frames that changed reach the detector.
+    ``frames`` supplies sampled frames instead of decoding the video.
+    """
+    if not detector.needs_frames:
+        if gate is None:
+            return run_yolo_stub_detection(video_path=video_path, duration_seconds=duration_seconds), None
+        segments, gate_stats = detect_motion_segments(
+            video_path, sample_fps=sample_fps, gate=gate, decode_stats=decode_stats, frames=frames
+        )
+        events = run_yolo_stub_detection(
+            video_path=video_path,
+            duration_seconds=duration_seconds,
+            active_segments=segments,
+        )
+        return events, gate_stats
+
+    tracker = detect_frames(
+        video_path,
+        detector,
+        sample_fps=sample_fps,
+        gate=gate,
+        queue_size=queue_size,
+        stats=stats,
+        decode_stats=decode_stats,
+        frames=frames,
+    )
+    return tracker.events(), (gate.stats if gate is not None else None)
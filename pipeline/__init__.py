@@ -0,0 +1 @@
+# Pipeline module for staged, concurrent execution of the analysis chain
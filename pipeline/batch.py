@@ -0,0 +1,514 @@
+"""
+Offline batch analysis of video files.
+
+    python -m pipeline.batch /exports/case-1234 "/mnt/cams/**/*.mp4" --output results.jsonl --workers 4
+    python -m pipeline.batch /exports/case-1234 --output results.parquet --format parquet
+
+Runs the stages of ``/analyze-video`` (with the service's ``CCTV_*``
+configuration, feature store included) straight from the pipeline
+modules, without HTTP: directories are searched recursively for videos,
+each video is one task on a process pool, and a thread pool in the
+parent hashes the files ahead of the analyses.
+
+Checkpointing: the manifest (``<output>.manifest.jsonl`` by default)
+gets one fsynced line per finished video, written only once the video's
+row is in the output. Re-running the same command resumes: a video whose
+SHA-256 the manifest records as done with the same pipeline fingerprint
+is skipped whatever its path, and so are copies within one run; files
+whose size and mtime match a manifest line are not even re-hashed.
+Output past the last manifest line (a row cut off by the interruption, a
+Parquet part not yet recorded) is discarded on resume, so every video
+appears exactly once. Failed videos are recorded too and retried by the
+next run.
+
+Rows carry the ``/analyze-video`` response fields plus the path, frame
+count, pipeline fingerprint and processing time. JSON Lines output gets
+each row as its video finishes; Parquet output (needs ``pyarrow``) is a
+directory of part files of ``--parquet-rows`` rows each, read as one
+dataset by pyarrow, pandas, DuckDB or Spark. A throughput report
+(videos/hour, frames/s, footage seconds per second) is printed at the
+end, and written as JSON with ``--report``.
+
+Ctrl-C stops submitting videos and waits for the ones in progress,
+whose results are kept; anything not finished is picked up on resume.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import cv2
+
+from detection.backends import get_detector
+from pipeline.features import FeatureStore
+from preprocessing.video import extract_video_metadata
+from recognition.rules import get_rule_set
+from recognition.temporal import get_recognizer
+from service.analysis import (
+    PipelineOptions,
+    pipeline_fingerprint,
+    run_detection_stage,
+    run_narrative_stage,
+    run_risk_stage,
+    run_timeline_stage,
+)
+from summarization.backends import get_summarizer
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = (".mp4", ".m4v", ".mov", ".avi", ".mkv", ".webm", ".mpg", ".mpeg", ".ts", ".wmv", ".flv")
+
+_HASH_CHUNK_BYTES = 1024 ** 2
+
+
+def find_videos(inputs: Sequence[str]) -> List[str]:
+    """
+    Absolute paths of the videos named by ``inputs``: files as given,
+    directories searched recursively and glob patterns (``**`` allowed)
+    expanded, both keeping only ``VIDEO_EXTENSIONS``. Sorted per input,
+    without repeats.
+    """
+    found: List[str] = []
+    seen: Set[str] = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = sorted(
+                os.path.join(root, name) for root, _, names in os.walk(item) for name in names
+            )
+        elif glob.has_magic(item):
+            candidates = sorted(glob.glob(item, recursive=True))
+        else:
+            candidates = [item]
+        for path in candidates:
+            if candidates != [item] and not path.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            path = os.path.abspath(path)
+            if path not in seen and os.path.isfile(path):
+                seen.add(path)
+                found.append(path)
+    return found
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Append-only JSON Lines checkpoint: one entry per finished (or failed) video."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._done: Dict[Tuple[str, str], dict] = {}  # (sha256, fingerprint) -> entry
+        self._files: Dict[str, Tuple[int, int, str]] = {}  # path -> (size, mtime_ns, sha256)
+        self.output_bytes = 0  # JSON Lines output committed so far
+        self.parts: Set[str] = set()  # Parquet parts committed so far
+        if os.path.exists(path):
+            self._load()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # cut off by an interruption; nothing after it was committed
+                self._remember(entry)
+
+    def _remember(self, entry: dict) -> None:
+        if entry.get("size") is not None:
+            self._files[entry["path"]] = (entry["size"], entry["mtime_ns"], entry["sha256"])
+        if entry["status"] == "done":
+            self._done[(entry["sha256"], entry["fingerprint"])] = entry
+            self.output_bytes = max(self.output_bytes, entry.get("output_bytes", 0))
+            if entry.get("part"):
+                self.parts.add(entry["part"])
+
+    def is_done(self, sha256: str, fingerprint: str) -> bool:
+        return (sha256, fingerprint) in self._done
+
+    def known_digest(self, path: str, size: int, mtime_ns: int) -> Optional[str]:
+        """The recorded SHA-256 of ``path`` if the file is unchanged since, else None."""
+        known = self._files.get(path)
+        if known is None or known[:2] != (size, mtime_ns):
+            return None
+        return known[2]
+
+    def append(self, entry: dict) -> None:
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._remember(entry)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class JsonLinesWriter:
+    """Rows appended to one file, each committed (fsynced) as it is added."""
+
+    def __init__(self, path: str, committed_bytes: int) -> None:
+        self._file = open(path, "ab")
+        size = self._file.tell()
+        if size > committed_bytes:
+            logger.info(f"Discarding {size - committed_bytes} bytes of uncommitted output in {path}")
+            self._file.truncate(committed_bytes)
+            self._file.seek(committed_bytes)
+        elif size < committed_bytes:
+            logger.warning(f"{path} is shorter than the manifest records; rows of earlier runs are missing")
+
+    def add(self, row: dict, entry: dict) -> List[dict]:
+        """Write ``row``; returns the manifest entries now safe to append."""
+        self._file.write(json.dumps(row).encode("utf-8") + b"\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return [{**entry, "output_bytes": self._file.tell()}]
+
+    def close(self) -> List[dict]:
+        self._file.close()
+        return []
+
+
+class ParquetWriter:
+    """Rows buffered and written ``rows_per_part`` at a time as part files of a dataset directory."""
+
+    def __init__(self, directory: str, committed_parts: Set[str], rows_per_part: int = 256) -> None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow") from e
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.directory = directory
+        self.rows_per_part = max(1, rows_per_part)
+        self._run = time.strftime("%Y%m%dT%H%M%S")
+        self._parts = 0
+        self._rows: List[dict] = []
+        self._entries: List[dict] = []
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if (name.endswith(".parquet") and name not in committed_parts) or name.startswith(".tmp-"):
+                logger.info(f"Removing uncommitted part {name}")
+                os.remove(os.path.join(directory, name))
+
+    def add(self, row: dict, entry: dict) -> List[dict]:
+        self._rows.append(row)
+        self._entries.append(entry)
+        if len(self._rows) >= self.rows_per_part:
+            return self.flush()
+        return []
+
+    def flush(self) -> List[dict]:
+        if not self._rows:
+            return []
+        name = f"part-{self._run}-{self._parts:05d}.parquet"
+        self._parts += 1
+        tmp = os.path.join(self.directory, f".tmp-{name}")
+        self._pq.write_table(self._pa.Table.from_pylist(self._rows), tmp)
+        os.replace(tmp, os.path.join(self.directory, name))
+        committed = [{**entry, "part": name} for entry in self._entries]
+        self._rows, self._entries = [], []
+        return committed
+
+    def close(self) -> List[dict]:
+        return self.flush()
+
+
+@dataclass
+class BatchReport:
+    videos: int = 0  # inputs found
+    analysed: int = 0
+    skipped: int = 0  # already analysed by an earlier run
+    duplicates: int = 0  # same content as another input of this run
+    failed: int = 0
+    wall_seconds: float = 0.0
+    video_seconds: float = 0.0  # footage analysed
+    source_frames: int = 0  # frames in that footage
+    frames_decoded: int = 0  # frames actually decoded (sampling and motion gating skip the rest)
+    processing_seconds: float = 0.0  # summed over videos
+
+    @property
+    def videos_per_hour(self) -> float:
+        return self.analysed * 3600.0 / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.source_frames / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    @property
+    def decoded_frames_per_second(self) -> float:
+        return self.frames_decoded / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    @property
+    def realtime_factor(self) -> float:
+        """Seconds of footage analysed per wall-clock second."""
+        return self.video_seconds / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            **asdict(self),
+            "videos_per_hour": self.videos_per_hour,
+            "frames_per_second": self.frames_per_second,
+            "decoded_frames_per_second": self.decoded_frames_per_second,
+            "realtime_factor": self.realtime_factor,
+        }
+
+    def format(self) -> str:
+        return "\n".join(
+            [
+                f"videos: {self.videos} found, {self.analysed} analysed, {self.skipped} already done, "
+                f"{self.duplicates} duplicates, {self.failed} failed",
+                f"wall time: {self.wall_seconds:.1f}s ({self.processing_seconds:.1f}s of processing)",
+                f"throughput: {self.videos_per_hour:.1f} videos/hour, {self.frames_per_second:.1f} frames/s "
+                f"({self.decoded_frames_per_second:.1f} decoded frames/s), "
+                f"{self.realtime_factor:.1f}x real time",
+            ]
+        )
+
+
+# -- worker processes ----------------------------------------------------------
+
+_options: Optional[PipelineOptions] = None
+_features: Optional[FeatureStore] = None
+
+
+def _init_worker(options: PipelineOptions, features: Optional[FeatureStore]) -> None:
+    global _options, _features
+    # The parent handles Ctrl-C; parallelism comes from the processes.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    cv2.setNumThreads(1)
+    _options, _features = options, features
+    get_detector(options.detector)
+    get_recognizer(options.recognizer, options.rules_path)
+    get_summarizer(options.summarizer)
+
+
+def analyze_file(path: str, digest: str) -> Tuple[dict, int]:
+    """Run every stage on one video; returns its output row and the frames decoded."""
+    started = time.perf_counter()
+    options = _options
+    metadata = extract_video_metadata(path)
+    events, _, stats = run_detection_stage(path, metadata, options, features=_features, digest=digest)
+    activities = run_timeline_stage(events, metadata.duration_seconds, options)
+    narrative = run_narrative_stage(activities, metadata.duration_seconds, options.summarizer)
+    risk_level, alerts = run_risk_stage(activities, options.rules_path)
+    row = {
+        "path": path,
+        "video_sha256": digest,
+        "video_duration_seconds": metadata.duration_seconds,
+        "fps": metadata.fps,
+        "frame_count": metadata.frame_count,
+        "activities": [activity.to_dict() for activity in activities],
+        "narrative_summary": narrative,
+        "risk_level": risk_level,
+        "alerts": [alert.to_dict() for alert in alerts],
+        "processing_seconds": time.perf_counter() - started,
+    }
+    return row, stats.decode.frames_decoded
+
+
+# -- parent --------------------------------------------------------------------
+
+
+def _identify(manifest: Manifest, path: str) -> Tuple[Optional[os.stat_result], Optional[str], Optional[str]]:
+    """(stat, sha256, error) of ``path``, reusing the manifest's hash of an unchanged file."""
+    try:
+        st = os.stat(path)
+        digest = manifest.known_digest(path, st.st_size, st.st_mtime_ns) or file_sha256(path)
+    except OSError as e:
+        return None, None, str(e)
+    return st, digest, None
+
+
+def batch_options(options: PipelineOptions, workers: int) -> PipelineOptions:
+    """
+    ``options`` adapted to ``workers`` analyses in parallel: no sharding,
+    and runtime thread pools sized to a share of the cores unless set.
+    """
+    cores = max(1, (os.cpu_count() or 1) // max(1, workers))
+    detector, summarizer = options.detector, options.summarizer
+    if detector.intra_op_threads == 0:
+        detector = replace(detector, intra_op_threads=cores)
+    if summarizer.threads == 0:
+        summarizer = replace(summarizer, threads=cores)
+    return replace(options, shard_workers=0, detector=detector, summarizer=summarizer)
+
+
+def run_batch(
+    paths: Sequence[str],
+    *,
+    output: str,
+    output_format: str = "jsonl",
+    manifest_path: str = "",
+    options: Optional[PipelineOptions] = None,
+    features: Optional[FeatureStore] = None,
+    workers: int = 0,
+    hash_threads: int = 4,
+    parquet_rows: int = 256,
+) -> BatchReport:
+    """
+    Analyse ``paths`` (see the module docstring) with the service's
+    ``options``; returns the run's report.
+    """
+    if options is None:
+        options = PipelineOptions()
+    workers = workers or os.cpu_count() or 1
+    # The service's fingerprint for the same configuration, whatever the worker count.
+    fingerprint = pipeline_fingerprint({**asdict(options), "rules_digest": get_rule_set(options.rules_path).digest})
+    options = batch_options(options, workers)
+    manifest_path = manifest_path or f"{output.rstrip(os.sep)}.manifest.jsonl"
+    if not os.path.exists(manifest_path) and os.path.exists(output) and (
+        os.listdir(output) if os.path.isdir(output) else os.path.getsize(output)
+    ):
+        raise FileExistsError(f"{output} exists but has no manifest ({manifest_path}); refusing to overwrite it")
+    manifest = Manifest(manifest_path)
+    if output_format == "parquet":
+        writer = ParquetWriter(output, manifest.parts, parquet_rows)
+    elif output_format == "jsonl":
+        writer = JsonLinesWriter(output, manifest.output_bytes)
+    else:
+        raise ValueError(f"Unknown output format: {output_format!r} (expected 'jsonl' or 'parquet')")
+
+    report = BatchReport(videos=len(paths))
+    started = time.perf_counter()
+    in_flight: Dict[Future, Tuple[str, os.stat_result, str]] = {}
+    claimed: Set[str] = set()  # digests analysed by this run
+
+    def commit(entries: List[dict]) -> None:
+        for entry in entries:
+            manifest.append(entry)
+
+    def collect(block: bool = True) -> None:
+        done, _ = wait(list(in_flight), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            path, st, digest = in_flight.pop(future)
+            entry = {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+            if future.cancelled():
+                continue
+            try:
+                row, frames_decoded = future.result()
+            except Exception as e:
+                report.failed += 1
+                logger.error(f"{path}: analysis failed: {e}")
+                commit([{**entry, "status": "failed", "error": str(e), "finished_at": time.time()}])
+                continue
+            row["pipeline_fingerprint"] = fingerprint
+            report.analysed += 1
+            report.video_seconds += row["video_duration_seconds"]
+            report.source_frames += row["frame_count"]
+            report.frames_decoded += frames_decoded
+            report.processing_seconds += row["processing_seconds"]
+            entry.update(status="done", fingerprint=fingerprint, finished_at=time.time())
+            commit(writer.add(row, entry))
+            finished = report.analysed + report.skipped + report.duplicates + report.failed
+            logger.info(
+                f"[{finished}/{report.videos}] {path}: {row['risk_level']} risk, {len(row['alerts'])} alerts "
+                f"in {row['processing_seconds']:.1f}s"
+            )
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(options, features))
+    hasher = ThreadPoolExecutor(max_workers=max(1, hash_threads), thread_name_prefix="batch-hash")
+    try:
+        try:
+            identified = hasher.map(lambda path: (path, _identify(manifest, path)), paths)
+            for path, (st, digest, error) in identified:
+                if error is not None:
+                    report.failed += 1
+                    logger.error(f"{path}: {error}")
+                    continue
+                if manifest.is_done(digest, fingerprint):
+                    report.skipped += 1
+                    continue
+                if digest in claimed:
+                    report.duplicates += 1
+                    logger.info(f"{path}: same content as another input, skipped")
+                    entry = {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+                    commit([{**entry, "status": "duplicate"}])
+                    continue
+                claimed.add(digest)
+                while len(in_flight) >= 2 * workers:
+                    collect()
+                in_flight[pool.submit(analyze_file, path, digest)] = (path, st, digest)
+                collect(block=False)
+        except KeyboardInterrupt:
+            logger.warning("Interrupted: finishing the videos in progress (Ctrl-C again to abort)")
+            for future in in_flight:
+                future.cancel()
+        while in_flight:
+            collect()
+        commit(writer.close())
+    finally:
+        hasher.shutdown(wait=False, cancel_futures=True)
+        pool.shutdown(wait=False, cancel_futures=True)
+        manifest.close()
+        report.wall_seconds = time.perf_counter() - started
+    return report
+
+
+def main() -> None:
+    from service.settings import Settings
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="video files, directories or glob patterns")
+    parser.add_argument("--output", required=True, help="JSON Lines file or Parquet dataset directory")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="", help="default: from --output's suffix")
+    parser.add_argument("--manifest", default="", help="checkpoint file (default: <output>.manifest.jsonl)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="videos analysed in parallel")
+    parser.add_argument("--hash-threads", type=int, default=4, help="threads hashing files ahead of the analyses")
+    parser.add_argument("--parquet-rows", type=int, default=256, help="rows per Parquet part file")
+    parser.add_argument("--report", default="", help="also write the throughput report as JSON")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    settings = Settings.from_env()
+    output_format = args.format or ("parquet" if args.output.rstrip(os.sep).endswith(".parquet") else "jsonl")
+    features = (
+        FeatureStore(settings.feature_dir, max_bytes=settings.feature_max_bytes, frames=settings.feature_frames)
+        if settings.feature_dir
+        else None
+    )
+    paths = find_videos(args.inputs)
+    logger.info(f"Found {len(paths)} videos")
+    try:
+        report = run_batch(
+            paths,
+            output=args.output,
+            output_format=output_format,
+            manifest_path=args.manifest,
+            options=PipelineOptions.from_settings(settings),
+            features=features,
+            workers=args.workers,
+            hash_threads=args.hash_threads,
+            parquet_rows=args.parquet_rows,
+        )
+    except (FileExistsError, ImportError) as e:
+        parser.error(str(e))
+    print(report.format())
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report.to_dict(), f, indent=2)
+    sys.exit(1 if report.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+"""
+On-disk feature store, so re-analysing a video skips work already done.
+
+Two kinds of entries, both under ``<root>/<video sha256>/``:
+
+- frames: the sampled, resized uint8 RGB frames of one full decoding pass
+  (keyed by sample rate and frame size), written while the first pass
+  runs and read back through ``np.memmap``. Later passes with the same
+  sampling, e.g. with new detector thresholds or motion settings, never
+  open ``cv2.VideoCapture``: uint8 batches are zero-copy views of the
+  mapped file and normalized batches one vectorized conversion each.
+- events: the detection stage's output (an ``EventTable``) keyed by the
+  detection configuration, so changing only recognition rules or the
+  summarizer reuses the detections outright.
+
+Entries are written to a temporary directory and renamed into place, so
+readers never see partial ones and several processes can share a store.
+An entry evicted by another process while it is being opened is a miss;
+once its files are mapped, eviction no longer affects the reader.
+When the store grows past ``max_bytes`` the least recently used entries
+are deleted. Frames are large (a 640x640 frame is 1.2 MB, so an hour
+sampled at 2 fps is about 9 GB): size the budget accordingly or disable
+them with ``frames=False``.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from detection.event_table import EVENT_DTYPE, EventTable, LabelVocab
+from preprocessing.video import DecodeStats, FrameBatch, iter_frame_batches
+
+logger = logging.getLogger(__name__)
+
+_META = "meta.json"
+
+
+def config_key(config: dict) -> str:
+    """Short stable hash of a JSON-serializable configuration."""
+    payload = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class FeatureStore:
+    """
+    Frame and detection-event cache rooted at ``root`` (see the module
+    docstring). Holds no open files or locks, so it can be passed to
+    process-pool workers.
+    """
+
+    def __init__(self, root: str, *, max_bytes: int = 10 * 1024 ** 3, frames: bool = True) -> None:
+        self.root = root
+        self.max_bytes = max(0, max_bytes)
+        self.frames = frames
+        os.makedirs(root, exist_ok=True)
+
+    def _entry(self, digest: str, kind: str, key: str) -> str:
+        return os.path.join(self.root, digest, f"{kind}-{key}")
+
+    def _open_entry(self, path: str) -> Optional[dict]:
+        """Metadata of a complete entry (marking it recently used), or None."""
+        try:
+            with open(os.path.join(path, _META), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return meta
+
+    def _commit(self, tmp: str, path: str) -> None:
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # Another writer got there first; its entry is as good as ours.
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries: List[Tuple[float, int, str]] = []
+        total = 0
+        for digest in os.listdir(self.root):
+            digest_dir = os.path.join(self.root, digest)
+            if not os.path.isdir(digest_dir):
+                continue
+            for name in os.listdir(digest_dir):
+                if name.startswith("."):
+                    continue
+                path = os.path.join(digest_dir, name)
+                try:
+                    size = sum(entry.stat().st_size for entry in os.scandir(path))
+                    entries.append((os.stat(path).st_mtime, size, path))
+                except FileNotFoundError:
+                    continue  # evicted concurrently
+                total += size
+        entries.sort()
+        for _, size, path in entries[:-1]:  # never the newest entry
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            logger.info(f"Evicted feature store entry {path} ({size / 1e6:.1f} MB)")
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass  # other entries of the video remain
+
+    def _tmp_dir(self, digest: str) -> str:
+        path = os.path.join(self.root, digest, f".{uuid.uuid4().hex}")
+        os.makedirs(path)
+        return path
+
+    # Frames
+
+    def frame_batches(
+        self,
+        digest: str,
+        video_path: str,
+        *,
+        target_fps: float,
+        frame_size: Tuple[int, int],
+        batch_size: int,
+        normalize: bool,
+        num_buffers: int = 1,
+        stats: Optional[DecodeStats] = None,
+    ) -> Iterator[FrameBatch]:
+        """
+        Full-video sampled frame batches as ``iter_frame_batches`` would
+        yield them (same grid, same ``num_buffers`` validity guarantee),
+        read from the store if this sampling was stored before, otherwise
+        decoded and stored on the way.
+        """
+        if not self.frames:
+            return iter_frame_batches(
+                video_path,
+                target_fps=target_fps,
+                batch_size=batch_size,
+                frame_size=frame_size,
+                normalize=normalize,
+                num_buffers=num_buffers,
+                stats=stats,
+            )
+        width, height = frame_size
+        path = self._entry(digest, "frames", config_key({"fps": target_fps, "width": width, "height": height}))
+        meta = self._open_entry(path)
+        if meta is not None:
+            try:
+                batches = _read_frames(path, meta, batch_size, normalize, num_buffers)
+            except FileNotFoundError:
+                # Evicted since we opened it: decode as if it had never been stored.
+                logger.info(f"Feature store entry {path} was evicted while opening it")
+            else:
+                logger.info(f"Reading {meta['count']} sampled frames from the feature store")
+                return batches
+        source = iter_frame_batches(
+            video_path,
+            target_fps=target_fps,
+            batch_size=batch_size,
+            frame_size=frame_size,
+            normalize=False,
+            num_buffers=num_buffers,
+            stats=stats,
+        )
+        return self._record_frames(digest, path, source, frame_size, batch_size, normalize, num_buffers)
+
+    def _record_frames(
+        self,
+        digest: str,
+        path: str,
+        source: Iterator[FrameBatch],
+        frame_size: Tuple[int, int],
+        batch_size: int,
+        normalize: bool,
+        num_buffers: int,
+    ) -> Iterator[FrameBatch]:
+        tmp = self._tmp_dir(digest)
+        count = 0
+        timestamps: List[np.ndarray] = []
+        indices: List[np.ndarray] = []
+        try:
+            with open(os.path.join(tmp, "frames.u8"), "wb") as f:
+                for batch in _normalized(source, frame_size, batch_size, normalize, num_buffers, raw_out=f):
+                    count += len(batch.timestamps)
+                    timestamps.append(batch.timestamps.copy())
+                    indices.append(batch.frame_indices.copy())
+                    yield batch
+            width, height = frame_size
+            np.save(os.path.join(tmp, "timestamps.npy"), np.concatenate(timestamps or [np.empty(0)]))
+            np.save(os.path.join(tmp, "indices.npy"), np.concatenate(indices or [np.empty(0, np.int64)]))
+            with open(os.path.join(tmp, _META), "w", encoding="utf-8") as f:
+                json.dump({"count": count, "width": width, "height": height, "created_at": time.time()}, f)
+        except BaseException:
+            # Failed or abandoned pass (the consumer closed us early): store nothing.
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self._commit(tmp, path)
+
+    # Detection events
+
+    def load_events(self, digest: str, config: dict) -> Optional[EventTable]:
+        """The detection events stored for ``config``, memory-mapped, or None."""
+        path = self._entry(digest, "events", config_key(config))
+        meta = self._open_entry(path)
+        if meta is None:
+            return None
+        try:
+            rows = np.load(os.path.join(path, "rows.npy"), mmap_mode="r")
+        except FileNotFoundError:
+            return None  # evicted since we opened it
+        vocab = LabelVocab()
+        vocab.ids(meta["labels"])
+        return EventTable(rows, vocab)
+
+    def save_events(self, digest: str, config: dict, table: EventTable) -> None:
+        # Re-number labels densely so the entry doesn't depend on this process' vocabulary.
+        label_ids, local = np.unique(table.rows["label"], return_inverse=True)
+        rows = np.array(table.rows, dtype=EVENT_DTYPE)
+        rows["label"] = local
+        tmp = self._tmp_dir(digest)
+        np.save(os.path.join(tmp, "rows.npy"), rows)
+        with open(os.path.join(tmp, _META), "w", encoding="utf-8") as f:
+            json.dump({"labels": table.vocab.labels(label_ids), "config": config, "created_at": time.time()}, f)
+        self._commit(tmp, self._entry(digest, "events", config_key(config)))
+
+
+def _normalized(
+    source: Iterator[FrameBatch],
+    frame_size: Tuple[int, int],
+    batch_size: int,
+    normalize: bool,
+    num_buffers: int,
+    raw_out=None,
+) -> Iterator[FrameBatch]:
+    """uint8 batches as given, or converted to float32 in [0, 1] in rotating buffers."""
+    width, height = frame_size
+    buffers = (
+        [np.empty((batch_size, height, width, 3), dtype=np.float32) for _ in range(max(1, num_buffers))]
+        if normalize
+        else []
+    )
+    for emitted, batch in enumerate(source):
+        if raw_out is not None:
+            raw_out.write(np.ascontiguousarray(batch.frames).data)
+        if normalize:
+            out = buffers[emitted % len(buffers)][: len(batch.frames)]
+            np.multiply(batch.frames, 1.0 / 255.0, out=out, casting="unsafe")
+            batch = FrameBatch(frames=out, timestamps=batch.timestamps, frame_indices=batch.frame_indices)
+        yield batch
+
+
+def _read_frames(path: str, meta: dict, batch_size: int, normalize: bool, num_buffers: int) -> Iterator[FrameBatch]:
+    count, width, height = meta["count"], meta["width"], meta["height"]
+    if count == 0:
+        return iter(())
+    frames = np.memmap(os.path.join(path, "frames.u8"), dtype=np.uint8, mode="r", shape=(count, height, width, 3))
+    timestamps = np.load(os.path.join(path, "timestamps.npy"), mmap_mode="r")
+    indices = np.load(os.path.join(path, "indices.npy"), mmap_mode="r")
+    source = (
+        FrameBatch(
+            frames=frames[i : i + batch_size],
+            timestamps=timestamps[i : i + batch_size],
+            frame_indices=indices[i : i + batch_size],
+        )
+        for i in range(0, count, batch_size)
+    )
+    return _normalized(source, (width, height), batch_size, normalize, num_buffers)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+"""
+Streaming stage runner.
+
+``run_stages`` connects a source iterable and a chain of stages with
+bounded queues and runs each one in its own thread, so frame decoding
+(I/O + codec), detector inference and event aggregation overlap instead
+of running one after another. A full queue blocks the upstream stage
+(backpressure), which keeps memory flat however long the video is: at
+most ``queue_size`` items wait between any two stages.
+
+A stage is a function taking an iterator of inputs and yielding outputs,
+so stateful stages (aggregators) can flush when their input ends:
+
+    def detect(batches):
+        for batch in batches:
+            yield detector.detect(batch.frames, batch.timestamps)
+
+Heavy stage work (OpenCV, NumPy, ONNX Runtime) releases the GIL, so
+threads are enough to get real overlap.
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from service.profiling import profiled_target
+
+Stage = Callable[[Iterator[Any]], Iterable[Any]]
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+class _Stopped(Exception):
+    """Raised inside stage threads when the run is being torn down."""
+
+
+@dataclass
+class StageStats:
+    name: str
+    items_out: int = 0
+    # Time spent blocked because the downstream queue was full.
+    backpressure_seconds: float = 0.0
+
+
+@dataclass
+class RunnerStats:
+    stages: List[StageStats] = field(default_factory=list)
+
+
+def _put(q: "queue.Queue[Any]", item: Any, stop: threading.Event, stats: Optional[StageStats]) -> None:
+    started = time.perf_counter()
+    while True:
+        if stop.is_set():
+            raise _Stopped()
+        try:
+            q.put(item, timeout=0.1)
+            break
+        except queue.Full:
+            continue
+    if stats is not None:
+        stats.backpressure_seconds += time.perf_counter() - started
+
+
+def _drain(q: "queue.Queue[Any]", stop: threading.Event) -> Iterator[Any]:
+    while True:
+        try:
+            item = q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                raise _Stopped()
+            continue
+        if item is _DONE:
+            return
+        if isinstance(item, _Failure):
+            raise item.exc
+        yield item
+
+
+def run_stages(
+    source: Iterable[Any],
+    stages: Sequence[Tuple[str, Stage]],
+    *,
+    queue_size: int = 2,
+    stats: Optional[RunnerStats] = None,
+) -> Iterator[Any]:
+    """
+    Run ``source`` → stages[0] → ... → stages[-1] concurrently and yield
+    the last stage's outputs in the caller's thread.
+
+    Exceptions in any stage are re-raised to the caller. Closing the
+    returned iterator early stops and joins all stage threads.
+    """
+    if stats is None:
+        stats = RunnerStats()
+    stop = threading.Event()
+    queues: List["queue.Queue[Any]"] = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(len(stages) + 1)]
+    names = ["source"] + [name for name, _ in stages]
+    stats.stages = [StageStats(name=name) for name in names]
+    threads: List[threading.Thread] = []
+
+    def pump(index: int, items: Iterable[Any]) -> None:
+        out = queues[index]
+        stage_stats = stats.stages[index]
+        try:
+            for item in items:
+                _put(out, item, stop, stage_stats)
+                stage_stats.items_out += 1
+            _put(out, _DONE, stop, None)
+        except _Stopped:
+            return
+        except BaseException as exc:  # forwarded to the caller
+            try:
+                _put(out, _Failure(exc), stop, None)
+            except _Stopped:
+                return
+
+    def run_source() -> None:
+        pump(0, source)
+
+    def run_stage(index: int, stage: Stage) -> None:
+        def produce() -> Iterator[Any]:
+            yield from stage(_drain(queues[index - 1], stop))
+
+        pump(index, produce())
+
+    # Stage threads carry on the caller's request: same trace context, same profile.
+    threads.append(threading.Thread(target=profiled_target(run_source), name="stage-source", daemon=True))
+    for i, (name, stage) in enumerate(stages, start=1):
+        threads.append(
+            threading.Thread(target=profiled_target(run_stage), args=(i, stage), name=f"stage-{name}", daemon=True)
+        )
+
+    for t in threads:
+        t.start()
+    try:
+        yield from _drain(queues[-1], stop)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
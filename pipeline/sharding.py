@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+"""
+Segment-sharded detection for long recordings.
+
+A long video is split by frame count / FPS into contiguous time segments.
+Each segment is decoded and run through the detector in its own worker
+process, which opens its own ``cv2.VideoCapture`` and seeks straight to
+the segment start. Sampling stays on the global frame grid, so together
+the segments see exactly the frames a single sequential pass would.
+
+Per-segment track spans are merged deterministically: segments are
+combined in index order, and a track cut by a boundary (a span of one
+label ending near the end of a segment and a span of the same label
+starting near the start of the next) is stitched back into one span.
+"""
+
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+from detection.backends import DetectionStats, DetectorConfig, get_detector
+from detection.tracking import max_gap_for
+from detection.yolo_pipeline import DetectionEvent, detect_frames
+from preprocessing.motion import GateStats, MotionGate
+from preprocessing.video import VideoMetadata
+
+
+@dataclass
+class Segment:
+    index: int
+    start_frame: int
+    end_frame: int  # exclusive
+    start_seconds: float
+    end_seconds: float
+
+
+@dataclass
+class SegmentResult:
+    index: int
+    events: List[DetectionEvent]  # track spans
+    stats: DetectionStats
+    gate_stats: Optional[GateStats] = None
+
+
+@dataclass
+class ShardedStats:
+    segments: int = 0
+    detection: DetectionStats = field(default_factory=DetectionStats)
+    gate: Optional[GateStats] = None
+
+
+def plan_segments(
+    metadata: VideoMetadata,
+    max_segments: int,
+    *,
+    min_segment_seconds: float = 60.0,
+) -> List[Segment]:
+    """
+    Split the video into at most ``max_segments`` equal segments, none
+    shorter than ``min_segment_seconds`` (so short clips stay in one piece).
+    """
+    fps = metadata.fps if metadata.fps > 0 else 25.0
+    total = max(metadata.frame_count, 1)
+    by_length = int(metadata.duration_seconds // max(min_segment_seconds, 1e-6))
+    count = max(1, min(max_segments, by_length))
+    size = math.ceil(total / count)
+
+    segments: List[Segment] = []
+    for index in range(count):
+        start = index * size
+        end = min(total, start + size)
+        if start >= end:
+            break
+        segments.append(
+            Segment(
+                index=index,
+                start_frame=start,
+                end_frame=end,
+                start_seconds=start / fps,
+                end_seconds=end / fps,
+            )
+        )
+    return segments
+
+
+def detect_segment(
+    video_path: str,
+    segment: Segment,
+    config: DetectorConfig,
+    sample_fps: float,
+    gate: Optional[MotionGate] = None,
+) -> SegmentResult:
+    """Worker entry point: detect one segment with this process's detector."""
+    detector = get_detector(config)
+    stats = DetectionStats()
+    tracker = detect_frames(
+        video_path,
+        detector,
+        sample_fps=sample_fps,
+        gate=gate,
+        start_frame=segment.start_frame,
+        end_frame=segment.end_frame,
+        stats=stats,
+        decode_stats=stats.decode,
+    )
+    return SegmentResult(
+        index=segment.index,
+        events=tracker.events(),
+        stats=stats,
+        gate_stats=gate.stats if gate is not None else None,
+    )
+
+
+def merge_segment_results(
+    segments: List[Segment],
+    results: List[SegmentResult],
+    *,
+    max_gap_seconds: float = 2.0,
+) -> List[DetectionEvent]:
+    """
+    Combine per-segment spans into one start-ordered list with globally
+    unique track ids, stitching tracks that continue across a boundary.
+
+    At each boundary, spans of the previous segment that end within
+    ``max_gap_seconds`` of it are paired with same-label spans of the
+    next segment that start within ``max_gap_seconds`` of it, closest in
+    time first; each span is stitched at most once.
+    """
+    by_index = {result.index: result for result in results}
+    merged: List[DetectionEvent] = []
+    open_spans: List[DetectionEvent] = []  # spans of the previous segment that may continue
+    for segment in sorted(segments, key=lambda s: s.index):
+        result = by_index.get(segment.index)
+        events = sorted(result.events, key=lambda e: (e.time_seconds, e.label)) if result else []
+        boundary = segment.start_seconds
+
+        pairs = [
+            (event.time_seconds - (prev.end_seconds or prev.time_seconds), i, j)
+            for i, event in enumerate(events)
+            if event.time_seconds - boundary <= max_gap_seconds
+            for j, prev in enumerate(open_spans)
+            if prev.label == event.label
+            and 0 <= event.time_seconds - (prev.end_seconds or prev.time_seconds) <= max_gap_seconds
+        ]
+        stitched: Dict[int, DetectionEvent] = {}
+        used = set()
+        for _, i, j in sorted(pairs):
+            if i in stitched or j in used:
+                continue
+            stitched[i] = open_spans[j]
+            used.add(j)
+
+        next_open: List[DetectionEvent] = []
+        for i, event in enumerate(events):
+            target = stitched.get(i)
+            if target is None:
+                target = DetectionEvent(
+                    time_seconds=event.time_seconds,
+                    label=event.label,
+                    confidence=event.confidence,
+                    end_seconds=event.end_seconds,
+                    track_id=len(merged),
+                )
+                merged.append(target)
+            else:
+                # Span length as a proxy for hit count when averaging confidence.
+                before = max((target.end_seconds or target.time_seconds) - target.time_seconds, 1e-6)
+                after = max((event.end_seconds or event.time_seconds) - event.time_seconds, 1e-6)
+                target.confidence = (target.confidence * before + event.confidence * after) / (before + after)
+                target.end_seconds = event.end_seconds
+            if segment.end_seconds - (event.end_seconds or event.time_seconds) <= max_gap_seconds:
+                next_open.append(target)
+        open_spans = next_open
+
+    merged.sort(key=lambda e: (e.time_seconds, e.track_id))
+    for track_id, event in enumerate(merged):
+        event.track_id = track_id
+    return merged
+
+
+def _init_worker() -> None:
+    import cv2
+
+    # One decode thread per process; parallelism comes from the processes.
+    cv2.setNumThreads(1)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or _pool_size != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+            _pool_size = workers
+        return _pool
+
+
+def shutdown_shard_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def run_sharded_detection(
+    video_path: str,
+    metadata: VideoMetadata,
+    config: DetectorConfig,
+    *,
+    workers: int = 0,
+    min_segment_seconds: float = 60.0,
+    gate: Optional[MotionGate] = None,
+    stats: Optional[ShardedStats] = None,
+) -> List[DetectionEvent]:
+    """
+    Detect over ``video_path`` with one process per segment.
+
+    ``workers`` defaults to the number of CPUs. ``gate`` is a template:
+    each segment gets its own copy (a fresh gate per worker process).
+    """
+    if stats is None:
+        stats = ShardedStats()
+    workers = workers or os.cpu_count() or 1
+    segments = plan_segments(metadata, workers, min_segment_seconds=min_segment_seconds)
+    stats.segments = len(segments)
+
+    pool = _get_pool(workers)
+    futures = [
+        pool.submit(detect_segment, video_path, segment, config, config.sample_fps, gate)
+        for segment in segments
+    ]
+    results = [f.result() for f in futures]
+
+    for result in results:
+        stats.detection.add(result.stats)
+        if result.gate_stats is not None:
+            if stats.gate is None:
+                stats.gate = GateStats()
+            stats.gate.frames_seen += result.gate_stats.frames_seen
+            stats.gate.frames_active += result.gate_stats.frames_active
+
+    return merge_segment_results(segments, results, max_gap_seconds=max_gap_for(config.sample_fps))
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+"""
+Evidence media: still frames and short clips cut out of a source video.
+
+- ``read_frame_at`` seeks straight to a timestamp (no decoding of the
+  frames before it beyond the codec's own keyframe catch-up) and returns
+  that frame.
+- ``encode_thumbnail`` downsizes a frame and JPEG-encodes it.
+- ``cut_clip`` copies a time window into its own file. With ffmpeg on the
+  PATH the streams are copied without re-encoding (``-c copy``), so the
+  cut snaps to the keyframe at or before the start and costs about as
+  much as copying the bytes. Without ffmpeg only the window's frames are
+  decoded and re-encoded with OpenCV, never the whole video.
+"""
+
+import os
+import shutil
+import subprocess
+from typing import Optional
+
+import numpy as np
+
+
+def read_frame_at(path: str, seconds: float) -> Optional[np.ndarray]:
+    """The BGR frame shown at ``seconds`` into the video, or None if there is none."""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return None
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        cap.set(cv2.CAP_PROP_POS_FRAMES, max(0, int(seconds * fps)))
+        ok, frame = cap.read()
+        return frame if ok else None
+    finally:
+        cap.release()
+
+
+def encode_thumbnail(frame: np.ndarray, *, max_width: int = 320, quality: int = 80) -> bytes:
+    """JPEG bytes of ``frame`` scaled down to at most ``max_width`` pixels wide."""
+    import cv2
+
+    height, width = frame.shape[:2]
+    if max_width > 0 and width > max_width:
+        size = (max_width, max(1, round(height * max_width / width)))
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return encoded.tobytes()
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+def cut_clip(path: str, start: float, end: float, out_path: str, *, timeout: float = 60.0) -> bool:
+    """
+    Write the ``start``-``end`` seconds of ``path`` to ``out_path`` (an
+    ``.mp4``). Returns False if nothing could be cut.
+    """
+    if end <= start:
+        return False
+    if ffmpeg_available():
+        return _cut_stream_copy(path, start, end, out_path, timeout)
+    return _cut_reencode(path, start, end, out_path)
+
+
+def _cut_stream_copy(path: str, start: float, end: float, out_path: str, timeout: float) -> bool:
+    # -ss before -i seeks the demuxer to the keyframe at or before ``start``;
+    # with -c copy nothing is decoded.
+    command = [
+        "ffmpeg", "-v", "error", "-y",
+        "-ss", f"{start:.3f}", "-i", path, "-t", f"{end - start:.3f}",
+        "-map", "0:v:0", "-map", "0:a?", "-c", "copy",
+        "-avoid_negative_ts", "make_zero", "-movflags", "+faststart",
+        out_path,
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return False
+    return result.returncode == 0 and os.path.exists(out_path) and os.path.getsize(out_path) > 0
+
+
+def _cut_reencode(path: str, start: float, end: float, out_path: str) -> bool:
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return False
+    writer = None
+    written = 0
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        first, last = int(start * fps), int(end * fps)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+        for _ in range(max(0, last - first)):
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if writer is None:
+                height, width = frame.shape[:2]
+                writer = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+                if not writer.isOpened():
+                    return False
+            writer.write(frame)
+            written += 1
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+    return written > 0
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+"""
+Live frame ingestion.
+
+``LiveCapture`` reads a camera URL (RTSP/HTTP) or a local file through
+``cv2.VideoCapture`` as a live source:
+
+- local files are replayed at their native frame rate (real-time pacing),
+  which makes a recorded clip a stand-in for a camera;
+- network streams are read as fast as frames arrive and are reopened
+  with exponential backoff when the connection drops.
+
+Only frames on the ``target_fps`` sampling grid are decoded; the rest are
+passed over with ``grab()``. Sampled frames are resized, converted to RGB
+and written into a ``FrameRing``: a fixed-size circular buffer holding the
+most recent frames, allocated once. The ring has a single writer (the
+capture thread) and any number of readers; a reader that falls behind by
+more than the ring's capacity loses the overwritten frames, which are
+counted as dropped rather than stalling capture.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class RingFrame:
+    seq: int  # 0-based position in the sampled stream
+    stream_seconds: float  # position in the video / time since the stream started
+    captured_at: float  # time.monotonic() when the frame was read
+
+
+class FrameRing:
+    """
+    Circular buffer of the last ``capacity`` sampled frames, each
+    (height, width, 3) uint8 RGB.
+    """
+
+    def __init__(self, capacity: int, frame_size: Tuple[int, int]) -> None:
+        width, height = frame_size
+        self.capacity = max(1, capacity)
+        self.frame_size = frame_size
+        self.frames = np.zeros((self.capacity, height, width, 3), dtype=np.uint8)
+        self._seq = np.full(self.capacity, -1, dtype=np.int64)
+        self._stream_seconds = np.zeros(self.capacity, dtype=np.float64)
+        self._captured_at = np.zeros(self.capacity, dtype=np.float64)
+        self._next = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        # Called after every commit and on close (e.g. to wake a scheduler polling several rings).
+        self.on_commit: Optional[Callable[[], None]] = None
+
+    @property
+    def next_seq(self) -> int:
+        """Sequence number the next written frame will get."""
+        return self._next
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def slot(self) -> np.ndarray:
+        """Buffer the next frame should be written into (then ``commit``)."""
+        index = self._next % self.capacity
+        # Invalidate first so readers copying the old frame notice the overwrite.
+        self._seq[index] = -1
+        return self.frames[index]
+
+    def commit(self, stream_seconds: float, captured_at: float) -> int:
+        """Publish the frame written into ``slot()``; returns its sequence number."""
+        with self._cond:
+            seq = self._next
+            index = seq % self.capacity
+            self._seq[index] = seq
+            self._stream_seconds[index] = stream_seconds
+            self._captured_at[index] = captured_at
+            self._next += 1
+            self._cond.notify_all()
+        if self.on_commit is not None:
+            self.on_commit()
+        return seq
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self.on_commit is not None:
+            self.on_commit()
+
+    def wait(self, after_seq: int, timeout: float) -> bool:
+        """Wait until a frame newer than ``after_seq`` exists (or the ring closes)."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._next > after_seq + 1 or self._closed, timeout)
+
+    def oldest_seq(self) -> int:
+        return max(0, self._next - self.capacity)
+
+    def meta(self, seq: int) -> Optional[Tuple[float, float]]:
+        """(stream_seconds, captured_at) of frame ``seq``, or None if it was overwritten."""
+        index = seq % self.capacity
+        stream_seconds, captured_at = float(self._stream_seconds[index]), float(self._captured_at[index])
+        if self._seq[index] != seq:
+            return None
+        return stream_seconds, captured_at
+
+    def read(self, seqs: List[int], out: np.ndarray) -> List[RingFrame]:
+        """
+        Copy the frames ``seqs`` into ``out[:n]`` (converted to ``out``'s
+        dtype; float output is scaled to [0, 1]) and return their metadata.
+        Frames overwritten before or during the copy are left out; the
+        returned list says which were read, in order.
+        """
+        read: List[RingFrame] = []
+        scale = 1.0 / 255.0 if out.dtype != np.uint8 else None
+        for seq in seqs:
+            index = seq % self.capacity
+            if self._seq[index] != seq:
+                continue
+            target = out[len(read)]
+            if scale is None:
+                np.copyto(target, self.frames[index])
+            else:
+                np.multiply(self.frames[index], scale, out=target, casting="unsafe")
+            # The writer may have started overwriting the slot while we copied.
+            if self._seq[index] != seq:
+                continue
+            read.append(
+                RingFrame(
+                    seq=seq,
+                    stream_seconds=float(self._stream_seconds[index]),
+                    captured_at=float(self._captured_at[index]),
+                )
+            )
+        return read
+
+
+@dataclass
+class CaptureStats:
+    frames_read: int = 0  # every frame pulled from the source
+    frames_sampled: int = 0  # frames decoded into the ring
+    reconnects: int = 0
+    started_at: float = 0.0
+
+    @property
+    def sampled_fps(self) -> float:
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return self.frames_sampled / elapsed if elapsed > 0 else 0.0
+
+
+def is_network_source(source: str) -> bool:
+    return "://" in source
+
+
+class LiveCapture:
+    """
+    Reads ``source`` into ``ring`` at ``target_fps`` until ``stop`` is set
+    or a file source ends. Run ``run()`` in its own thread.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        ring: FrameRing,
+        *,
+        target_fps: float = 2.0,
+        realtime: Optional[bool] = None,
+        max_reconnects: int = 10,
+        stats: Optional[CaptureStats] = None,
+    ) -> None:
+        self.source = source
+        self.ring = ring
+        self.target_fps = target_fps
+        self.network = is_network_source(source)
+        # Files replay at native speed unless told otherwise; network streams pace themselves.
+        self.realtime = (not self.network) if realtime is None else realtime
+        self.max_reconnects = max_reconnects
+        self.stats = stats if stats is not None else CaptureStats()
+        self.stop = threading.Event()
+        self.error: Optional[str] = None
+
+    def _open(self) -> cv2.VideoCapture:
+        import cv2
+
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            raise ValueError(f"Could not open stream: {self.source}")
+        return cap
+
+    def _reconnect(self) -> Optional[cv2.VideoCapture]:
+        """Reopen a dropped network stream with exponential backoff; None if it stays down."""
+        for attempt in range(1, self.max_reconnects + 1):
+            self.stats.reconnects += 1
+            if self.stop.wait(min(30.0, 0.5 * 2 ** attempt)):
+                return None
+            try:
+                return self._open()
+            except ValueError:
+                continue
+        self.error = f"Stream lost after {self.max_reconnects} reconnect attempts: {self.source}"
+        return None
+
+    def run(self) -> None:
+        try:
+            self._run()
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.ring.close()
+
+    def _run(self) -> None:
+        import cv2
+
+        cap = self._open()
+        width, height = self.ring.frame_size
+        resized = np.empty((height, width, 3), dtype=np.uint8)
+        raw: Optional[np.ndarray] = None
+        self.stats.started_at = time.monotonic()
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            stride = max(fps / max(self.target_fps, 1e-6), 1.0)
+            position = 0  # frames read since the stream (re)started
+            sample = 0
+            epoch = time.monotonic()
+            offset = 0.0  # stream seconds before the latest reconnect
+
+            while not self.stop.is_set():
+                if self.realtime:
+                    delay = epoch + position / fps - time.monotonic()
+                    if delay > 0:
+                        self.stop.wait(delay)
+                        if self.stop.is_set():
+                            break
+                if not cap.grab():
+                    if not self.network:
+                        break
+                    cap.release()
+                    cap = self._reconnect()
+                    if cap is None:
+                        break
+                    offset += position / fps
+                    position, sample, epoch = 0, 0, time.monotonic()
+                    continue
+                captured_at = time.monotonic()
+                self.stats.frames_read += 1
+                if position == int(round(sample * stride)):
+                    ok, decoded = cap.retrieve(raw)
+                    if ok:
+                        raw = decoded
+                        cv2.resize(decoded, (width, height), dst=resized, interpolation=cv2.INTER_AREA)
+                        cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=self.ring.slot())
+                        self.ring.commit(offset + position / fps, captured_at)
+                        self.stats.frames_sampled += 1
+                    sample += 1
+                position += 1
+        finally:
+            cap.release()
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+"""
+Motion / scene-change gating.
+
+Most CCTV footage is a static scene. ``MotionGate`` looks at heavily
+downscaled grayscale versions of sampled frames and marks a frame
+"active" only if enough pixels changed, either relative to the previous
+frame ("diff") or to a running-average background model ("background").
+Only active frames are passed on to detection, and runs of active frames
+are merged into ``MotionSegment`` time ranges.
+
+The per-batch work is vectorized over the whole (N, H, W, 3) batch
+produced by ``iter_frame_batches``.
+"""
+
+from dataclasses import dataclass
+from functools import partial
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from preprocessing.video import DecodeStats, FrameBatch, FrameSource, iter_frame_batches
+
+# BT.601 luma weights for RGB input.
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+@dataclass
+class MotionSegment:
+    start_seconds: float
+    end_seconds: float
+
+
+@dataclass
+class GateStats:
+    frames_seen: int = 0
+    frames_active: int = 0
+
+    @property
+    def skip_ratio(self) -> float:
+        if self.frames_seen == 0:
+            return 0.0
+        return 1.0 - self.frames_active / self.frames_seen
+
+
+class MotionGate:
+    """
+    Stateful frame-change detector; feed batches in time order.
+
+    - ``pixel_threshold``: per-pixel intensity change (0-1) that counts as
+      "changed". Lower is more sensitive.
+    - ``min_changed_fraction``: fraction of changed pixels needed to call a
+      frame active. Lower is more sensitive.
+    - ``downscale``: spatial stride used before comparing frames.
+    - ``background_alpha``: learning rate of the background model.
+    """
+
+    def __init__(
+        self,
+        *,
+        method: str = "diff",
+        pixel_threshold: float = 0.06,
+        min_changed_fraction: float = 0.002,
+        downscale: int = 8,
+        background_alpha: float = 0.05,
+    ) -> None:
+        if method not in ("diff", "background"):
+            raise ValueError(f"Unknown motion method: {method!r} (expected 'diff' or 'background')")
+        self.method = method
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.downscale = max(1, downscale)
+        self.background_alpha = background_alpha
+        self.stats = GateStats()
+        self._reference: Optional[np.ndarray] = None  # last frame ("diff") or background model
+        self._active_buffer: Optional[np.ndarray] = None
+
+    def _gray(self, frames: np.ndarray) -> np.ndarray:
+        small = frames[:, :: self.downscale, :: self.downscale]
+        gray = small @ _LUMA if small.dtype == np.float32 else small.astype(np.float32) @ _LUMA
+        if frames.dtype == np.uint8:
+            gray *= 1.0 / 255.0
+        return gray
+
+    def active_mask(self, frames: np.ndarray) -> np.ndarray:
+        """Boolean (N,) mask of frames that differ enough from the scene."""
+        gray = self._gray(frames)
+        n = gray.shape[0]
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+
+        if self.method == "diff":
+            if self._reference is None:
+                previous = np.concatenate([gray[:1], gray[:-1]])
+            else:
+                previous = np.concatenate([self._reference[None], gray[:-1]])
+            changed = np.abs(gray - previous) > self.pixel_threshold
+            fractions = changed.mean(axis=(1, 2))
+            mask = fractions > self.min_changed_fraction
+            if self._reference is None:
+                # Nothing to compare the very first frame to: treat it as a scene start.
+                mask[0] = True
+            self._reference = gray[-1].copy()
+        else:
+            mask = np.empty(n, dtype=bool)
+            background = self._reference
+            for i in range(n):
+                if background is None:
+                    background = gray[i].copy()
+                    mask[i] = True
+                    continue
+                changed = np.abs(gray[i] - background) > self.pixel_threshold
+                mask[i] = changed.mean() > self.min_changed_fraction
+                background += self.background_alpha * (gray[i] - background)
+            self._reference = background
+
+        self.stats.frames_seen += n
+        self.stats.frames_active += int(mask.sum())
+        return mask
+
+    def filter(self, batch: FrameBatch) -> Optional[FrameBatch]:
+        """
+        Return a batch holding only the active frames (None if there are
+        none). The result lives in a buffer owned by the gate and is
+        overwritten by the next call.
+        """
+        mask = self.active_mask(batch.frames)
+        count = int(mask.sum())
+        if count == 0:
+            return None
+        if count == len(mask):
+            return batch
+        buffer = self._active_buffer
+        if (
+            buffer is None
+            or buffer.shape[1:] != batch.frames.shape[1:]
+            or buffer.dtype != batch.frames.dtype
+            or buffer.shape[0] < count
+        ):
+            buffer = np.empty((len(mask),) + batch.frames.shape[1:], dtype=batch.frames.dtype)
+            self._active_buffer = buffer
+        frames = buffer[:count]
+        np.compress(mask, batch.frames, axis=0, out=frames)
+        return FrameBatch(
+            frames=frames,
+            timestamps=batch.timestamps[mask],
+            frame_indices=batch.frame_indices[mask],
+        )
+
+
+def merge_active_times(
+    timestamps: Iterable[float],
+    *,
+    sample_interval: float,
+    hangover_seconds: float = 1.0,
+) -> List[MotionSegment]:
+    """
+    Merge active frame timestamps into segments. Gaps shorter than
+    ``hangover_seconds`` plus one sample interval are bridged.
+    """
+    segments: List[MotionSegment] = []
+    max_gap = sample_interval + hangover_seconds
+    for t in timestamps:
+        if segments and t - segments[-1].end_seconds <= max_gap:
+            segments[-1].end_seconds = t + sample_interval
+        else:
+            segments.append(MotionSegment(start_seconds=t, end_seconds=t + sample_interval))
+    return segments
+
+
+def detect_motion_segments(
+    path: str,
+    *,
+    sample_fps: float = 2.0,
+    gate: Optional[MotionGate] = None,
+    frame_size: Tuple[int, int] = (160, 96),
+    hangover_seconds: float = 1.0,
+    decode_stats: Optional[DecodeStats] = None,
+    frames: Optional[FrameSource] = None,
+) -> Tuple[List[MotionSegment], GateStats]:
+    """
+    Scan ``path`` at ``sample_fps`` with small uint8 frames and return the
+    active time segments plus the gate's skip statistics. ``frames``
+    replaces decoding ``path`` (see ``FrameSource``).
+    """
+    if gate is None:
+        gate = MotionGate()
+
+    active_times: List[float] = []
+    batches = (frames or partial(iter_frame_batches, path))(
+        target_fps=sample_fps,
+        batch_size=64,
+        frame_size=frame_size,
+        normalize=False,
+        stats=decode_stats,
+    )
+    for batch in batches:
+        mask = gate.active_mask(batch.frames)
+        active_times.extend(batch.timestamps[mask].tolist())
+
+    segments = merge_active_times(
+        active_times,
+        sample_interval=1.0 / max(sample_fps, 1e-6),
+        hangover_seconds=hangover_seconds,
+    )
+    return segments, gate.stats
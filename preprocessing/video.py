@@ -3,18 +3,23 @@ from __future__ import annotations
 """
 Preprocessing utilities for CCTV video.
 
-For the full project you might:
-- Extract frames at a fixed FPS
-- Perform denoising, resizing, normalization
-- Feed frames to a YOLO detector or feature extractor
+- ``extract_video_metadata`` reads duration / FPS / frame count.
+- ``iter_frame_batches`` samples frames at a fixed target FPS, resizes
+  and normalizes them, and hands them to the detector in contiguous
+  (N, H, W, 3) batches.
 
-Here we keep it lightweight and focus on metadata, so the end-to-end
-pipeline runs quickly even without heavy models.
+Frame sampling skips unwanted frames with ``grab()`` (no colour
+conversion / copy) or, for large strides, a direct seek, so only the
+frames we keep are fully decoded. Batches are written into buffers that
+are allocated once and reused, so steady-state decoding does no per-frame
+allocation.
 """
 
+import time
 from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, Tuple
 
-import cv2
+import numpy as np
 
 
 @dataclass
@@ -25,6 +30,44 @@ class VideoMetadata:
     duration_seconds: float
 
 
+@dataclass
+class DecodeStats:
+    """Counters filled in by ``iter_frame_batches``."""
+
+    frames_decoded: int = 0  # frames fully retrieved and converted
+    frames_skipped: int = 0  # frames passed over via grab() or seek
+    seeks: int = 0
+    batches: int = 0
+    decode_seconds: float = 0.0
+    bytes_allocated: int = 0  # batch buffers and scratch images, allocated once
+
+    @property
+    def decoded_fps(self) -> float:
+        if self.decode_seconds <= 0:
+            return 0.0
+        return self.frames_decoded / self.decode_seconds
+
+
+@dataclass
+class FrameBatch:
+    """
+    A batch of sampled frames.
+
+    ``frames`` is a view into a buffer that is overwritten by the next
+    batch; copy it if it has to outlive the iteration step.
+    """
+
+    frames: np.ndarray  # (n, H, W, 3) RGB, float32 in [0, 1] or uint8
+    timestamps: np.ndarray  # (n,) seconds from the start of the video
+    frame_indices: np.ndarray  # (n,) source frame numbers
+
+
+# A video's sampled frames: called with ``iter_frame_batches``' sampling
+# keywords (target_fps, frame_size, batch_size, normalize, num_buffers,
+# stats), returns batches on the same grid; e.g. a feature store reader.
+FrameSource = Callable[..., Iterator[FrameBatch]]
+
+
 def extract_video_metadata(path: str) -> VideoMetadata:
     """
     Read basic metadata from a video file using OpenCV.
@@ -32,6 +75,8 @@ def extract_video_metadata(path: str) -> VideoMetadata:
     If anything goes wrong, fall back to 5 minutes as a safe default
     so that the rest of the pipeline can still operate.
     """
+    import cv2
+
     cap = cv2.VideoCapture(path)
     if not cap.isOpened():
         # Fallback defaults
@@ -51,3 +96,137 @@ def extract_video_metadata(path: str) -> VideoMetadata:
         duration_seconds=duration_seconds,
     )
 
+
+def iter_frame_batches(
+    path: str,
+    *,
+    target_fps: float = 2.0,
+    batch_size: int = 16,
+    frame_size: Tuple[int, int] = (640, 640),
+    normalize: bool = True,
+    seek_threshold: int = 48,
+    num_buffers: int = 1,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+    stats: Optional[DecodeStats] = None,
+) -> Iterator[FrameBatch]:
+    """
+    Yield batches of frames sampled at ``target_fps``.
+
+    - ``frame_size`` is (width, height) of the output frames.
+    - ``normalize`` gives float32 RGB in [0, 1]; otherwise uint8 RGB.
+    - Gaps of more than ``seek_threshold`` frames are crossed with a seek
+      instead of grabbing every frame in between.
+    - ``num_buffers`` batch buffers are used in rotation, so up to
+      ``num_buffers - 1`` earlier batches stay valid while the next one is
+      decoded (needed when a consumer runs behind in another thread).
+    - ``start_frame`` / ``end_frame`` restrict sampling to that frame range
+      (end exclusive). Samples stay on the same global grid as a full
+      pass, so adjacent ranges together see exactly the same frames.
+    - ``stats`` (optional) is updated with decode counters as we go.
+    """
+    import cv2
+
+    if stats is None:
+        stats = DecodeStats()
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {path}")
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        stride = max(fps / max(target_fps, 1e-6), 1.0)
+
+        width, height = frame_size
+        dtype = np.float32 if normalize else np.uint8
+        # Allocated once and reused in rotation for every batch.
+        buffers = [
+            (
+                np.empty((batch_size, height, width, 3), dtype=dtype),
+                np.empty(batch_size, dtype=np.float64),
+                np.empty(batch_size, dtype=np.int64),
+            )
+            for _ in range(max(1, num_buffers))
+        ]
+        frames, timestamps, indices = buffers[0]
+        resized = np.empty((height, width, 3), dtype=np.uint8)
+        rgb = np.empty((height, width, 3), dtype=np.uint8) if normalize else None
+        raw: Optional[np.ndarray] = None
+        stats.bytes_allocated += len(buffers) * (frames.nbytes + timestamps.nbytes + indices.nbytes)
+        stats.bytes_allocated += resized.nbytes
+        if rgb is not None:
+            stats.bytes_allocated += rgb.nbytes
+
+        position = 0  # index of the next frame the capture will return
+        sample = int(start_frame // stride)
+        while int(round(sample * stride)) < start_frame:
+            sample += 1
+        filled = 0
+        emitted = 0
+        started = time.perf_counter()
+
+        while True:
+            target = int(round(sample * stride))
+            if frame_count and target >= frame_count:
+                break
+            if end_frame is not None and target >= end_frame:
+                break
+
+            gap = target - position
+            if gap > seek_threshold:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                stats.seeks += 1
+                stats.frames_skipped += gap
+                position = target
+            else:
+                while position < target:
+                    if not cap.grab():
+                        break
+                    position += 1
+                    stats.frames_skipped += 1
+                if position < target:
+                    break
+
+            if not cap.grab():
+                break
+            ok, decoded = cap.retrieve(raw)
+            position += 1
+            if not ok:
+                break
+            if raw is None:
+                raw = decoded
+                stats.bytes_allocated += raw.nbytes
+
+            cv2.resize(decoded, (width, height), dst=resized, interpolation=cv2.INTER_AREA)
+            if normalize:
+                cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=rgb)
+                np.multiply(rgb, 1.0 / 255.0, out=frames[filled], casting="unsafe")
+            else:
+                cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=frames[filled])
+            timestamps[filled] = target / fps
+            indices[filled] = target
+            filled += 1
+            sample += 1
+            stats.frames_decoded += 1
+
+            if filled == batch_size:
+                stats.decode_seconds += time.perf_counter() - started
+                stats.batches += 1
+                yield FrameBatch(frames=frames, timestamps=timestamps, frame_indices=indices)
+                emitted += 1
+                frames, timestamps, indices = buffers[emitted % len(buffers)]
+                filled = 0
+                started = time.perf_counter()
+
+        if filled:
+            stats.decode_seconds += time.perf_counter() - started
+            stats.batches += 1
+            yield FrameBatch(
+                frames=frames[:filled],
+                timestamps=timestamps[:filled],
+                frame_indices=indices[:filled],
+            )
+    finally:
+        cap.release()
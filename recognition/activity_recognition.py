@@ -10,80 +10,200 @@ In a full implementation, you could:
 - Encode YOLO detections into feature vectors
 - Feed sequences into an LSTM/GRU/Transformer
 - Predict activity classes over time
+
+Activities keep their time as float seconds into the video; the
+``mm:ss`` timestamp is only formatted for API responses and narrative
+text. ``ActivityTable`` is the columnar form of a timeline (see
+``detection.event_table``): label ids, uint8 type codes and float32
+confidences, with vectorized sorting, filtering, risk and per-window
+type counts.
 """
 
 from dataclasses import dataclass
-from typing import List
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
 
+from detection.event_table import LABELS, EventTable, LabelVocab, confidence_list
 from detection.yolo_pipeline import DetectionEvent
+from recognition.rules import ACTIVITY_TYPES, RuleSet, get_rule_set
+
+# Type codes are indexes into ACTIVITY_TYPES, which is ordered by risk.
+TYPE_CODES = {t: code for code, t in enumerate(ACTIVITY_TYPES)}
+RISK_LEVELS = ("low", "medium", "high")  # by highest type code
+
+ACTIVITY_DTYPE = np.dtype(
+    [
+        ("time", np.float64),  # seconds into the video
+        ("label", np.int32),
+        ("type", np.uint8),  # TYPE_CODES
+        ("confidence", np.float32),
+    ]
+)
 
 
-@dataclass
+def format_timestamp(seconds: float) -> str:
+    seconds = max(0, int(seconds))
+    m, s = divmod(seconds, 60)
+    return f"{m:02d}:{s:02d}"
+
+
+@dataclass(slots=True)
 class ActivityItem:
-    timestamp: str
+    time_seconds: float  # offset into the video
     label: str
     type: str  # "normal" | "warning" | "danger"
     confidence: float
 
+    @property
+    def timestamp(self) -> str:
+        return format_timestamp(self.time_seconds)
+
+    def to_dict(self) -> dict:
+        """The API ``Activity`` shape: the time as an ``mm:ss`` timestamp and in seconds."""
+        return {
+            "timestamp": self.timestamp,
+            "time_seconds": self.time_seconds,
+            "label": self.label,
+            "type": self.type,
+            "confidence": self.confidence,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ActivityItem":
+        return cls(
+            time_seconds=data["time_seconds"],
+            label=data["label"],
+            type=data["type"],
+            confidence=data["confidence"],
+        )
 
-def _format_timestamp(seconds: float) -> str:
-    seconds = max(0, int(seconds))
-    m, s = divmod(seconds, 60)
-    return f"{m:02d}:{s:02d}"
+
+def normal_activity() -> ActivityItem:
+    """Placeholder item for a timeline in which nothing was recognized."""
+    return ActivityItem(
+        time_seconds=0.0,
+        label="Normal activity detected in surveillance area",
+        type="normal",
+        confidence=0.9,
+    )
+
+
+class ActivityTable:
+    """An activity timeline as a structured array (see the module docstring)."""
+
+    __slots__ = ("rows", "vocab")
+
+    def __init__(self, rows: Optional[np.ndarray] = None, vocab: LabelVocab = LABELS) -> None:
+        self.rows = rows if rows is not None else np.empty(0, dtype=ACTIVITY_DTYPE)
+        self.vocab = vocab
+
+    @classmethod
+    def from_events(cls, events: EventTable, rules: RuleSet) -> "ActivityTable":
+        """One activity per event, typed by the label rules (looked up once per distinct label)."""
+        labels = events.rows["label"]
+        distinct, inverse = np.unique(labels, return_inverse=True)
+        codes = np.array(
+            [TYPE_CODES[rules.activity_type(label)] for label in events.vocab.labels(distinct)], dtype=np.uint8
+        )
+        rows = np.empty(len(labels), dtype=ACTIVITY_DTYPE)
+        rows["time"] = events.rows["time"]
+        rows["label"] = labels
+        rows["type"] = codes[inverse] if len(distinct) else 0
+        rows["confidence"] = events.rows["confidence"]
+        return cls(rows, events.vocab)
+
+    @classmethod
+    def from_items(cls, items: Sequence[ActivityItem], vocab: LabelVocab = LABELS) -> "ActivityTable":
+        rows = np.empty(len(items), dtype=ACTIVITY_DTYPE)
+        rows["time"] = [a.time_seconds for a in items]
+        rows["label"] = vocab.ids(a.label for a in items)
+        rows["type"] = [TYPE_CODES[a.type] for a in items]
+        rows["confidence"] = [a.confidence for a in items]
+        return cls(rows, vocab)
+
+    def to_items(self) -> List[ActivityItem]:
+        rows = self.rows
+        return [
+            ActivityItem(time_seconds=t, label=label, type=ACTIVITY_TYPES[code], confidence=c)
+            for t, label, code, c in zip(
+                rows["time"].tolist(),
+                self.vocab.labels(rows["label"]),
+                rows["type"].tolist(),
+                confidence_list(rows["confidence"]),
+            )
+        ]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes
+
+    def take(self, index: np.ndarray) -> "ActivityTable":
+        return ActivityTable(self.rows[index], self.vocab)
+
+    def sorted(self) -> "ActivityTable":
+        """Chronological order (stable, so simultaneous activities keep their order)."""
+        return self.take(np.argsort(self.rows["time"], kind="stable"))
+
+    def select(
+        self,
+        *,
+        types: Optional[Iterable[str]] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> "ActivityTable":
+        """Activities of one of ``types`` in [since, until)."""
+        rows = self.rows
+        mask = np.ones(len(rows), dtype=bool)
+        if types is not None:
+            mask &= np.isin(rows["type"], [TYPE_CODES[t] for t in types])
+        if since is not None:
+            mask &= rows["time"] >= since
+        if until is not None:
+            mask &= rows["time"] < until
+        return self.take(mask)
+
+    def risk_level(self) -> str:
+        return RISK_LEVELS[int(self.rows["type"].max())] if len(self.rows) else "low"
+
+    def window_counts(self, window_seconds: float, windows: Optional[int] = None) -> np.ndarray:
+        """(windows, len(ACTIVITY_TYPES)) activities per window of ``window_seconds``, by type."""
+        n_types = len(ACTIVITY_TYPES)
+        window = np.floor(self.rows["time"] / window_seconds).astype(np.int64)
+        if windows is None:
+            windows = int(window.max()) + 1 if len(window) else 0
+        keep = (window >= 0) & (window < windows)
+        flat = window[keep] * n_types + self.rows["type"][keep]
+        return np.bincount(flat, minlength=windows * n_types).reshape(windows, n_types)
 
 
 def build_activity_timeline(
     detection_events: List[DetectionEvent],
     duration_seconds: float,
+    rules: Optional[RuleSet] = None,
 ) -> List[ActivityItem]:
     """
-    Simple rule-based mapping from detection events to activity items.
+    Rule-based mapping from detection events to activity items.
 
-    This mirrors your example:
+    ``rules`` defaults to the bundled rule set (see ``recognition.rules``),
+    which mirrors your example:
       - Entry
       - Loitering
       - Unauthorized Access
       - Theft
       - Exit
     """
-    activities: List[ActivityItem] = []
-
-    for event in detection_events:
-        label_lower = event.label.lower()
-        if "enter" in label_lower:
-            a_type = "normal"
-        elif "loiter" in label_lower:
-            a_type = "warning"
-        elif "unauthorized" in label_lower or "access" in label_lower:
-            a_type = "danger"
-        elif "theft" in label_lower or "object" in label_lower:
-            a_type = "danger"
-        elif "exit" in label_lower:
-            a_type = "normal"
-        else:
-            a_type = "normal"
-
-        activities.append(
-            ActivityItem(
-                timestamp=_format_timestamp(event.time_seconds),
-                label=event.label,
-                type=a_type,
-                confidence=event.confidence,
-            )
-        )
+    if rules is None:
+        rules = get_rule_set()
+    # Typed and sorted chronologically (by seconds, not the mm:ss string) in columnar form.
+    table = ActivityTable.from_events(EventTable.from_events(detection_events), rules).sorted()
+    activities = table.to_items()
 
     # If no events were produced, synthesize a generic "Normal activity" item.
     if not activities:
-        activities.append(
-            ActivityItem(
-                timestamp="00:00",
-                label="Normal activity detected in surveillance area",
-                type="normal",
-                confidence=0.9,
-            )
-        )
-
-    # Ensure activities are sorted by time
-    activities.sort(key=lambda a: a.timestamp)
+        activities.append(normal_activity())
     return activities
 
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+"""
+Declarative label rules shared by activity recognition and alerting.
+
+A rule set is a JSON document mapping label patterns to an activity type
+and, optionally, the alert raised for it:
+
+    {
+      "default_type": "normal",
+      "rules": [
+        {"name": "loitering", "patterns": ["loiter"], "type": "warning",
+         "alert": {"title": "Suspicious Behavior Detected", "severity": "warning"}},
+        ...
+      ]
+    }
+
+Patterns are case-insensitive substrings (or regular expressions with
+``"regex": true``). Rules are tried in file order and the first one that
+matches a label wins, as the old if/elif chains did.
+
+Literal patterns are compiled once into an Aho-Corasick automaton, so a
+label is scanned in a single pass however many rules there are; regex
+patterns share one combined expression. Every distinct label's result is
+memoized in a lookup table, so for a fixed taxonomy the per-event cost is
+one dict lookup.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), "default_rules.json")
+
+ACTIVITY_TYPES = ("normal", "warning", "danger")
+ALERT_SEVERITIES = ("warning", "critical")
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    activity_type: str  # "normal" | "warning" | "danger"
+    alert_title: Optional[str] = None
+    alert_severity: Optional[str] = None  # "warning" | "critical"
+
+
+class _Automaton:
+    """Aho-Corasick matcher returning the lowest rule index found in a text."""
+
+    def __init__(self, keywords: List[Tuple[str, int]]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._best: List[Optional[int]] = [None]  # lowest rule index ending here (incl. suffixes)
+        for keyword, index in keywords:
+            node = 0
+            for ch in keyword:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._best.append(None)
+                node = nxt
+            if self._best[node] is None or index < self._best[node]:
+                self._best[node] = index
+
+        self._fail = [0] * len(self._goto)
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for ch, child in self._goto[node].items():
+                pending.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                inherited = self._best[self._fail[child]]
+                if inherited is not None and (self._best[child] is None or inherited < self._best[child]):
+                    self._best[child] = inherited
+
+    def lowest(self, text: str) -> Optional[int]:
+        goto, fail, best_at = self._goto, self._fail, self._best
+        node = 0
+        best: Optional[int] = None
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            found = best_at[node]
+            if found is not None and (best is None or found < best):
+                best = found
+                if best == 0:
+                    break
+        return best
+
+
+class RuleSet:
+    """Compiled rules; build with ``load_rule_set`` or ``RuleSet.from_dict``."""
+
+    def __init__(
+        self,
+        rules: List[Rule],
+        literals: List[List[str]],
+        regexes: List[List[str]],
+        *,
+        default_type: str = "normal",
+        digest: str = "",
+        max_cached_labels: int = 65536,
+    ) -> None:
+        """``literals[i]`` / ``regexes[i]`` are the patterns of ``rules[i]``."""
+        self.rules = rules
+        self.default_type = default_type
+        self.digest = digest
+        self.max_cached_labels = max_cached_labels
+        self._automaton = _Automaton(
+            [(p.casefold(), index) for index, group in enumerate(literals) for p in group if p]
+        )
+        # Zero-width lookahead: finditer reports the first (highest-priority)
+        # rule matching at every position, so overlapping matches are not lost.
+        alternatives = [f"(?P<r{index}>{'|'.join(group)})" for index, group in enumerate(regexes) if group]
+        self._pattern = re.compile(f"(?=(?:{'|'.join(alternatives)}))", re.IGNORECASE) if alternatives else None
+        self._cache: Dict[str, Optional[Rule]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, config: dict, **kwargs) -> "RuleSet":
+        default_type = config.get("default_type", "normal")
+        if default_type not in ACTIVITY_TYPES:
+            raise ValueError(f"Invalid default_type: {default_type!r} (expected one of {ACTIVITY_TYPES})")
+
+        rules: List[Rule] = []
+        literals: List[List[str]] = []
+        regexes: List[List[str]] = []
+        for index, entry in enumerate(config.get("rules", [])):
+            name = entry.get("name") or f"rule {index}"
+            activity_type = entry.get("type")
+            if activity_type not in ACTIVITY_TYPES:
+                raise ValueError(f"Rule {name!r}: invalid type {activity_type!r} (expected one of {ACTIVITY_TYPES})")
+            alert = entry.get("alert") or {}
+            severity = alert.get("severity")
+            if alert and severity not in ALERT_SEVERITIES:
+                raise ValueError(f"Rule {name!r}: invalid alert severity {severity!r} (expected one of {ALERT_SEVERITIES})")
+            raw = entry.get("patterns") or []
+            if not raw:
+                raise ValueError(f"Rule {name!r} has no patterns")
+            if entry.get("regex"):
+                for pattern in raw:
+                    try:
+                        compiled = re.compile(pattern)
+                    except re.error as e:
+                        raise ValueError(f"Rule {name!r}: invalid pattern {pattern!r}: {e}") from e
+                    if compiled.groupindex:
+                        raise ValueError(f"Rule {name!r}: named groups are not allowed in patterns ({pattern!r})")
+                literals.append([])
+                regexes.append(list(raw))
+            else:
+                literals.append(list(raw))
+                regexes.append([])
+            rules.append(Rule(name=name, activity_type=activity_type, alert_title=alert.get("title"), alert_severity=severity))
+
+        digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        return cls(rules, literals, regexes, default_type=default_type, digest=digest, **kwargs)
+
+    def match(self, label: str) -> Optional[Rule]:
+        """First rule matching ``label``, or None."""
+        try:
+            return self._cache[label]
+        except KeyError:
+            pass
+        rule = self._scan(label)
+        with self._lock:
+            if len(self._cache) >= self.max_cached_labels:
+                self._cache.clear()
+            self._cache[label] = rule
+        return rule
+
+    def activity_type(self, label: str) -> str:
+        rule = self.match(label)
+        return rule.activity_type if rule is not None else self.default_type
+
+    def _scan(self, label: str) -> Optional[Rule]:
+        best = self._automaton.lowest(label.casefold())
+        if self._pattern is not None:
+            best = self._scan_regex(label, best)
+        return self.rules[best] if best is not None else None
+
+    def _scan_regex(self, label: str, best: Optional[int]) -> Optional[int]:
+        for m in self._pattern.finditer(label):
+            index = int(m.lastgroup[1:])
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return best
+
+
+def load_rule_set(path: str = "") -> RuleSet:
+    """Load and compile a rule file (the bundled defaults if ``path`` is empty)."""
+    with open(path or DEFAULT_RULES_PATH, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    return RuleSet.from_dict(config)
+
+
+_rule_sets: Dict[str, RuleSet] = {}
+_rule_sets_lock = threading.Lock()
+
+
+def get_rule_set(path: str = "") -> RuleSet:
+    """
+    Process-wide compiled rule set for ``path``, loaded on first use and
+    reused afterwards.
+    """
+    rule_set = _rule_sets.get(path)
+    if rule_set is not None:
+        return rule_set
+    with _rule_sets_lock:
+        rule_set = _rule_sets.get(path)
+        if rule_set is None:
+            rule_set = load_rule_set(path)
+            _rule_sets[path] = rule_set
+    return rule_set
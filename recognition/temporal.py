@@ -0,0 +1,357 @@
+from __future__ import annotations
+
+"""
+Temporal activity recognition backends.
+
+A ``TemporalRecognizer`` turns detection events into timeline activities.
+Backends are selected by ``RecognizerConfig.backend``:
+
+- ``rules``: the label rule map of ``build_activity_timeline`` (default,
+  and the fallback when no sequence model is configured).
+- ``gru``: a small GRU run with NumPy over per-window feature vectors.
+
+The GRU backend slides a window of ``window_seconds`` over the video with
+``stride_seconds`` steps. Each window becomes one feature vector (for
+every label the model knows: highest confidence seen in the window and
+the fraction of the window the label was present), and the GRU consumes
+windows in order, carrying its hidden state. Windows are processed in
+chunks of up to ``batch_windows``: the input projection of a whole chunk
+is a single matrix product and only the recurrence itself is per step.
+Streaming callers push events as they arrive; every window is computed
+exactly once, when it has fully elapsed, so overlapping windows are never
+recomputed.
+
+Weights are an ``.npz`` file in PyTorch ``nn.GRU`` layout (gate order
+r, z, n):
+
+    weight_ih (3H, F), weight_hh (3H, H), bias_ih (3H,), bias_hh (3H,),
+    weight_out (C, H), bias_out (C,),
+    feature_labels (L,) with F = 2 * L, class_labels (C,)
+
+Windows whose most likely class is "background" produce no activity;
+consecutive windows with the same class are merged into one activity.
+Activity types come from the label rule set, as for the rules backend.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from detection.event_table import EventTable
+from detection.yolo_pipeline import DetectionEvent
+from recognition.activity_recognition import (
+    ActivityItem,
+    build_activity_timeline,
+    normal_activity,
+)
+from recognition.rules import RuleSet, get_rule_set
+
+BACKGROUND_CLASS = "background"
+
+
+@dataclass(frozen=True)
+class RecognizerConfig:
+    backend: str = "rules"  # "rules" | "gru"
+    weights_path: str = ""
+    window_seconds: float = 2.0
+    stride_seconds: float = 1.0
+    batch_windows: int = 64
+    min_confidence: float = 0.5
+
+
+class RecognizerStream(Protocol):
+    def push(self, events: Sequence[DetectionEvent], now_seconds: float) -> List[ActivityItem]: ...
+
+    def finish(self, duration_seconds: float) -> List[ActivityItem]: ...
+
+
+class TemporalRecognizer(Protocol):
+    name: str
+
+    def recognize(self, events: Sequence[DetectionEvent], duration_seconds: float) -> List[ActivityItem]: ...
+
+    def stream(self) -> RecognizerStream: ...
+
+
+class _RuleStream:
+    def __init__(self, rules: RuleSet) -> None:
+        self.rules = rules
+
+    def push(self, events: Sequence[DetectionEvent], now_seconds: float) -> List[ActivityItem]:
+        return [
+            ActivityItem(
+                time_seconds=event.time_seconds,
+                label=event.label,
+                type=self.rules.activity_type(event.label),
+                confidence=event.confidence,
+            )
+            for event in events
+        ]
+
+    def finish(self, duration_seconds: float) -> List[ActivityItem]:
+        return []
+
+
+class RuleRecognizer:
+    """The label rule map; one activity per detection event."""
+
+    name = "rules"
+
+    def __init__(self, rules: RuleSet) -> None:
+        self.rules = rules
+
+    def recognize(self, events: Sequence[DetectionEvent], duration_seconds: float) -> List[ActivityItem]:
+        return build_activity_timeline(list(events), duration_seconds, rules=self.rules)
+
+    def stream(self) -> RecognizerStream:
+        return _RuleStream(self.rules)
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+class GruRecognizer:
+    """Single-layer GRU + linear head over sliding-window features."""
+
+    name = "gru"
+
+    def __init__(self, weights: Dict[str, np.ndarray], config: RecognizerConfig, rules: RuleSet) -> None:
+        self.config = config
+        self.rules = rules
+        self.feature_labels: Tuple[str, ...] = tuple(str(x) for x in weights["feature_labels"])
+        self.class_labels: Tuple[str, ...] = tuple(str(x) for x in weights["class_labels"])
+        self._label_index = {label: i for i, label in enumerate(self.feature_labels)}
+
+        weight_ih = np.asarray(weights["weight_ih"], dtype=np.float32)
+        weight_hh = np.asarray(weights["weight_hh"], dtype=np.float32)
+        self.hidden_size = weight_hh.shape[1]
+        expected = 2 * len(self.feature_labels)
+        if weight_ih.shape != (3 * self.hidden_size, expected):
+            raise ValueError(
+                f"weight_ih has shape {weight_ih.shape}, expected {(3 * self.hidden_size, expected)} "
+                f"for {len(self.feature_labels)} feature labels"
+            )
+        # Pre-transposed once so every step is a plain row-vector product.
+        self._w_ih = np.ascontiguousarray(weight_ih.T)
+        self._w_hh = np.ascontiguousarray(weight_hh.T)
+        self._b_ih = np.asarray(weights["bias_ih"], dtype=np.float32)
+        self._b_hh = np.asarray(weights["bias_hh"], dtype=np.float32)
+        self._w_out = np.ascontiguousarray(np.asarray(weights["weight_out"], dtype=np.float32).T)
+        self._b_out = np.asarray(weights["bias_out"], dtype=np.float32)
+        if self._w_out.shape[1] != len(self.class_labels):
+            raise ValueError(f"weight_out has {self._w_out.shape[1]} classes but {len(self.class_labels)} class labels")
+
+    @classmethod
+    def from_file(cls, path: str, config: RecognizerConfig, rules: RuleSet) -> "GruRecognizer":
+        with np.load(path, allow_pickle=False) as data:
+            return cls({key: data[key] for key in data.files}, config, rules)
+
+    def recognize(self, events: Sequence[DetectionEvent], duration_seconds: float) -> List[ActivityItem]:
+        stream = self.stream()
+        activities = stream.push(events, 0.0)
+        activities.extend(stream.finish(duration_seconds))
+        return activities or [normal_activity()]
+
+    def stream(self) -> "GruStream":
+        return GruStream(self)
+
+    def features(self, starts: np.ndarray, events: EventTable) -> np.ndarray:
+        """(W, 2L) features for windows starting at ``starts``."""
+        n_labels = len(self.feature_labels)
+        out = np.zeros((len(starts), 2 * n_labels), dtype=np.float32)
+        # Vocabulary id -> feature index (-1 for labels the model doesn't know).
+        # Interning the model's labels can grow the vocabulary, so do it before sizing the map.
+        model_ids = events.vocab.ids(list(self._label_index))
+        feature_index = np.full(len(events.vocab), -1, dtype=np.int64)
+        feature_index[model_ids] = list(self._label_index.values())
+        label = feature_index[events.rows["label"]] if len(events) else np.empty(0, dtype=np.int64)
+        known = label >= 0
+        if not known.any() or len(starts) == 0:
+            return out
+        window = self.config.window_seconds
+        label = label[known]
+        t0 = events.rows["time"][known]
+        # Point events count as present for an instant.
+        t1 = np.maximum(events.last_seen[known], t0) + 1e-3
+        conf = events.rows["confidence"][known]
+
+        ends = starts + window
+        overlap = np.minimum(t1[None, :], ends[:, None]) - np.maximum(t0[None, :], starts[:, None])  # (W, E)
+        present = overlap > 0
+        coverage = np.where(present, overlap / window, 0.0).astype(np.float32)
+        scores = np.where(present, conf[None, :], 0.0).astype(np.float32)
+        for i in np.unique(label):
+            columns = label == i
+            out[:, i] = scores[:, columns].max(axis=1)
+            out[:, n_labels + i] = np.minimum(coverage[:, columns].sum(axis=1), 1.0)
+        return out
+
+    def run(self, features: np.ndarray, hidden: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Run the GRU over ``features`` (W, F) in order from ``hidden`` (H,).
+        Returns class probabilities (W, C) and the final hidden state.
+        """
+        H = self.hidden_size
+        gates_x = features @ self._w_ih + self._b_ih  # whole chunk in one product
+        states = np.empty((len(features), H), dtype=np.float32)
+        h = hidden
+        for t in range(len(features)):
+            gates_h = h @ self._w_hh + self._b_hh
+            r = _sigmoid(gates_x[t, :H] + gates_h[:H])
+            z = _sigmoid(gates_x[t, H:2 * H] + gates_h[H:2 * H])
+            n = np.tanh(gates_x[t, 2 * H:] + r * gates_h[2 * H:])
+            h = (1.0 - z) * n + z * h
+            states[t] = h
+        logits = states @ self._w_out + self._b_out
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        return probs, h
+
+
+class GruStream:
+    """
+    Incremental GRU inference. ``push`` events as they arrive together with
+    the stream time up to which all events are known; windows that have
+    fully elapsed by then are run and finished activities returned.
+    ``finish`` flushes at the end.
+    """
+
+    def __init__(self, model: GruRecognizer) -> None:
+        self.model = model
+        self.hidden = np.zeros(model.hidden_size, dtype=np.float32)
+        self._next_window = 0
+        self._events: List[DetectionEvent] = []
+        # Activity being extended: [class index, first window start, prob sum, windows]
+        self._open: Optional[list] = None
+
+    def push(self, events: Sequence[DetectionEvent], now_seconds: float) -> List[ActivityItem]:
+        self._events.extend(events)
+        return self._advance(now_seconds)
+
+    def finish(self, duration_seconds: float) -> List[ActivityItem]:
+        # The last window may run past the end of the video.
+        activities = self._advance(duration_seconds + self.model.config.window_seconds - 1e-9)
+        activities.extend(self._close())
+        return activities
+
+    def _advance(self, now_seconds: float) -> List[ActivityItem]:
+        config = self.model.config
+        stride = max(config.stride_seconds, 1e-3)
+        ready = int(np.floor((now_seconds - config.window_seconds) / stride)) + 1
+        activities: List[ActivityItem] = []
+        if self._next_window >= ready:
+            return activities
+        # Snapshot the pending events once; live events' end times keep moving until their track closes.
+        table = EventTable.from_events(self._events)
+        while self._next_window < ready:
+            count = min(ready - self._next_window, max(1, config.batch_windows))
+            starts = (self._next_window + np.arange(count)) * stride
+            features = self.model.features(starts, table)
+            probs, self.hidden = self.model.run(features, self.hidden)
+            activities.extend(self._collect(starts, probs))
+            self._next_window += count
+            # Events that ended before the next window can no longer contribute.
+            keep = table.last_seen + 1e-3 > self._next_window * stride
+            table = table.take(keep)
+            self._events = [e for e, k in zip(self._events, keep.tolist()) if k]
+        return activities
+
+    def _collect(self, starts: np.ndarray, probs: np.ndarray) -> List[ActivityItem]:
+        activities: List[ActivityItem] = []
+        classes = probs.argmax(axis=1)
+        best = probs[np.arange(len(classes)), classes]
+        for start, cls, p in zip(starts.tolist(), classes.tolist(), best.tolist()):
+            label = self.model.class_labels[cls]
+            if label == BACKGROUND_CLASS or p < self.model.config.min_confidence:
+                activities.extend(self._close())
+                continue
+            if self._open is not None and self._open[0] == cls:
+                self._open[2] += p
+                self._open[3] += 1
+                continue
+            activities.extend(self._close())
+            self._open = [cls, start, p, 1]
+        return activities
+
+    def _close(self) -> List[ActivityItem]:
+        if self._open is None:
+            return []
+        cls, start, prob_sum, windows = self._open
+        self._open = None
+        label = self.model.class_labels[cls]
+        return [
+            ActivityItem(
+                time_seconds=start,
+                label=label,
+                type=self.model.rules.activity_type(label),
+                confidence=prob_sum / windows,
+            )
+        ]
+
+
+def init_gru_weights(
+    feature_labels: Sequence[str],
+    class_labels: Sequence[str],
+    *,
+    hidden_size: int = 32,
+    seed: int = 0,
+) -> Dict[str, np.ndarray]:
+    """Randomly initialized weights in the ``.npz`` layout (for benchmarks and wiring tests)."""
+    rng = np.random.default_rng(seed)
+    F, H, C = 2 * len(feature_labels), hidden_size, len(class_labels)
+    scale = 1.0 / np.sqrt(H)
+    return {
+        "weight_ih": rng.uniform(-scale, scale, (3 * H, F)).astype(np.float32),
+        "weight_hh": rng.uniform(-scale, scale, (3 * H, H)).astype(np.float32),
+        "bias_ih": np.zeros(3 * H, dtype=np.float32),
+        "bias_hh": np.zeros(3 * H, dtype=np.float32),
+        "weight_out": rng.uniform(-scale, scale, (C, H)).astype(np.float32),
+        "bias_out": np.zeros(C, dtype=np.float32),
+        "feature_labels": np.array(list(feature_labels)),
+        "class_labels": np.array(list(class_labels)),
+    }
+
+
+_recognizers: Dict[Tuple[RecognizerConfig, str], TemporalRecognizer] = {}
+_recognizers_lock = threading.Lock()
+
+
+def create_recognizer(config: RecognizerConfig, rules: RuleSet) -> TemporalRecognizer:
+    if config.backend == "rules":
+        return RuleRecognizer(rules)
+    if config.backend == "gru":
+        if not config.weights_path:
+            raise ValueError("The 'gru' recognizer backend needs a weights file (CCTV_RECOGNIZER_WEIGHTS)")
+        return GruRecognizer.from_file(config.weights_path, config, rules)
+    raise ValueError(f"Unknown recognizer backend: {config.backend!r} (expected 'rules' or 'gru')")
+
+
+def get_recognizer(config: RecognizerConfig, rules_path: str = "") -> TemporalRecognizer:
+    """
+    Process-wide recognizer for ``config``, created on first use and reused
+    afterwards.
+    """
+    key = (config, rules_path)
+    recognizer = _recognizers.get(key)
+    if recognizer is not None:
+        return recognizer
+    with _recognizers_lock:
+        recognizer = _recognizers.get(key)
+        if recognizer is None:
+            recognizer = create_recognizer(config, get_rule_set(rules_path))
+            _recognizers[key] = recognizer
+    return recognizer
+
+
+def warm_recognizer(config: RecognizerConfig, rules_path: str = "") -> None:
+    """Load the recognizer for ``config`` in the calling process."""
+    get_recognizer(config, rules_path)
+
+
+def recognizer_loaded(config: RecognizerConfig, rules_path: str = "") -> bool:
+    """True once the recognizer for ``config`` is loaded in this process."""
+    return (config, rules_path) in _recognizers
@@ -0,0 +1 @@
+# Service module for upload handling, workers and API infrastructure
@@ -0,0 +1,405 @@
+from __future__ import annotations
+
+"""
+Analysis pipeline orchestration.
+
+Runs the preprocessing → detection → recognition → summarization →
+alerts chain for one video, dispatching every blocking stage to the
+``PipelineExecutor`` so the event loop stays responsive. Stage failures
+are surfaced as ``HTTPException`` with the same status codes and
+messages the ``/analyze-video`` endpoint has always returned.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from alerts.risk_assessment import AlertItem, assess_risk_and_alerts
+from detection.backends import DetectionStats, DetectorConfig, get_detector
+from detection.event_table import EventTable
+from detection.yolo_pipeline import DetectionEvent, run_detection
+from pipeline.features import FeatureStore
+from pipeline.sharding import ShardedStats, run_sharded_detection
+from preprocessing.motion import GateStats, MotionGate
+from preprocessing.video import FrameSource, VideoMetadata, extract_video_metadata
+from recognition.activity_recognition import ActivityItem
+from recognition.rules import get_rule_set
+from recognition.temporal import RecognizerConfig, get_recognizer
+from service.metrics import REGISTRY
+from service.tracing import record_span
+from service.workers import PipelineExecutor
+from summarization.backends import SummarizerConfig, get_summarizer
+
+if TYPE_CHECKING:
+    from service.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+MOTION_SKIP_RATIO = REGISTRY.gauge(
+    "cctv_motion_skip_ratio", "Fraction of sampled frames skipped by motion gating in the last analysis."
+)
+MOTION_FRAMES_SKIPPED = REGISTRY.counter(
+    "cctv_motion_frames_skipped_total", "Sampled frames that never reached detection because nothing changed."
+)
+DETECTOR_FRAMES = REGISTRY.counter("cctv_detector_frames_total", "Frames run through the detector backend.")
+DETECTOR_SECONDS = REGISTRY.counter("cctv_detector_inference_seconds_total", "Time spent in detector inference.")
+DETECTOR_BATCH_SIZE = REGISTRY.histogram(
+    "cctv_detector_batch_size", "Frames per detector call.", buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+FRAMES_DECODED = REGISTRY.counter("cctv_frames_decoded_total", "Frames decoded for detection and motion gating.")
+DECODE_SECONDS = REGISTRY.counter("cctv_decode_seconds_total", "Time spent decoding frames.")
+DECODE_FPS = REGISTRY.gauge("cctv_decode_frames_per_second", "Decode throughput of the last analysis.")
+
+
+# Bump whenever a stage changes in a way that alters its results, so
+# cached results from older pipelines are no longer served.
+PIPELINE_VERSION = "5"
+
+# Stage names, in execution order, as reported to progress listeners.
+STAGES = ("metadata", "detection", "timeline", "narrative", "risk")
+
+StageCallback = Callable[[str, str], None]
+
+
+@dataclass
+class PipelineOptions:
+    """Result-affecting pipeline configuration (hashed into the cache key)."""
+
+    motion_gating: bool = False
+    motion_method: str = "diff"  # "diff" | "background"
+    motion_sample_fps: float = 2.0
+    motion_pixel_threshold: float = 0.06
+    motion_min_changed_fraction: float = 0.002
+    detector: DetectorConfig = field(default_factory=DetectorConfig)
+    # Split long videos into segments detected in parallel processes (0 = off).
+    shard_workers: int = 0
+    shard_min_segment_seconds: float = 60.0
+    # Label rule file for recognition and alerts; empty uses the bundled rules.
+    rules_path: str = ""
+    recognizer: RecognizerConfig = field(default_factory=RecognizerConfig)
+    summarizer: SummarizerConfig = field(default_factory=SummarizerConfig)
+
+    @classmethod
+    def from_settings(cls, settings: "Settings") -> "PipelineOptions":
+        """The options the service runs with for ``settings`` (environment configuration)."""
+        return cls(
+            motion_gating=settings.motion_gating,
+            motion_method=settings.motion_method,
+            motion_sample_fps=settings.motion_sample_fps,
+            motion_pixel_threshold=settings.motion_pixel_threshold,
+            motion_min_changed_fraction=settings.motion_min_changed_fraction,
+            detector=DetectorConfig(
+                backend=settings.detector,
+                model_path=settings.detector_model,
+                labels_path=settings.detector_labels,
+                batch_size=settings.detector_batch_size,
+                input_size=(settings.detector_input_width, settings.detector_input_height),
+                intra_op_threads=settings.detector_intra_threads,
+                inter_op_threads=settings.detector_inter_threads,
+                score_threshold=settings.detector_score_threshold,
+                sample_fps=settings.detector_sample_fps,
+            ),
+            shard_workers=settings.shard_workers,
+            shard_min_segment_seconds=settings.shard_min_segment_seconds,
+            rules_path=settings.rules_path,
+            recognizer=RecognizerConfig(
+                backend=settings.recognizer,
+                weights_path=settings.recognizer_weights,
+                window_seconds=settings.recognizer_window_seconds,
+                stride_seconds=settings.recognizer_stride_seconds,
+                batch_windows=settings.recognizer_batch_windows,
+                min_confidence=settings.recognizer_min_confidence,
+            ),
+            summarizer=SummarizerConfig(
+                backend=settings.summarizer,
+                model_path=settings.summarizer_model,
+                max_new_tokens=settings.summarizer_max_new_tokens,
+                batch_size=settings.summarizer_batch_size,
+                max_wait_ms=settings.summarizer_max_wait_ms,
+                threads=settings.summarizer_threads,
+            ),
+        )
+
+
+@dataclass
+class AnalysisResult:
+    metadata: VideoMetadata
+    activities: List[ActivityItem]
+    narrative: str
+    risk_level: str
+    alerts: List[AlertItem]
+
+
+def pipeline_fingerprint(config: dict) -> str:
+    """
+    Short stable hash of the pipeline version and the result-affecting
+    configuration, used as part of result cache keys.
+    """
+    payload = json.dumps({"version": PIPELINE_VERSION, "config": config}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def detection_config(options: PipelineOptions) -> dict:
+    """The options detection results depend on (the feature store key for them)."""
+    detector = {
+        k: v
+        for k, v in asdict(options.detector).items()
+        if k not in ("batch_size", "intra_op_threads", "inter_op_threads", "warmup_runs")
+    }
+    motion = [
+        options.motion_gating,
+        options.motion_method,
+        options.motion_sample_fps,
+        options.motion_pixel_threshold,
+        options.motion_min_changed_fraction,
+    ]
+    return {"version": PIPELINE_VERSION, "motion": motion, "detector": detector}
+
+
+def run_detection_stage(
+    video_path: str,
+    metadata: VideoMetadata,
+    options: PipelineOptions,
+    *,
+    features: Optional[FeatureStore] = None,
+    digest: Optional[str] = None,
+) -> Tuple[List[DetectionEvent], Optional[GateStats], DetectionStats]:
+    """
+    Detection stage as a single pool task: optional motion gating, then
+    the configured detector backend over the active frames only.
+
+    Videos long enough for more than one segment are sharded across
+    processes when ``shard_workers`` is set and the backend decodes frames.
+
+    With a ``features`` store and the video's ``digest``, the detections
+    of an earlier run with the same ``detection_config`` are reused as
+    they are; otherwise unsharded runs read the sampled frames from the
+    store (or store them) instead of decoding the video again.
+    """
+    # Stub detections without motion gating never touch the video: nothing to store.
+    if features is None or digest is None or (options.detector.backend == "stub" and not options.motion_gating):
+        return _detect(video_path, metadata, options, None)
+    config = detection_config(options)
+    table = features.load_events(digest, config)
+    if table is not None:
+        logger.info(f"Reusing {len(table)} detection events from the feature store")
+        return table.to_events(), None, DetectionStats()
+    frames = partial(features.frame_batches, digest, video_path)
+    events, gate_stats, stats = _detect(video_path, metadata, options, frames)
+    features.save_events(digest, config, EventTable.from_events(events))
+    return events, gate_stats, stats
+
+
+def _detect(
+    video_path: str,
+    metadata: VideoMetadata,
+    options: PipelineOptions,
+    frames: Optional[FrameSource],
+) -> Tuple[List[DetectionEvent], Optional[GateStats], DetectionStats]:
+    gate = None
+    if options.motion_gating:
+        gate = MotionGate(
+            method=options.motion_method,
+            pixel_threshold=options.motion_pixel_threshold,
+            min_changed_fraction=options.motion_min_changed_fraction,
+        )
+    if (
+        options.shard_workers > 0
+        and options.detector.backend != "stub"
+        and metadata.duration_seconds >= 2 * options.shard_min_segment_seconds
+    ):
+        # Shards decode their own segments; stored frames are not used.
+        sharded = ShardedStats()
+        events = run_sharded_detection(
+            video_path,
+            metadata,
+            options.detector,
+            workers=options.shard_workers,
+            min_segment_seconds=options.shard_min_segment_seconds,
+            gate=gate,
+            stats=sharded,
+        )
+        logger.info(f"Detection sharded into {sharded.segments} segments")
+        return events, sharded.gate, sharded.detection
+
+    detector = get_detector(options.detector)
+    stats = DetectionStats()
+    events, gate_stats = run_detection(
+        video_path,
+        metadata.duration_seconds,
+        detector,
+        sample_fps=options.detector.sample_fps if detector.needs_frames else options.motion_sample_fps,
+        gate=gate,
+        stats=stats,
+        decode_stats=stats.decode,
+        frames=frames,
+    )
+    return events, gate_stats, stats
+
+
+def run_timeline_stage(
+    detection_events: List[DetectionEvent],
+    duration_seconds: float,
+    options: PipelineOptions,
+) -> List[ActivityItem]:
+    # Rule sets and recognizers are built once per worker process; only the config crosses the pool.
+    recognizer = get_recognizer(options.recognizer, options.rules_path)
+    return recognizer.recognize(detection_events, duration_seconds)
+
+
+def run_narrative_stage(
+    activities: List[ActivityItem],
+    duration_seconds: float,
+    config: SummarizerConfig,
+) -> str:
+    # The model stays resident in each worker; concurrent jobs' requests are batched there.
+    return get_summarizer(config).summarize(activities, duration_seconds)
+
+
+def run_risk_stage(activities: List[ActivityItem], rules_path: str) -> Tuple[str, List[AlertItem]]:
+    return assess_risk_and_alerts(activities, rules=get_rule_set(rules_path))
+
+
+async def run_analysis(
+    video_path: str,
+    executor: PipelineExecutor,
+    *,
+    options: Optional[PipelineOptions] = None,
+    on_stage: Optional[StageCallback] = None,
+    features: Optional[FeatureStore] = None,
+    digest: Optional[str] = None,
+) -> AnalysisResult:
+    """
+    Run every pipeline stage for ``video_path`` on the executor's pool.
+
+    The caller is expected to hold an admission slot (``executor.admit()``).
+    ``on_stage(stage, state)`` is called with state "running", "done" or
+    "failed" as each of ``STAGES`` progresses. ``features`` and the
+    video's ``digest`` enable the feature store (see ``run_detection_stage``).
+    """
+
+    if options is None:
+        options = PipelineOptions()
+
+    started = {}
+
+    def report(stage: str, state: str) -> None:
+        # Every stage transition also closes (or opens) its trace span.
+        if state == "running":
+            started[stage] = time.perf_counter()
+        else:
+            began = started.pop(stage)
+            record_span(stage, time.perf_counter() - began, status="ok" if state == "done" else "error", started=began)
+        if on_stage is not None:
+            on_stage(stage, state)
+
+    # Extract video metadata
+    report("metadata", "running")
+    try:
+        metadata = await executor.run(extract_video_metadata, video_path)
+        logger.info(f"Video metadata: duration={metadata.duration_seconds}s, fps={metadata.fps}, frames={metadata.frame_count}")
+        report("metadata", "done")
+    except Exception as e:
+        report("metadata", "failed")
+        logger.error(f"Failed to extract video metadata: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid video file or unsupported format: {str(e)}")
+
+    # Step 1: run YOLO-style detection stub (returns coarse detection events)
+    report("detection", "running")
+    try:
+        detection_events, gate_stats, detection_stats = await executor.run(
+            run_detection_stage,
+            video_path,
+            metadata,
+            options,
+            features=features,
+            digest=digest,
+        )
+        if gate_stats is not None:
+            MOTION_SKIP_RATIO.set(gate_stats.skip_ratio)
+            MOTION_FRAMES_SKIPPED.inc(gate_stats.frames_seen - gate_stats.frames_active)
+            logger.info(
+                f"Motion gating skipped {gate_stats.skip_ratio:.1%} of "
+                f"{gate_stats.frames_seen} sampled frames"
+            )
+        decode = detection_stats.decode
+        if decode.frames_decoded:
+            FRAMES_DECODED.inc(decode.frames_decoded)
+            DECODE_SECONDS.inc(decode.decode_seconds)
+            DECODE_FPS.set(decode.decoded_fps)
+        if detection_stats.frames:
+            DETECTOR_FRAMES.inc(detection_stats.frames)
+            DETECTOR_SECONDS.inc(detection_stats.inference_seconds)
+            for size, calls in detection_stats.batch_sizes.items():
+                DETECTOR_BATCH_SIZE.observe(size, calls)
+            logger.info(
+                f"Detector processed {detection_stats.frames} frames in {detection_stats.batches} batches "
+                f"({detection_stats.frames_per_second:.1f} frames/s, "
+                f"{detection_stats.frames_per_second_per_core:.1f} frames/s per core)"
+            )
+            logger.info(
+                f"Tracked {detection_stats.detections} per-frame detections into {len(detection_events)} events"
+            )
+        logger.info(f"Generated {len(detection_events)} detection events")
+        report("detection", "done")
+    except Exception as e:
+        report("detection", "failed")
+        logger.error(f"Detection failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to run detection: {str(e)}")
+
+    # Step 2: build activity timeline (LSTM-style high level activities)
+    report("timeline", "running")
+    try:
+        activities = await executor.run(
+            run_timeline_stage,
+            detection_events=detection_events,
+            duration_seconds=metadata.duration_seconds,
+            options=options,
+        )
+        logger.info(f"Generated {len(activities)} activities")
+        report("timeline", "done")
+    except Exception as e:
+        report("timeline", "failed")
+        logger.error(f"Activity recognition failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to build activity timeline: {str(e)}")
+
+    # Step 3: generate narrative summary (LLM-style)
+    report("narrative", "running")
+    try:
+        narrative = await executor.run(
+            run_narrative_stage,
+            activities=activities,
+            duration_seconds=metadata.duration_seconds,
+            config=options.summarizer,
+        )
+        logger.info(f"Generated narrative summary ({len(narrative)} characters)")
+        report("narrative", "done")
+    except Exception as e:
+        report("narrative", "failed")
+        logger.error(f"Summarization failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate narrative: {str(e)}")
+
+    # Step 4: risk level + alerts
+    report("risk", "running")
+    try:
+        risk_level, alerts = await executor.run(run_risk_stage, activities, options.rules_path)
+        logger.info(f"Risk level: {risk_level}, Alerts: {len(alerts)}")
+        report("risk", "done")
+    except Exception as e:
+        report("risk", "failed")
+        logger.error(f"Risk assessment failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to assess risk: {str(e)}")
+
+    return AnalysisResult(
+        metadata=metadata,
+        activities=activities,
+        narrative=narrative,
+        risk_level=risk_level,
+        alerts=alerts,
+    )
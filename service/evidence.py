@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+"""
+Evidence thumbnails and clips for alerts.
+
+For every alert in a result the service keeps a JPEG thumbnail of the
+frame at the alert and a short clip around it, extracted from the
+uploaded video while it is still on disk. Both live in an
+``EvidenceCache`` under the video digest and the alert time (ms), so
+re-uploads and alerts at the same moment reuse them, and are served by
+``GET /evidence/{video_sha256}/{time_ms}/thumbnail.jpg`` and
+``.../clip.mp4``.
+
+Extraction runs on the extractor's own thread pool, one task per
+thumbnail (seek, decode one frame, JPEG-encode) and one per clip, so the
+work for different alerts overlaps; OpenCV and ffmpeg release the GIL.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from preprocessing.evidence import cut_clip, encode_thumbnail, read_frame_at
+from service.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+EVIDENCE_HITS = REGISTRY.counter("cctv_evidence_cache_hits_total", "Thumbnails and clips found in the evidence cache.")
+EVIDENCE_MISSES = REGISTRY.counter("cctv_evidence_cache_misses_total", "Thumbnails and clips not in the evidence cache.")
+EVIDENCE_EVICTIONS = REGISTRY.counter("cctv_evidence_cache_evictions_total", "Evidence files evicted to stay in budget.")
+EVIDENCE_BYTES = REGISTRY.gauge("cctv_evidence_cache_bytes", "Size of the files in the evidence cache.")
+EVIDENCE_FAILURES = REGISTRY.counter(
+    "cctv_evidence_failures_total", "Thumbnails or clips that could not be extracted."
+)
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+# Partial writes older than this are left over from a crash, not in progress.
+_PARTIAL_WRITE_SECONDS = 3600.0
+
+
+def valid_digest(digest: str) -> bool:
+    """True for a lowercase hex SHA-256 (digests become directory names)."""
+    return bool(_DIGEST.match(digest))
+
+
+def thumbnail_url(digest: str, time_ms: int) -> str:
+    return f"/evidence/{digest}/{time_ms}/thumbnail.jpg"
+
+
+def clip_url(digest: str, time_ms: int) -> str:
+    return f"/evidence/{digest}/{time_ms}/clip.mp4"
+
+
+class EvidenceCache:
+    """
+    Files under ``<root>/<digest>/<name>``, bounded by total size: writes
+    that go over ``max_bytes`` delete the least recently used files.
+    Recency survives restarts through the files' mtimes.
+    """
+
+    def __init__(self, root: str, *, max_bytes: int = 1024 ** 3) -> None:
+        self.root = root
+        self.max_bytes = max(0, max_bytes)
+        self._lock = threading.Lock()
+        self._files: "OrderedDict[str, int]" = OrderedDict()  # "<digest>/<name>" -> size, oldest first
+        self._bytes = 0
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        found = []
+        for digest in os.listdir(self.root):
+            directory = os.path.join(self.root, digest)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                full = os.path.join(directory, name)
+                try:
+                    st = os.stat(full)
+                    if name.startswith("."):
+                        # Leftover partial write; a recent one may be another worker's write in progress.
+                        if time.time() - st.st_mtime > _PARTIAL_WRITE_SECONDS:
+                            os.remove(full)
+                        continue
+                except FileNotFoundError:
+                    continue  # removed by another worker meanwhile
+                found.append((st.st_mtime, f"{digest}/{name}", st.st_size))
+        for _, rel, size in sorted(found):
+            self._files[rel] = size
+            self._bytes += size
+        EVIDENCE_BYTES.set(self._bytes)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def get(self, digest: str, name: str) -> Optional[str]:
+        """
+        Path of the cached file, or None. A file missing from the index may
+        have been written by another worker process sharing ``root``; it is
+        indexed here on first use.
+        """
+        rel = f"{digest}/{name}"
+        path = os.path.join(self.root, rel)
+        with self._lock:
+            known = rel in self._files
+            if known:
+                self._files.move_to_end(rel)
+        if not known:
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                EVIDENCE_MISSES.inc()
+                return None
+            with self._lock:
+                self._bytes += size - self._files.pop(rel, 0)
+                self._files[rel] = size
+                EVIDENCE_BYTES.set(self._bytes)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._bytes -= self._files.pop(rel, 0)
+            EVIDENCE_MISSES.inc()
+            return None
+        EVIDENCE_HITS.inc()
+        return path
+
+    def temp_path(self, digest: str, suffix: str = "") -> str:
+        """A fresh path in the digest's directory to write to before ``put_file``."""
+        directory = os.path.join(self.root, digest)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f".{uuid.uuid4().hex}{suffix}")
+
+    def put_bytes(self, digest: str, name: str, data: bytes) -> str:
+        tmp = self.temp_path(digest)
+        with open(tmp, "wb") as f:
+            f.write(data)
+        return self.put_file(digest, name, tmp)
+
+    def put_file(self, digest: str, name: str, tmp_path: str) -> str:
+        """Move ``tmp_path`` (from ``temp_path``) into the cache as ``name``."""
+        rel = f"{digest}/{name}"
+        path = os.path.join(self.root, rel)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        victims: List[str] = []
+        with self._lock:
+            self._bytes += size - self._files.pop(rel, 0)
+            self._files[rel] = size
+            while self._bytes > self.max_bytes and len(self._files) > 1:
+                victim, victim_size = self._files.popitem(last=False)
+                self._bytes -= victim_size
+                victims.append(victim)
+            EVIDENCE_BYTES.set(self._bytes)
+        for victim in victims:
+            try:
+                os.remove(os.path.join(self.root, victim))
+            except FileNotFoundError:
+                pass
+            EVIDENCE_EVICTIONS.inc()
+            try:
+                os.rmdir(os.path.join(self.root, victim.split("/", 1)[0]))
+            except OSError:
+                pass  # directory still has files
+        return path
+
+
+class EvidenceExtractor:
+    """
+    Extracts and caches the thumbnail and clip of each alert. Clips cover
+    ``clip_before_seconds`` before to ``clip_after_seconds`` after the
+    alert; thumbnails are at most ``thumbnail_width`` pixels wide.
+    """
+
+    def __init__(
+        self,
+        cache: EvidenceCache,
+        *,
+        workers: int = 2,
+        clip_before_seconds: float = 5.0,
+        clip_after_seconds: float = 5.0,
+        thumbnail_width: int = 320,
+        jpeg_quality: int = 80,
+    ) -> None:
+        self.cache = cache
+        self.clip_before_seconds = max(0.0, clip_before_seconds)
+        self.clip_after_seconds = max(0.0, clip_after_seconds)
+        self.thumbnail_width = thumbnail_width
+        self.jpeg_quality = jpeg_quality
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="cctv-evidence")
+
+    # The settings that shape a file are part of its name, so changing them
+    # never serves evidence made with the old ones.
+    def _thumbnail_name(self, time_ms: int) -> str:
+        return f"{time_ms}-thumb-{self.thumbnail_width}-q{self.jpeg_quality}.jpg"
+
+    def _clip_name(self, time_ms: int) -> str:
+        before, after = round(self.clip_before_seconds * 1000), round(self.clip_after_seconds * 1000)
+        return f"{time_ms}-clip-{before}-{after}.mp4"
+
+    def thumbnail_path(self, digest: str, time_ms: int) -> Optional[str]:
+        return self.cache.get(digest, self._thumbnail_name(time_ms))
+
+    def clip_path(self, digest: str, time_ms: int) -> Optional[str]:
+        return self.cache.get(digest, self._clip_name(time_ms))
+
+    def _thumbnail(self, video_path: str, digest: str, time_ms: int) -> bool:
+        if self.thumbnail_path(digest, time_ms) is not None:
+            return True
+        frame = read_frame_at(video_path, time_ms / 1000.0)
+        if frame is None:
+            return False
+        data = encode_thumbnail(frame, max_width=self.thumbnail_width, quality=self.jpeg_quality)
+        self.cache.put_bytes(digest, self._thumbnail_name(time_ms), data)
+        return True
+
+    def _clip(self, video_path: str, digest: str, time_ms: int, duration_seconds: float) -> bool:
+        if self.clip_path(digest, time_ms) is not None:
+            return True
+        start = max(0.0, time_ms / 1000.0 - self.clip_before_seconds)
+        end = time_ms / 1000.0 + self.clip_after_seconds
+        if duration_seconds > 0:
+            end = min(end, duration_seconds)
+        tmp = self.cache.temp_path(digest, ".mp4")
+        try:
+            if not cut_clip(video_path, start, end, tmp):
+                return False
+            self.cache.put_file(digest, self._clip_name(time_ms), tmp)
+            return True
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _safely(self, kind: str, fn, *args) -> bool:
+        try:
+            ok = fn(*args)
+        except Exception as e:
+            logger.warning(f"Evidence {kind} extraction failed: {e}")
+            ok = False
+        if not ok:
+            EVIDENCE_FAILURES.inc()
+        return ok
+
+    async def annotate(self, alerts: List[dict], video_path: str, digest: str, duration_seconds: float) -> None:
+        """
+        Make sure the evidence of every alert (API ``Alert`` dicts) is
+        cached and set their ``thumbnail_url`` / ``clip_url`` (None for
+        whatever could not be extracted).
+        """
+        if not alerts or not valid_digest(digest):
+            return
+        loop = asyncio.get_running_loop()
+        times = sorted({round(alert["time_seconds"] * 1000) for alert in alerts})
+        tasks = []
+        for time_ms in times:
+            tasks.append(
+                loop.run_in_executor(self._pool, self._safely, "thumbnail", self._thumbnail, video_path, digest, time_ms)
+            )
+            tasks.append(
+                loop.run_in_executor(
+                    self._pool, self._safely, "clip", self._clip, video_path, digest, time_ms, duration_seconds
+                )
+            )
+        done = await asyncio.gather(*tasks)
+        found = {time_ms: (done[2 * i], done[2 * i + 1]) for i, time_ms in enumerate(times)}
+        for alert in alerts:
+            time_ms = round(alert["time_seconds"] * 1000)
+            has_thumbnail, has_clip = found[time_ms]
+            alert["thumbnail_url"] = thumbnail_url(digest, time_ms) if has_thumbnail else None
+            alert["clip_url"] = clip_url(digest, time_ms) if has_clip else None
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+"""
+Persistent incident history.
+
+Every analysis (uploads, jobs and live streams) can be recorded into a
+local SQLite database so past activities and alerts can be searched:
+"all critical alerts on camera 7 last week".
+
+- Writes are queued and committed by a background writer thread in
+  batched transactions (one ``executemany`` per batch), so recording
+  never waits on disk and thousands of events per second cost a handful
+  of commits.
+- Rows carry an absolute event time (``ts``, epoch seconds: the
+  recording start plus the event's offset into the video) and are
+  indexed on (camera, ts), (severity, ts), (label, ts) and ts. The writer
+  refreshes the planner statistics (``PRAGMA optimize``) as the table
+  grows, so multi-filter queries pick the most selective index.
+- Queries page with an opaque keyset cursor over (ts, id), newest first,
+  so each page is an index range scan however deep into the history it
+  is.
+
+Readers use their own connection per thread; with WAL journaling they
+never block the writer.
+"""
+
+import base64
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+from service.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+INCIDENTS_WRITTEN = REGISTRY.counter("cctv_incidents_written_total", "Activities and alerts saved to the incident store.")
+INCIDENT_BATCHES = REGISTRY.counter("cctv_incident_batches_total", "Incident store write transactions.")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS incidents ("
+    " id INTEGER PRIMARY KEY,"
+    " ts REAL NOT NULL,"  # epoch seconds of the event
+    " camera TEXT NOT NULL,"
+    " kind TEXT NOT NULL,"  # "activity" | "alert"
+    " label TEXT NOT NULL,"  # activity label / alert title
+    " severity TEXT NOT NULL,"  # activity type or alert severity
+    " confidence REAL,"
+    " message TEXT,"
+    " source TEXT,"  # "upload" | "job" | "stream"
+    " ref TEXT"  # video sha256, job id or stream id
+    ")",
+    "CREATE INDEX IF NOT EXISTS incidents_camera_ts ON incidents (camera, ts)",
+    "CREATE INDEX IF NOT EXISTS incidents_severity_ts ON incidents (severity, ts)",
+    "CREATE INDEX IF NOT EXISTS incidents_label_ts ON incidents (label, ts)",
+    "CREATE INDEX IF NOT EXISTS incidents_ts ON incidents (ts)",
+)
+
+# How often the writer refreshes query planner statistics.
+_OPTIMIZE_SECONDS = 600.0
+
+_COLUMNS = ("ts", "camera", "kind", "label", "severity", "confidence", "message", "source", "ref")
+
+Row = Tuple[float, str, str, str, str, Optional[float], Optional[str], Optional[str], Optional[str]]
+
+
+@dataclass
+class Incident:
+    id: int
+    ts: float
+    camera: str
+    kind: str
+    label: str
+    severity: str
+    confidence: Optional[float]
+    message: Optional[str]
+    source: Optional[str]
+    ref: Optional[str]
+
+
+def encode_cursor(ts: float, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{ts!r}:{row_id}".encode("ascii")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        ts, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii").split(":")
+        return float(ts), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def incident_row(kind: str, data: dict, *, ts: float, camera: str, source: str, ref: Optional[str]) -> Row:
+    """Row for one activity or alert dict (``Activity`` / ``Alert`` fields)."""
+    if kind == "alert":
+        return (ts, camera, kind, data["title"], data["severity"], None, data["message"], source, ref)
+    return (ts, camera, kind, data["label"], data["type"], data["confidence"], None, source, ref)
+
+
+def response_rows(response: dict, *, camera: str, recorded_at: float, source: str, ref: Optional[str]) -> List[Row]:
+    """Rows for an ``AnalysisResponse`` dict whose footage started at ``recorded_at``."""
+    rows: List[Row] = []
+    for kind, key in (("activity", "activities"), ("alert", "alerts")):
+        for data in response.get(key, []):
+            ts = recorded_at + data["time_seconds"]
+            rows.append(incident_row(kind, data, ts=ts, camera=camera, source=source, ref=ref))
+    return rows
+
+
+class IncidentStore:
+    """SQLite incident history with a batching writer thread (see the module docstring)."""
+
+    def __init__(self, path: str, *, batch_size: int = 1000, flush_seconds: float = 0.5) -> None:
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self._writer = self._connect()
+        for statement in _SCHEMA:
+            self._writer.execute(statement)
+        self._writer.execute("PRAGMA optimize")
+        self._optimized_at = time.monotonic()
+        self._queue: "queue.Queue[Optional[List[Row]]]" = queue.Queue()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._local = threading.local()
+        self._thread = threading.Thread(target=self._write_loop, name="incident-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL only fsyncs at checkpoints: durable against crashes of this process.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    # -- writing -----------------------------------------------------------
+
+    def record(self, rows: Iterable[Row]) -> None:
+        """Queue rows for the writer; returns immediately."""
+        rows = list(rows)
+        if not rows:
+            return
+        with self._idle:
+            self._pending += len(rows)
+        self._queue.put(rows)
+
+    def record_response(
+        self,
+        response: dict,
+        *,
+        camera: Optional[str],
+        recorded_at: Optional[float],
+        source: str,
+        ref: Optional[str] = None,
+    ) -> None:
+        """Record the activities and alerts of an ``AnalysisResponse`` dict."""
+        self.record(
+            response_rows(
+                response,
+                camera=camera or "",
+                recorded_at=time.time() if recorded_at is None else recorded_at,
+                source=source,
+                ref=ref,
+            )
+        )
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is committed."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _write_loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = list(first)
+            deadline = time.monotonic() + self.flush_seconds
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    more = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    stop = True
+                    break
+                batch.extend(more)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[Row]) -> None:
+        try:
+            with self._writer:
+                self._writer.execute("BEGIN")
+                self._writer.executemany(
+                    f"INSERT INTO incidents ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    batch,
+                )
+            INCIDENTS_WRITTEN.inc(len(batch))
+            INCIDENT_BATCHES.inc()
+            if time.monotonic() - self._optimized_at > _OPTIMIZE_SECONDS:
+                self._writer.execute("PRAGMA optimize")
+                self._optimized_at = time.monotonic()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to save {len(batch)} incidents: {e}")
+        finally:
+            with self._idle:
+                self._pending -= len(batch)
+                self._idle.notify_all()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(10.0)
+        self._writer.execute("PRAGMA optimize")
+        self._writer.close()
+
+    # -- querying ------------------------------------------------------------
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def query(
+        self,
+        *,
+        camera: Optional[str] = None,
+        kind: Optional[str] = None,
+        severity: Optional[str] = None,
+        label: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Incident], Optional[str]]:
+        """
+        Matching incidents, newest first, and the cursor for the next page
+        (None on the last page). ``since`` is inclusive, ``until``
+        exclusive.
+        """
+        where: List[str] = []
+        params: list = []
+        for column, value in (("camera", camera), ("kind", kind), ("severity", severity), ("label", label)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            params.append(until)
+        if cursor is not None:
+            after_ts, after_id = decode_cursor(cursor)
+            where.append("(ts < ? OR (ts = ? AND id < ?))")
+            params.extend((after_ts, after_ts, after_id))
+        sql = f"SELECT id, {', '.join(_COLUMNS)} FROM incidents"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._reader().execute(sql, params).fetchall()
+        items = [Incident(*row) for row in rows[:limit]]
+        next_cursor = encode_cursor(items[-1].ts, items[-1].id) if len(rows) > limit else None
+        return items, next_cursor
+
+    def count(self) -> int:
+        return self._reader().execute("SELECT COUNT(*) FROM incidents").fetchone()[0]
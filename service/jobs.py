@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+"""
+Asynchronous analysis jobs.
+
+``POST /jobs`` hands the uploaded video to ``JobManager.submit``, which
+returns a job id straight away and runs the pipeline in a background
+task. While a job runs its record (status plus per-stage progress) lives
+in memory; once it finishes the record, including the serialized
+``AnalysisResponse``, is written to the configured ``ResultStore`` with a
+TTL so completed jobs age out on their own.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Set
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from pipeline.features import FeatureStore
+from service.analysis import STAGES, AnalysisResult, PipelineOptions, run_analysis
+from service.evidence import EvidenceExtractor
+from service.incidents import IncidentStore
+from service.metrics import REGISTRY, track_peak_rss
+from service.profiling import PROFILER
+from service.push import PushHub, job_topic
+from service.result_cache import ResultCache
+from service.result_store import ResultStore
+from service.tracing import start_trace
+from service.uploads import ANALYSIS_PEAK_RSS_GROWTH
+from service.workers import PipelineExecutor, PoolSaturatedError
+
+logger = logging.getLogger(__name__)
+
+JOBS_ACTIVE = REGISTRY.gauge("cctv_jobs_active", "Jobs queued or running.")
+JOBS_FINISHED = REGISTRY.counter("cctv_jobs_finished_total", "Jobs that completed successfully.")
+JOBS_FAILED = REGISTRY.counter("cctv_jobs_failed_total", "Jobs that ended with an error.")
+
+
+@dataclass
+class Job:
+    id: str
+    status: str = "queued"  # "queued" | "running" | "completed" | "failed"
+    stages: Dict[str, str] = field(default_factory=lambda: {s: "pending" for s in STAGES})
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    error: Optional[str] = None
+    result: Optional[dict] = None
+    camera_id: Optional[str] = None  # recorded with the job's incidents
+    recorded_at: Optional[float] = None  # epoch seconds the footage starts at
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stages": dict(self.stages),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+class JobManager:
+    """
+    Owns running jobs and hands finished ones to the result store.
+
+    ``serialize`` turns an ``AnalysisResult`` (and the video digest) into
+    the JSON-ready dict stored as the job result; the API layer passes the
+    ``AnalysisResponse`` conversion here. With a ``cache``, results are
+    looked up and stored under (digest, ``fingerprint``). With a ``hub``,
+    stage progress, the result's activities and alerts and the final
+    status are pushed to the job's topic. With ``incidents``, completed
+    results' activities and alerts are saved to the incident history.
+    With ``evidence``, alert thumbnails and clips are extracted before the
+    uploaded video is removed. ``features`` is the feature store analyses
+    reuse sampled frames and detections from.
+    """
+
+    def __init__(
+        self,
+        executor: PipelineExecutor,
+        store: ResultStore,
+        serialize: Callable[[AnalysisResult, Optional[str]], dict],
+        *,
+        ttl_seconds: float = 3600.0,
+        options: Optional[PipelineOptions] = None,
+        cache: Optional[ResultCache] = None,
+        fingerprint: str = "",
+        hub: Optional[PushHub] = None,
+        incidents: Optional[IncidentStore] = None,
+        evidence: Optional[EvidenceExtractor] = None,
+        features: Optional[FeatureStore] = None,
+    ) -> None:
+        self.executor = executor
+        self.store = store
+        self.serialize = serialize
+        self.ttl_seconds = ttl_seconds
+        self.options = options
+        self.cache = cache
+        self.fingerprint = fingerprint
+        self.hub = hub
+        self.incidents = incidents
+        self.evidence = evidence
+        self.features = features
+        self._active: Dict[str, Job] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(
+        self,
+        video_path: str,
+        *,
+        digest: Optional[str] = None,
+        cleanup_dir: Optional[str] = None,
+        camera_id: Optional[str] = None,
+        recorded_at: Optional[float] = None,
+    ) -> Job:
+        """
+        Start analysing ``video_path`` in the background. ``cleanup_dir`` is
+        removed once the job finishes, successfully or not. If the result
+        for ``digest`` is already cached the job completes immediately (and
+        its incidents, filed when it was computed, are not filed again).
+        ``camera_id`` / ``recorded_at`` place its incidents in the history.
+        """
+        self.store.purge_expired()
+
+        if self.cache is not None and digest is not None:
+            cached = self.cache.get(digest, self.fingerprint)
+            if cached is not None:
+                job = Job(
+                    id=uuid.uuid4().hex, status="completed", result=cached, camera_id=camera_id, recorded_at=recorded_at
+                )
+                job.stages = {s: "done" for s in STAGES}
+                self._save(job)
+                if self.evidence is not None:
+                    # Evidence may have been evicted since: re-extract it while the video is here.
+                    self._spawn(self._refresh_evidence(cached, video_path, digest, cleanup_dir))
+                elif cleanup_dir is not None:
+                    shutil.rmtree(cleanup_dir, ignore_errors=True)
+                JOBS_FINISHED.inc()
+                logger.info(f"Job {job.id} served from result cache")
+                return job
+
+        if self.executor.is_saturated():
+            raise PoolSaturatedError(self.executor.retry_after_seconds())
+
+        job = Job(id=uuid.uuid4().hex, camera_id=camera_id, recorded_at=recorded_at)
+        self._active[job.id] = job
+        JOBS_ACTIVE.set(len(self._active))
+        self._save(job)
+
+        self._spawn(self._run(job, video_path, digest, cleanup_dir))
+        return job
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh_evidence(
+        self, result: dict, video_path: str, digest: str, cleanup_dir: Optional[str]
+    ) -> None:
+        assert self.evidence is not None
+        try:
+            alerts = [dict(alert) for alert in result.get("alerts", []) if "time_seconds" in alert]
+            await self.evidence.annotate(alerts, video_path, digest, result.get("video_duration_seconds", 0.0))
+        finally:
+            if cleanup_dir is not None:
+                shutil.rmtree(cleanup_dir, ignore_errors=True)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self._active.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self.store.get(job_id)
+
+    def _save(self, job: Job) -> None:
+        # Running jobs are saved too, so other workers sharing a SQLite store can report them.
+        self.store.put(job.id, job.to_dict(), ttl_seconds=self.ttl_seconds)
+
+    def _record(self, job: Job) -> None:
+        if self.incidents is not None and job.result is not None:
+            self.incidents.record_response(
+                job.result, camera=job.camera_id, recorded_at=job.recorded_at, source="job", ref=job.id
+            )
+
+    def _push(self, job: Job) -> None:
+        """Push the result's activities and alerts (if any) and the job status."""
+        if self.hub is None:
+            return
+        topic = job_topic(job.id)
+        if job.result is not None:
+            for activity in job.result.get("activities", []):
+                self.hub.publish(topic, "activity", activity)
+            for alert in job.result.get("alerts", []):
+                self.hub.publish(topic, "alert", alert)
+        status = job.to_dict()
+        status.pop("result")
+        self.hub.publish(topic, "status", status)
+        if job.status in ("completed", "failed"):
+            self.hub.close(topic)
+
+    async def _run(self, job: Job, video_path: str, digest: Optional[str], cleanup_dir: Optional[str]) -> None:
+        # The task outlives the submitting request: trace it under the job id.
+        start_trace(job.id)
+
+        def on_stage(stage: str, state: str) -> None:
+            job.stages[stage] = state
+            job.updated_at = time.time()
+            self._save(job)
+            self._push(job)
+
+        try:
+            async with self.executor.admit():
+                job.status = "running"
+                job.updated_at = time.time()
+                self._save(job)
+                with PROFILER.profile(job.id), track_peak_rss(ANALYSIS_PEAK_RSS_GROWTH):
+                    result = await run_analysis(
+                        video_path,
+                        self.executor,
+                        options=self.options,
+                        on_stage=on_stage,
+                        features=self.features,
+                        digest=digest,
+                    )
+            job.result = self.serialize(result, digest)
+            if self.evidence is not None and digest is not None:
+                await self.evidence.annotate(
+                    job.result["alerts"], video_path, digest, result.metadata.duration_seconds
+                )
+            if self.cache is not None and digest is not None:
+                await run_in_threadpool(self.cache.put, digest, self.fingerprint, job.result)
+            job.status = "completed"
+            self._record(job)
+            JOBS_FINISHED.inc()
+            logger.info(f"Job {job.id} completed")
+        except HTTPException as e:
+            job.status = "failed"
+            job.error = str(e.detail)
+            JOBS_FAILED.inc()
+            logger.error(f"Job {job.id} failed: {e.detail}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            JOBS_FAILED.inc()
+            logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+        finally:
+            job.updated_at = time.time()
+            self._save(job)
+            self._push(job)
+            self._active.pop(job.id, None)
+            JOBS_ACTIVE.set(len(self._active))
+            if cleanup_dir is not None and os.path.exists(cleanup_dir):
+                shutil.rmtree(cleanup_dir, ignore_errors=True)
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
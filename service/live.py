@@ -0,0 +1,594 @@
+from __future__ import annotations
+
+"""
+Live stream analysis.
+
+``LiveManager.start`` opens a camera URL or a local file (replayed at
+real-time pace) and runs the detection → recognition → alerts chain on
+it incrementally:
+
+- a capture thread samples frames into a ring buffer of the last
+  ``buffer_seconds`` (see ``preprocessing.live``);
+- a processing thread takes whatever frames arrived since its last pass
+  (up to one detector batch), detects and tracks objects, pushes newly
+  confirmed tracks to the recognizer stream and turns the activities it
+  returns into alerts straight away.
+
+With a ``DetectionScheduler`` (model backends), detection moves out of the
+session: the scheduler batches frames from every camera's ring through
+one shared detector and hands each session its detections, and the
+processing thread only tracks, recognizes and alerts. A camera raising a
+"warning"/"danger" activity is boosted in the scheduler for a while.
+
+If processing falls behind by more than the ring holds, the oldest frames
+are dropped (and counted) instead of delaying everything after them.
+
+Every activity and alert becomes a ``LiveItem`` with a per-session
+sequence number, kept in a bounded history for polling and handed to
+subscribers as it is produced (with a ``PushHub``, to the camera's push
+topic). Each item records its latency: the time
+from capture of the frame that completed it to its emission.
+"""
+
+import logging
+import math
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+from alerts.risk_assessment import alert_for_activity, risk_level_for
+from detection.backends import FrameDetections, get_detector
+from detection.tracking import Tracker, max_gap_for
+from detection.yolo_pipeline import DetectionEvent, stub_event
+from preprocessing.live import CaptureStats, FrameRing, LiveCapture, RingFrame, is_network_source
+from preprocessing.motion import MotionGate
+from preprocessing.video import FrameBatch
+from recognition.activity_recognition import ActivityItem
+from recognition.rules import RuleSet, get_rule_set
+from recognition.temporal import get_recognizer
+from service.analysis import PipelineOptions
+from service.incidents import IncidentStore, incident_row
+from service.metrics import REGISTRY
+from service.push import PushHub, camera_topic
+from service.scheduler import CameraFeed, DetectionScheduler
+from summarization.backends import get_summarizer, text_generator
+from summarization.llm_summarizer import IncrementalSummarizer, get_prompt_cache
+
+logger = logging.getLogger(__name__)
+
+LIVE_SESSIONS = REGISTRY.gauge("cctv_live_sessions", "Live streams currently being analysed.")
+LIVE_FRAMES_DROPPED = REGISTRY.counter(
+    "cctv_live_frames_dropped_total", "Sampled live frames overwritten in the ring before they were processed."
+)
+
+# Frame size used for motion-only (stub backend) live analysis.
+_MOTION_FRAME_SIZE = (160, 96)
+
+# Metric label of streams started without a camera_id (a random id would add series forever).
+UNNAMED_CAMERA = "unnamed"
+
+# Per-camera series of every session, removed when the camera's last session ends.
+_CAMERA_SERIES = (
+    "cctv_live_alert_latency_seconds_sum",
+    "cctv_live_alert_latency_seconds_count",
+    "cctv_live_alert_latency_seconds",
+)
+_camera_sessions: Dict[str, int] = {}  # metric label -> sessions using its series
+_camera_sessions_lock = threading.Lock()
+
+Subscriber = Callable[["LiveItem"], None]
+
+
+@dataclass
+class LiveItem:
+    seq: int
+    kind: str  # "activity" | "alert"
+    stream_seconds: float  # stream clock when the item was emitted
+    latency_seconds: float
+    data: dict
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class LatencyStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    last: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "mean": self.mean, "max": self.max, "last": self.last}
+
+
+class LiveSession:
+    """One live source and its incremental analysis threads."""
+
+    def __init__(
+        self,
+        source: str,
+        options: PipelineOptions,
+        *,
+        camera_id: Optional[str] = None,
+        realtime: Optional[bool] = None,
+        buffer_seconds: float = 10.0,
+        history: int = 1000,
+        scheduler: Optional[DetectionScheduler] = None,
+        weight: float = 1.0,
+        boost_seconds: float = 30.0,
+        summary_window_seconds: float = 60.0,
+        summary_cache_entries: int = 1024,
+    ) -> None:
+        self.id = uuid.uuid4().hex
+        self.camera_id = camera_id or self.id[:8]
+        self.metric_camera = camera_id or UNNAMED_CAMERA
+        self.source = source
+        self.options = options
+        self.status = "starting"  # "starting" | "running" | "finished" | "failed" | "stopped"
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.risk_level = "low"
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.activity_count = 0
+        self.alert_count = 0
+        self.activity_latency = LatencyStats()
+        self.alert_latency = LatencyStats()
+        generator = text_generator(get_summarizer(options.summarizer))
+        self.summarizer = IncrementalSummarizer(
+            window_seconds=summary_window_seconds,
+            generate=generator.generate if generator is not None else None,
+            cache=get_prompt_cache(summary_cache_entries),
+        )
+
+        self._detector = get_detector(options.detector)
+        self._frame_based = self._detector.needs_frames
+        sample_fps = options.detector.sample_fps if self._frame_based else options.motion_sample_fps
+        self.sample_fps = sample_fps
+        self._scheduler = scheduler if self._frame_based else None
+        self.boost_seconds = boost_seconds
+        # A scheduled camera is captured at its boosted rate; the scheduler thins it to what it is allotted.
+        capture_fps = sample_fps * self._scheduler.boost_factor if self._scheduler is not None else sample_fps
+        frame_size = self._detector.input_size if self._frame_based else _MOTION_FRAME_SIZE
+        batch_size = self._detector.batch_size if self._frame_based else 16
+        capacity = max(2 * batch_size, math.ceil(buffer_seconds * capture_fps))
+        self.ring = FrameRing(capacity, frame_size)
+        self.capture_stats = CaptureStats()
+        self._capture = LiveCapture(
+            source, self.ring, target_fps=capture_fps, realtime=realtime, stats=self.capture_stats
+        )
+        self._batch_size = batch_size
+        self._gate = self._make_gate()
+        self._feed: Optional[CameraFeed] = None
+        self._results: "queue.SimpleQueue[Optional[Tuple[List[RingFrame], List[FrameDetections]]]]" = queue.SimpleQueue()
+        if self._scheduler is not None:
+            self._feed = CameraFeed(
+                self.metric_camera,
+                self.ring,
+                self._results.put,
+                base_fps=sample_fps,
+                weight=weight,
+                gate=self._gate,
+                on_drop=self._drop,
+            )
+
+        self._items: Deque[LiveItem] = deque(maxlen=max(1, history))
+        self._next_item = 0
+        self._subscribers: Set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self._types_seen: Set[str] = set()
+        self._threads: List[threading.Thread] = []
+
+        labels = {"camera": self.metric_camera}
+        with _camera_sessions_lock:
+            _camera_sessions[self.metric_camera] = _camera_sessions.get(self.metric_camera, 0) + 1
+            self._latency_sum = REGISTRY.counter(
+                "cctv_live_alert_latency_seconds_sum", "Total frame-to-alert latency of live alerts.", labels
+            )
+            self._latency_count = REGISTRY.counter("cctv_live_alert_latency_seconds_count", "Live alerts emitted.", labels)
+            self._latency_last = REGISTRY.gauge(
+                "cctv_live_alert_latency_seconds", "Frame-to-alert latency of the latest live alert.", labels
+            )
+
+    # -- lifecycle -------------------------------------------------------
+
+    def _make_gate(self) -> Optional[MotionGate]:
+        options = self.options
+        if not (options.motion_gating or not self._frame_based):
+            return None
+        return MotionGate(
+            method=options.motion_method,
+            pixel_threshold=options.motion_pixel_threshold,
+            min_changed_fraction=options.motion_min_changed_fraction,
+        )
+
+    def start(self) -> None:
+        self._threads = [
+            threading.Thread(target=self._capture.run, name=f"live-capture-{self.camera_id}", daemon=True),
+            threading.Thread(target=self._process, name=f"live-process-{self.camera_id}", daemon=True),
+        ]
+        self.status = "running"
+        LIVE_SESSIONS.inc()
+        for t in self._threads:
+            t.start()
+        if self._feed is not None:
+            self._scheduler.register(self._feed)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._capture.stop.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("starting", "running")
+
+    # -- subscribers / history ------------------------------------------
+
+    def subscribe(self, callback: Subscriber) -> None:
+        """Call ``callback(item)`` for every new item (from the processing thread)."""
+        with self._lock:
+            self._subscribers.add(callback)
+
+    def unsubscribe(self, callback: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(callback)
+
+    def items_after(self, seq: int, limit: int = 100) -> List[LiveItem]:
+        """Retained items with a sequence number greater than ``seq``."""
+        with self._lock:
+            return [item for item in self._items if item.seq > seq][:limit]
+
+    @property
+    def next_seq(self) -> int:
+        return self._next_item
+
+    def to_dict(self) -> dict:
+        return {
+            "stream_id": self.id,
+            "camera_id": self.camera_id,
+            "source": self.source,
+            "status": self.status,
+            "error": self.error,
+            "started_at": self.started_at,
+            "frames_read": self.capture_stats.frames_read,
+            "frames_sampled": self.capture_stats.frames_sampled,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.frames_dropped,
+            "sampled_fps": self.capture_stats.sampled_fps,
+            "risk_level": self.risk_level,
+            "activities": self.activity_count,
+            "alerts": self.alert_count,
+            "activity_latency": self.activity_latency.to_dict(),
+            "alert_latency": self.alert_latency.to_dict(),
+            "scheduling": self._feed.to_dict() if self._feed is not None else None,
+        }
+
+    # -- processing -------------------------------------------------------
+
+    def _process(self) -> None:
+        try:
+            self._run()
+            self.summarizer.flush()
+            if self.status == "running":
+                self.status = "stopped" if self._capture.stop.is_set() else "finished"
+            if self._capture.error:
+                self.status, self.error = "failed", self._capture.error
+        except Exception as e:
+            logger.error(f"Live stream {self.camera_id} failed: {e}", exc_info=True)
+            self.status, self.error = "failed", str(e)
+            self._capture.stop.set()
+        finally:
+            LIVE_SESSIONS.dec()
+            self._release_metrics()
+            logger.info(f"Live stream {self.camera_id} {self.status}")
+
+    def _release_metrics(self) -> None:
+        with _camera_sessions_lock:
+            users = _camera_sessions.pop(self.metric_camera, 1) - 1
+            if users > 0:
+                _camera_sessions[self.metric_camera] = users
+                return
+            for name in _CAMERA_SERIES:
+                REGISTRY.remove(name, {"camera": self.metric_camera})
+
+    def _run(self) -> None:
+        options = self.options
+        rules = get_rule_set(options.rules_path)
+        recognizer = get_recognizer(options.recognizer, options.rules_path).stream()
+        if self._scheduler is not None:
+            self._run_scheduled(rules, recognizer)
+            return
+        gate = self._gate
+        tracker = Tracker(self._detector.labels, max_gap_seconds=max_gap_for(self.sample_fps)) if self._frame_based else None
+
+        width, height = self.ring.frame_size
+        dtype = np.float32 if self._frame_based else np.uint8
+        buffer = np.empty((self._batch_size, height, width, 3), dtype=dtype)
+        last = -1
+        stream_seconds = 0.0
+        captured_at = time.monotonic()
+        stub_index = 0
+        was_active = False
+
+        while True:
+            self.ring.wait(last, 0.25)
+            newest = self.ring.next_seq - 1
+            if newest <= last:
+                if self.ring.closed or self._capture.stop.is_set():
+                    break
+                continue
+            oldest = self.ring.oldest_seq()
+            if last + 1 < oldest:
+                self._drop(oldest - last - 1)
+                last = oldest - 1
+            seqs = list(range(last + 1, min(newest, last + self._batch_size) + 1))
+            frames = self.ring.read(seqs, buffer)
+            self._drop(len(seqs) - len(frames))
+            last = seqs[-1]
+            if not frames:
+                continue
+
+            self.frames_processed += len(frames)
+            batch = FrameBatch(
+                frames=buffer[: len(frames)],
+                timestamps=np.array([f.stream_seconds for f in frames]),
+                frame_indices=np.array([f.seq for f in frames]),
+            )
+            stream_seconds = frames[-1].stream_seconds
+            captured_at = frames[-1].captured_at
+
+            events: List[DetectionEvent] = []
+            if tracker is not None:
+                active = gate.filter(batch) if gate is not None else batch
+                if active is not None:
+                    for detections in self._detector.detect(active.frames, active.timestamps):
+                        tracker.update(detections)
+                events = tracker.take_started()
+                # Closed spans were handed out (and updated in place) when they started.
+                tracker.take_finished()
+            else:
+                # Stub backend: a template event at every motion onset.
+                for t, moving in zip(batch.timestamps.tolist(), gate.active_mask(batch.frames).tolist()):
+                    if moving and not was_active:
+                        events.append(stub_event(stub_index, t))
+                        stub_index += 1
+                    was_active = moving
+
+            activities = recognizer.push(events, stream_seconds)
+            self._emit(activities, stream_seconds, captured_at, rules)
+
+        if tracker is not None:
+            tracker.flush()
+        self._emit(recognizer.finish(stream_seconds), stream_seconds, captured_at, rules)
+
+    def _run_scheduled(self, rules: RuleSet, recognizer) -> None:
+        """Consume detections the scheduler ran for this camera until the feed ends."""
+        # Tolerate the gaps of a camera degraded down to the scheduler's floor FPS.
+        tracker = Tracker(self._detector.labels, max_gap_seconds=max_gap_for(self._scheduler.min_fps))
+        stream_seconds = 0.0
+        captured_at = time.monotonic()
+        while True:
+            try:
+                result = self._results.get(timeout=0.25)
+            except queue.Empty:
+                continue
+            if result is None:
+                break
+            frames, detections = result
+            self.frames_processed += len(frames)
+            stream_seconds = frames[-1].stream_seconds
+            captured_at = frames[-1].captured_at
+            for frame_detections in detections:
+                tracker.update(frame_detections)
+            activities = recognizer.push(tracker.take_started(), stream_seconds)
+            tracker.take_finished()
+            self._emit(activities, stream_seconds, captured_at, rules)
+        tracker.flush()
+        self._emit(recognizer.finish(stream_seconds), stream_seconds, captured_at, rules)
+
+    def _drop(self, count: int) -> None:
+        if count > 0:
+            self.frames_dropped += count
+            LIVE_FRAMES_DROPPED.inc(count)
+
+    def _emit(self, activities: List[ActivityItem], stream_seconds: float, captured_at: float, rules: RuleSet) -> None:
+        self.summarizer.add(activities, stream_seconds)
+        for activity in activities:
+            latency = time.monotonic() - captured_at
+            self.activity_count += 1
+            self.activity_latency.record(latency)
+            self._types_seen.add(activity.type)
+            if self._feed is not None and activity.type in ("warning", "danger"):
+                self._feed.boost(self.boost_seconds)
+            self.risk_level = risk_level_for(self._types_seen)
+            self._publish("activity", stream_seconds, latency, activity.to_dict())
+
+            alert = alert_for_activity(activity, str(self.alert_count + 1), rules)
+            if alert is None:
+                continue
+            latency = time.monotonic() - captured_at
+            self.alert_count += 1
+            self.alert_latency.record(latency)
+            self._latency_sum.inc(latency)
+            self._latency_count.inc()
+            self._latency_last.set(latency)
+            self._publish("alert", stream_seconds, latency, alert.to_dict())
+
+    def _publish(self, kind: str, stream_seconds: float, latency: float, data: dict) -> None:
+        with self._lock:
+            item = LiveItem(
+                seq=self._next_item,
+                kind=kind,
+                stream_seconds=float(stream_seconds),
+                latency_seconds=latency,
+                data=data,
+            )
+            self._next_item += 1
+            self._items.append(item)
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(item)
+            except Exception as e:
+                logger.warning(f"Live subscriber failed: {e}")
+
+
+class LiveManager:
+    """
+    Starts, lists and stops live sessions. Local file sources must live
+    under ``file_root`` (file sources are refused when it is empty).
+    Sessions on a model backend share one ``DetectionScheduler``, created
+    with the first of them. With ``incidents``, every session's activities
+    and alerts are saved to the incident history as they are emitted.
+    """
+
+    def __init__(
+        self,
+        options: PipelineOptions,
+        *,
+        max_sessions: int = 4,
+        buffer_seconds: float = 10.0,
+        history: int = 1000,
+        file_root: str = "",
+        hub: Optional[PushHub] = None,
+        min_fps: float = 0.5,
+        max_queue_seconds: float = 2.0,
+        boost_factor: float = 2.0,
+        boost_seconds: float = 30.0,
+        summary_window_seconds: float = 60.0,
+        summary_cache_entries: int = 1024,
+        incidents: Optional[IncidentStore] = None,
+    ) -> None:
+        self.options = options
+        self.incidents = incidents
+        self.summary_window_seconds = summary_window_seconds
+        self.summary_cache_entries = summary_cache_entries
+        self.hub = hub
+        self.min_fps = min_fps
+        self.max_queue_seconds = max_queue_seconds
+        self.boost_factor = boost_factor
+        self.boost_seconds = boost_seconds
+        self._scheduler: Optional[DetectionScheduler] = None
+        self.max_sessions = max_sessions
+        self.buffer_seconds = buffer_seconds
+        self.history = history
+        self.file_root = os.path.realpath(file_root) if file_root else ""
+        self._sessions: Dict[str, LiveSession] = {}
+        self._lock = threading.Lock()
+
+    def _check_source(self, source: str) -> None:
+        if is_network_source(source):
+            return
+        if not self.file_root:
+            raise HTTPException(status_code=400, detail="File sources are disabled (set CCTV_STREAM_FILE_ROOT)")
+        path = os.path.realpath(os.path.join(self.file_root, source))
+        if os.path.commonpath([path, self.file_root]) != self.file_root:
+            raise HTTPException(status_code=400, detail="File source must be inside the configured stream root")
+        if not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail=f"File source not found: {source}")
+
+    def _get_scheduler(self) -> Optional[DetectionScheduler]:
+        detector = get_detector(self.options.detector)
+        if not detector.needs_frames:
+            return None
+        if self._scheduler is None or not self._scheduler.alive:
+            self._scheduler = DetectionScheduler(
+                detector,
+                min_fps=self.min_fps,
+                max_queue_seconds=self.max_queue_seconds,
+                boost_factor=self.boost_factor,
+            )
+        return self._scheduler
+
+    @property
+    def scheduler(self) -> Optional[DetectionScheduler]:
+        return self._scheduler
+
+    def start(
+        self,
+        source: str,
+        *,
+        camera_id: Optional[str] = None,
+        realtime: Optional[bool] = None,
+        weight: float = 1.0,
+    ) -> LiveSession:
+        self._check_source(source)
+        if not is_network_source(source):
+            source = os.path.realpath(os.path.join(self.file_root, source))
+        with self._lock:
+            running = sum(1 for s in self._sessions.values() if s.active)
+            if running >= self.max_sessions:
+                raise HTTPException(status_code=503, detail=f"Too many live streams (limit {self.max_sessions})")
+            session = LiveSession(
+                source,
+                self.options,
+                camera_id=camera_id,
+                realtime=realtime,
+                buffer_seconds=self.buffer_seconds,
+                history=self.history,
+                scheduler=self._get_scheduler(),
+                weight=weight,
+                boost_seconds=self.boost_seconds,
+                summary_window_seconds=self.summary_window_seconds,
+                summary_cache_entries=self.summary_cache_entries,
+            )
+            self._sessions[session.id] = session
+            if self.hub is not None:
+                topic = camera_topic(session.camera_id)
+                session.subscribe(lambda item: self.hub.publish(topic, item.kind, item.to_dict()))
+            if self.incidents is not None:
+                session.subscribe(self._recorder(session))
+            # Keep finished sessions around for inspection, but not forever.
+            ended = [sid for sid, s in self._sessions.items() if not s.active]
+            for sid in ended[: max(0, len(ended) - self.max_sessions)]:
+                del self._sessions[sid]
+        session.start()
+        logger.info(f"Live stream {session.camera_id} started ({source})")
+        return session
+
+    def _recorder(self, session: LiveSession) -> Subscriber:
+        incidents, camera, ref = self.incidents, session.camera_id, session.id
+
+        def record(item: LiveItem) -> None:
+            incidents.record([incident_row(item.kind, item.data, ts=time.time(), camera=camera, source="stream", ref=ref)])
+
+        return record
+
+    def get(self, stream_id: str) -> Optional[LiveSession]:
+        return self._sessions.get(stream_id)
+
+    def list(self) -> List[LiveSession]:
+        return list(self._sessions.values())
+
+    def remove(self, stream_id: str) -> Optional[LiveSession]:
+        with self._lock:
+            session = self._sessions.pop(stream_id, None)
+        if session is not None:
+            session.stop()
+        return session
+
+    def shutdown(self) -> None:
+        for session in self.list():
+            session.stop(timeout=1.0)
+        if self._scheduler is not None:
+            self._scheduler.stop(timeout=1.0)
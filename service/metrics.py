@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+"""
+Lightweight in-process metrics.
+
+Counters, gauges and histograms live in a module-level registry and are
+rendered in the Prometheus text exposition format by the ``/metrics``
+endpoint, so the service can be observed without an extra client library.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape_label_value(value: str) -> str:
+    # Label values are client-controlled (e.g. camera ids); the text format needs these escaped.
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    inner = ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in key)
+    return "{" + inner + "}"
+
+
+class Counter:
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def samples(self, name: str, key: LabelKey) -> List[str]:
+        return [f"{name}{_format_labels(key)} {self._value}"]
+
+
+class Gauge:
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._value = 0.0
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = float(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set_max(self, value: float) -> None:
+        """Raise the gauge to ``value`` if it is higher (high-water mark)."""
+        with self._lock:
+            if value > self._value:
+                self._value = float(value)
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def samples(self, name: str, key: LabelKey) -> List[str]:
+        return [f"{name}{_format_labels(key)} {self._value}"]
+
+
+# Seconds; suits everything from a cache lookup to a long video's detection stage.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class Histogram:
+    """Observations counted into cumulative ``le`` buckets, plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self._lock = threading.Lock()
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value: float, count: int = 1) -> None:
+        """Record ``value`` (``count`` times, for pre-aggregated observations)."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += count
+            self._sum += value * count
+            self._count += count
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def samples(self, name: str, key: LabelKey) -> List[str]:
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        lines = []
+        cumulative = 0
+        for bound, bucket in zip(self.buckets, counts):
+            cumulative += bucket
+            lines.append(f"{name}_bucket{_format_labels(key + (('le', repr(float(bound))),))} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+        lines.append(f"{name}_sum{_format_labels(key)} {total}")
+        lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds every metric family by name. Each family can have several
+    children, one per distinct label set.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._families: Dict[str, Tuple[str, str, Dict[LabelKey, object]]] = {}
+
+    def _get(
+        self,
+        kind: str,
+        create: Callable[[], object],
+        name: str,
+        help_text: str,
+        labels: Optional[Dict[str, str]],
+    ):
+        key = _label_key(labels)
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = (kind, help_text, {})
+                self._families[name] = family
+            elif family[0] != kind:
+                raise ValueError(f"Metric {name} already registered as {family[0]}")
+            children = family[2]
+            metric = children.get(key)
+            if metric is None:
+                metric = create()
+                children[key] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+        return self._get(Counter.kind, Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None) -> Gauge:
+        return self._get(Gauge.kind, Gauge, name, help_text, labels)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labels: Optional[Dict[str, str]] = None,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._get(Histogram.kind, lambda: Histogram(buckets), name, help_text, labels)
+
+    def remove(self, name: str, labels: Optional[Dict[str, str]] = None) -> bool:
+        """
+        Drop the child of ``name`` with exactly these labels, e.g. a
+        per-camera series once the camera is gone. Returns whether it existed.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            family = self._families.get(name)
+            return family is not None and family[2].pop(key, None) is not None
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            families = sorted(self._families.items())
+            snapshot = [(name, kind, help_text, list(children.items())) for name, (kind, help_text, children) in families]
+        for name, kind, help_text, children in snapshot:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in sorted(children, key=lambda item: item[0]):
+                lines.extend(metric.samples(name, key))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Process-wide resident set size high-water mark, or None where the
+    ``resource`` module is unavailable (e.g. Windows).
+    """
+    try:
+        import resource
+        import sys
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return int(usage if sys.platform == "darwin" else usage * 1024)
+
+
+# Bytes; 1 MiB to 4 GiB in powers of four.
+MEMORY_BUCKETS = tuple(float(1024 ** 2 * 4 ** i) for i in range(7))
+
+
+@contextmanager
+def track_peak_rss(histogram: Histogram) -> Iterator[None]:
+    """
+    Observe how far the block raised the process RSS high-water mark.
+
+    A block that stays under an earlier peak observes 0. The mark is
+    process-wide, so with concurrent requests the growth is attributed to
+    whichever ones were running when it rose.
+    """
+    before = peak_rss_bytes()
+    try:
+        yield
+    finally:
+        after = peak_rss_bytes()
+        if before is not None and after is not None:
+            histogram.observe(after - before)
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+"""
+On-demand sampling profiler for single analyses.
+
+Off, and free, until armed at runtime (``POST /debug/profile``, only with
+``CCTV_PROFILING`` set). Each of the next N analyses is then profiled: a
+sampler thread snapshots, every ``interval_ms``, the stacks of the pool
+threads currently running that analysis' stages (``sys._current_frames``),
+including the decode and inference threads those stages start
+(``profiled_target``), and counts identical stacks. The result is kept as folded stacks, one
+``outer;...;inner count`` line per distinct stack, the input format of
+flamegraph.pl and speedscope, and the hottest functions are logged.
+
+Only this process is sampled: stages on a process pool
+(``CCTV_WORKER_KIND=process``) or in shard workers are not covered.
+"""
+
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_CURRENT: ContextVar[Optional["RequestProfile"]] = ContextVar("cctv_profile", default=None)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class RequestProfile:
+    """Stack samples of the threads working on one request."""
+
+    def __init__(self, request_id: str, interval_ms: float = 5.0) -> None:
+        self.request_id = request_id
+        self.interval = max(interval_ms, 0.5) / 1000.0
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.seconds = 0.0
+        self._threads: Dict[int, int] = {}  # thread ident -> attach depth
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def attach(self) -> None:
+        """Sample the calling thread until the matching ``detach``."""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def detach(self) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._threads.get(ident, 0) - 1
+            if depth > 0:
+                self._threads[ident] = depth
+            else:
+                self._threads.pop(ident, None)
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name=f"profiler-{self.request_id[:8]}", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.seconds = time.perf_counter() - self._started
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads: Set[int] = set(self._threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                names = []
+                while frame is not None:
+                    names.append(_frame_name(frame))
+                    frame = frame.f_back
+                if names:
+                    self.stacks[";".join(reversed(names))] += 1
+                    self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def hottest(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """Functions by samples in which they were running (self time)."""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+
+class Profiler:
+    """Runtime switch for request profiling and store of the recent profiles."""
+
+    def __init__(self, max_profiles: int = 16) -> None:
+        self.max_profiles = max_profiles
+        self._remaining = 0
+        self._interval_ms = 5.0
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def arm(self, requests: int = 1, interval_ms: float = 5.0) -> None:
+        """Profile the next ``requests`` analyses (0 disarms)."""
+        with self._lock:
+            self._remaining = max(0, requests)
+            self._interval_ms = interval_ms
+
+    @property
+    def remaining(self) -> int:
+        return self._remaining
+
+    @property
+    def interval_ms(self) -> float:
+        return self._interval_ms
+
+    def _take(self, request_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            if self._remaining <= 0:
+                return None
+            self._remaining -= 1
+            return RequestProfile(request_id, self._interval_ms)
+
+    def _store(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles[profile.request_id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[RequestProfile]:
+        return self._profiles.get(request_id)
+
+    def request_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._profiles)
+
+    @contextmanager
+    def profile(self, request_id: str) -> Iterator[Optional[RequestProfile]]:
+        """
+        Profile the enclosed analysis if the profiler is armed; the pool
+        threads join in through ``current_profile`` (see ``PipelineExecutor``).
+        """
+        profile = self._take(request_id)
+        if profile is None:
+            yield None
+            return
+        token = _CURRENT.set(profile)
+        profile.start()
+        try:
+            yield profile
+        finally:
+            profile.stop()
+            _CURRENT.reset(token)
+            self._store(profile)
+            hottest = ", ".join(f"{name} {count}" for name, count in profile.hottest(5))
+            logger.info(
+                f"Profiled request {request_id}: {profile.samples} samples in {profile.seconds:.2f}s; "
+                f"hottest: {hottest or 'none'}"
+            )
+
+
+PROFILER = Profiler()
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _CURRENT.get()
+
+
+def profiled_target(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap ``fn`` to run on a new thread as part of the calling thread's
+    work: in a copy of its context and, while profiling, sampled with
+    its profile. Call once per thread.
+    """
+    context = contextvars.copy_context()
+    profile = _CURRENT.get()
+
+    def run(*args: Any, **kwargs: Any) -> Any:
+        if profile is not None:
+            profile.attach()
+        try:
+            return context.run(fn, *args, **kwargs)
+        finally:
+            if profile is not None:
+                profile.detach()
+
+    return run
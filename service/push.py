@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+"""
+Push delivery of activities, alerts and job progress to dashboards.
+
+Clients subscribe to a topic, ``job:<job_id>`` or ``camera:<camera_id>``,
+over server-sent events or a WebSocket (see the ``/jobs/{id}/events`` and
+``/cameras/{id}/events`` endpoints). Producers call ``PushHub.publish``
+from any thread:
+
+- each message is serialized once, JSON payload and SSE frame both,
+  however many clients receive it; subscribers share the same objects;
+- fan-out happens on the event loop, where every subscriber has a bounded
+  send buffer, so one slow screen never holds up the producer or the
+  other screens;
+- when a subscriber's buffer is full its backlog is coalesced: a newer
+  ``status`` message replaces a queued one, otherwise the oldest
+  non-alert message is dropped (alerts go last). The client is told how
+  many messages it missed with a ``dropped`` event and can re-fetch them
+  (e.g. ``GET /streams/{id}/items``).
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Dict, Optional, Set
+
+from fastapi import HTTPException
+
+from service.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PUSH_SUBSCRIBERS = REGISTRY.gauge("cctv_push_subscribers", "Connected push (SSE/WebSocket) clients.")
+PUSH_MESSAGES = REGISTRY.counter("cctv_push_messages_total", "Messages published to push topics with subscribers.")
+PUSH_DROPPED = REGISTRY.counter(
+    "cctv_push_messages_dropped_total", "Push messages dropped or coalesced for slow clients."
+)
+
+
+def job_topic(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def camera_topic(camera_id: str) -> str:
+    return f"camera:{camera_id}"
+
+
+@dataclass(frozen=True)
+class PushMessage:
+    id: int
+    kind: str  # "activity" | "alert" | "status" | "dropped" | "end"
+    payload: str  # JSON text, sent as-is over WebSockets
+    sse: bytes  # complete server-sent event frame
+
+    @classmethod
+    def build(cls, id: int, kind: str, data: dict) -> "PushMessage":
+        payload = json.dumps({"id": id, "kind": kind, "data": data}, separators=(",", ":"), default=str)
+        return cls(id=id, kind=kind, payload=payload, sse=f"id: {id}\nevent: {kind}\ndata: {payload}\n\n".encode("utf-8"))
+
+
+class Subscription:
+    """One client's bounded buffer of pending messages. Used on the event loop only."""
+
+    def __init__(self, topic: str, buffer_size: int) -> None:
+        self.topic = topic
+        self.buffer_size = max(1, buffer_size)
+        self._queue: Deque[PushMessage] = deque()
+        self._ready = asyncio.Event()
+        self.dropped = 0  # since the last ``dropped`` notice
+        self.closed = False
+
+    def offer(self, message: PushMessage) -> None:
+        queue = self._queue
+        if len(queue) >= self.buffer_size:
+            self._make_room(message)
+        queue.append(message)
+        self._ready.set()
+
+    def _make_room(self, message: PushMessage) -> None:
+        queue = self._queue
+        victim: Optional[int] = None
+        if message.kind == "status":
+            victim = next((i for i, m in enumerate(queue) if m.kind == "status"), None)
+        if victim is None:
+            victim = next((i for i, m in enumerate(queue) if m.kind != "alert"), 0)
+        del queue[victim]
+        self.dropped += 1
+        PUSH_DROPPED.inc()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def messages(self, keepalive_seconds: float) -> AsyncIterator[Optional[PushMessage]]:
+        """
+        Yield messages as they arrive; ``None`` after ``keepalive_seconds``
+        of silence (send a keepalive). Ends once the topic is closed and
+        the buffer is drained.
+        """
+        while True:
+            if not self._queue:
+                if self.closed:
+                    return
+                self._ready.clear()
+                try:
+                    await asyncio.wait_for(self._ready.wait(), keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+            if self.dropped:
+                notice = PushMessage.build(-1, "dropped", {"dropped": self.dropped})
+                self.dropped = 0
+                yield notice
+            while self._queue:
+                yield self._queue.popleft()
+
+
+class PushHub:
+    """Topic registry and fan-out. Bind it to the serving event loop at startup."""
+
+    def __init__(self, *, buffer_size: int = 256, max_subscribers: int = 1000, keepalive_seconds: float = 15.0) -> None:
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.keepalive_seconds = keepalive_seconds
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._count = 0
+        self._ids = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Call from the event loop that serves the push endpoints."""
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+
+    # -- subscribers (event loop) ----------------------------------------
+
+    def subscribe(self, topic: str) -> Subscription:
+        if self._count >= self.max_subscribers:
+            raise HTTPException(status_code=503, detail=f"Too many push subscribers (limit {self.max_subscribers})")
+        subscription = Subscription(topic, self.buffer_size)
+        self._topics.setdefault(topic, set()).add(subscription)
+        self._count += 1
+        PUSH_SUBSCRIBERS.set(self._count)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._topics.get(subscription.topic)
+        if subscribers is None or subscription not in subscribers:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._topics[subscription.topic]
+        self._count -= 1
+        PUSH_SUBSCRIBERS.set(self._count)
+
+    # -- producers (any thread) ------------------------------------------
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._topics.get(topic))
+
+    def publish(self, topic: str, kind: str, data: dict) -> None:
+        """Send ``data`` to every subscriber of ``topic``; a no-op without subscribers."""
+        if self._loop is None or not self.has_subscribers(topic):
+            return
+        message = PushMessage.build(next(self._ids), kind, data)
+        PUSH_MESSAGES.inc()
+        self._dispatch(self._fan_out, topic, message)
+
+    def close(self, topic: str) -> None:
+        """End the topic: subscribers receive what is buffered, then an ``end`` event."""
+        if self._loop is None or not self.has_subscribers(topic):
+            return
+        self._dispatch(self._close, topic, PushMessage.build(next(self._ids), "end", {"topic": topic}))
+
+    def _dispatch(self, callback, topic: str, message: PushMessage) -> None:
+        if threading.get_ident() == self._loop_thread:
+            callback(topic, message)
+            return
+        try:
+            self._loop.call_soon_threadsafe(callback, topic, message)
+        except RuntimeError:
+            pass  # loop already closed (shutting down)
+
+    def _fan_out(self, topic: str, message: PushMessage) -> None:
+        for subscription in self._topics.get(topic, ()):
+            subscription.offer(message)
+
+    def _close(self, topic: str, message: PushMessage) -> None:
+        for subscription in self._topics.get(topic, ()):
+            subscription.offer(message)
+            subscription.close()
+
+    def shutdown(self) -> None:
+        for subscribers in list(self._topics.values()):
+            for subscription in subscribers:
+                subscription.close()
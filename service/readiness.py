@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+"""
+Model loading and readiness.
+
+``/health`` only says the process is up. ``ModelWarmup`` loads and warms
+the heavy backends (detector, recognizer, summarizer) and tracks their
+state, so ``/ready`` can tell a load balancer or orchestrator whether
+this worker answers analyses at full speed yet. ``CCTV_MODEL_LOADING``
+decides when they load:
+
+- ``eager``: during startup; the server accepts no connections until
+  every model is warm, and startup fails if one fails to load. The default.
+- ``background``: startup finishes at once and the models load on the
+  worker pool; ``/ready`` answers 503 until they are warm, and analyses
+  arriving earlier wait for the model they need.
+- ``lazy``: each model loads on first use; ``/ready`` is 200 from the
+  start and reports which models are still cold. For development and
+  tools that never touch some of the models.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from service.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LOADING_MODES = ("eager", "background", "lazy")
+
+WARMUP_SECONDS = REGISTRY.gauge("cctv_model_warmup_seconds", "Time taken to load and warm all models at startup.")
+
+
+@dataclass
+class ModelState:
+    state: str = "cold"  # "cold" | "loading" | "ready" | "failed"
+    load_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class ModelWarmup:
+    """
+    ``loaders`` load and warm one model each in the calling process (run
+    on the pipeline executor); ``loaded`` tell whether a model became warm
+    some other way, e.g. on first use in ``lazy`` mode.
+    """
+
+    def __init__(
+        self,
+        loaders: Dict[str, Callable[[], None]],
+        loaded: Dict[str, Callable[[], bool]],
+        *,
+        mode: str = "eager",
+    ) -> None:
+        if mode not in LOADING_MODES:
+            raise ValueError(f"Unknown model loading mode: {mode!r} (expected one of {', '.join(LOADING_MODES)})")
+        self.mode = mode
+        self._loaders = loaders
+        self._loaded = loaded
+        self._states: Dict[str, ModelState] = {name: ModelState() for name in loaders}
+        self._ready_gauges = {
+            name: REGISTRY.gauge("cctv_model_ready", "1 once the model is loaded and warm.", {"model": name})
+            for name in loaders
+        }
+        self._load_gauges = {
+            name: REGISTRY.gauge("cctv_model_load_seconds", "Time taken to load and warm the model.", {"model": name})
+            for name in loaders
+        }
+
+    async def run(self, executor, *, raise_errors: bool = True) -> None:
+        """Load every model in turn on ``executor`` (a ``PipelineExecutor``)."""
+        started = time.perf_counter()
+        for name, loader in self._loaders.items():
+            state = self._states[name]
+            state.state = "loading"
+            model_started = time.perf_counter()
+            try:
+                await executor.run(loader)
+            except Exception as e:
+                state.state, state.error = "failed", str(e)
+                logger.error(f"Loading the {name} model failed: {e}", exc_info=not raise_errors)
+                if raise_errors:
+                    raise
+                continue
+            state.state, state.load_seconds = "ready", time.perf_counter() - model_started
+            self._load_gauges[name].set(state.load_seconds)
+            self._ready_gauges[name].set(1)
+            logger.info(f"{name.capitalize()} model ready in {state.load_seconds:.2f}s")
+        WARMUP_SECONDS.set(time.perf_counter() - started)
+
+    def status(self) -> Dict[str, ModelState]:
+        for name, state in self._states.items():
+            if state.state == "cold" and self._loaded[name]():
+                state.state = "ready"
+                self._ready_gauges[name].set(1)
+        return dict(self._states)
+
+    @property
+    def ready(self) -> bool:
+        """Whether to route analyses here: always in ``lazy`` mode, else once every model is warm."""
+        states = self.status()
+        return self.mode == "lazy" or all(state.state == "ready" for state in states.values())
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+"""
+Content-addressed cache of analysis results.
+
+Entries are keyed by the SHA-256 of the uploaded bytes plus a fingerprint
+of the pipeline version/config, so re-uploading the same exported clip
+returns the stored result without re-running the chain, while any change
+to the pipeline naturally misses.
+
+Two tiers:
+- memory: LRU bounded by the total size of the JSON-encoded results
+- disk (optional): one JSON file per entry under ``<dir>/<digest>/``
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from service.evidence import valid_digest
+from service.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CACHE_HITS_MEMORY = REGISTRY.counter("cctv_result_cache_hits_total", "Result cache hits.", {"tier": "memory"})
+CACHE_HITS_DISK = REGISTRY.counter("cctv_result_cache_hits_total", "Result cache hits.", {"tier": "disk"})
+CACHE_MISSES = REGISTRY.counter("cctv_result_cache_misses_total", "Result cache misses.")
+CACHE_EVICTIONS = REGISTRY.counter("cctv_result_cache_evictions_total", "Entries evicted from the memory tier.")
+CACHE_MEMORY_BYTES = REGISTRY.gauge("cctv_result_cache_memory_bytes", "Encoded size of results held in memory.")
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ResultCache:
+    def __init__(self, *, max_memory_bytes: int = 64 * 1024 ** 2, disk_dir: Optional[str] = None) -> None:
+        self.max_memory_bytes = max(0, max_memory_bytes)
+        self.disk_dir = disk_dir or None
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[Tuple[str, str], Tuple[dict, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        if self.disk_dir is not None:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_memory_bytes > 0 or self.disk_dir is not None
+
+    def _disk_path(self, digest: str, fingerprint: str) -> str:
+        assert self.disk_dir is not None
+        return os.path.join(self.disk_dir, digest, f"{fingerprint}.json")
+
+    def get(self, digest: str, fingerprint: str) -> Optional[dict]:
+        key = (digest, fingerprint)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                CACHE_HITS_MEMORY.inc()
+                return entry[0]
+
+        if self.disk_dir is not None:
+            path = self._disk_path(digest, fingerprint)
+            try:
+                with open(path, "rb") as f:
+                    raw = f.read()
+            except FileNotFoundError:
+                raw = None
+            if raw is not None:
+                try:
+                    value = json.loads(raw)
+                except ValueError:
+                    # Corrupt (e.g. written by a crashed pre-rename version): drop it and recompute.
+                    logger.warning(f"Removing unreadable result cache entry {path}")
+                    _remove(path)
+                else:
+                    self._remember(key, value, len(raw))
+                    CACHE_HITS_DISK.inc()
+                    return value
+
+        CACHE_MISSES.inc()
+        return None
+
+    def put(self, digest: str, fingerprint: str, value: dict) -> None:
+        raw = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        self._remember((digest, fingerprint), value, len(raw))
+
+        if self.disk_dir is not None:
+            path = self._disk_path(digest, fingerprint)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers never see a partial file. The temp
+            # name is unique across threads and forked worker processes.
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(raw)
+                os.replace(tmp_path, path)
+            except BaseException:
+                _remove(tmp_path)
+                raise
+
+    def _remember(self, key: Tuple[str, str], value: dict, size: int) -> None:
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= old[1]
+            self._memory[key] = (value, size)
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes:
+                _, (_, evicted_size) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted_size
+                CACHE_EVICTIONS.inc()
+            CACHE_MEMORY_BYTES.set(self._memory_bytes)
+
+    def invalidate(self, digest: Optional[str] = None) -> int:
+        """
+        Drop every cached result for ``digest`` (all pipeline versions), or
+        the whole cache when ``digest`` is None. Returns the number of
+        entries removed across both tiers. Raises ValueError if ``digest``
+        is not a SHA-256 (it becomes a directory name).
+        """
+        if digest is not None and not valid_digest(digest):
+            raise ValueError(f"Not a SHA-256 digest: {digest!r}")
+        removed = 0
+        with self._lock:
+            keys = [k for k in self._memory if digest is None or k[0] == digest]
+            for k in keys:
+                _, size = self._memory.pop(k)
+                self._memory_bytes -= size
+            removed += len(keys)
+            CACHE_MEMORY_BYTES.set(self._memory_bytes)
+
+        if self.disk_dir is not None:
+            digests = [digest] if digest is not None else os.listdir(self.disk_dir)
+            for d in digests:
+                entry_dir = os.path.join(self.disk_dir, d)
+                if not valid_digest(d) or not os.path.isdir(entry_dir):
+                    continue
+                removed += sum(1 for name in os.listdir(entry_dir) if name.endswith(".json"))
+                shutil.rmtree(entry_dir, ignore_errors=True)
+        return removed
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+"""
+Pluggable storage for finished job records.
+
+Two backends are provided:
+- ``MemoryResultStore``: in-process LRU, bounded by entry count.
+- ``SQLiteResultStore``: on-disk, survives restarts and can be shared by
+  several worker processes on the same host.
+
+Both store JSON-serializable dicts and support a per-entry TTL; expired
+entries are never returned and are removed by ``purge_expired``.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Protocol, Tuple
+
+
+class ResultStore(Protocol):
+    def get(self, key: str) -> Optional[dict]: ...
+
+    def put(self, key: str, value: dict, ttl_seconds: Optional[float] = None) -> None: ...
+
+    def delete(self, key: str) -> bool: ...
+
+    def purge_expired(self) -> int: ...
+
+
+def _expires_at(ttl_seconds: Optional[float]) -> Optional[float]:
+    if ttl_seconds is None or ttl_seconds <= 0:
+        return None
+    return time.time() + ttl_seconds
+
+
+class MemoryResultStore:
+    """LRU dict with optional per-entry expiry."""
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[dict, Optional[float]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: dict, ttl_seconds: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (value, _expires_at(ttl_seconds))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (_, exp) in self._entries.items() if exp is not None and exp <= now]
+            for k in expired:
+                del self._entries[k]
+        return len(expired)
+
+
+class SQLiteResultStore:
+    """Results persisted as JSON rows in a local SQLite database."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " expires_at REAL"
+            ")"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_expires_at ON results (expires_at)")
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        payload, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            self.delete(key)
+            return None
+        return json.loads(payload)
+
+    def put(self, key: str, value: dict, ttl_seconds: Optional[float] = None) -> None:
+        payload = json.dumps(value, separators=(",", ":"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, payload, expires_at) VALUES (?, ?, ?)",
+                (key, payload, _expires_at(ttl_seconds)),
+            )
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+        return cur.rowcount > 0
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM results WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )
+        return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_BACKENDS = ("memory", "sqlite")
+
+
+def create_result_store(backend: str, *, path: str = "jobs.sqlite3", max_entries: int = 256) -> ResultStore:
+    if backend == "memory":
+        return MemoryResultStore(max_entries=max_entries)
+    if backend == "sqlite":
+        return SQLiteResultStore(path)
+    raise ValueError(f"Unknown result store backend: {backend!r} (expected one of {_BACKENDS})")
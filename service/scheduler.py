@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+"""
+Shared detection scheduling for live cameras.
+
+With many cameras on one box, each stream running its own detector
+batches would contend for the same cores and all fall behind together.
+``DetectionScheduler`` instead owns the detector in a single thread and
+multiplexes frames from every registered ``CameraFeed`` into shared
+batches:
+
+- the detector's throughput (frames/s) is measured as it runs and
+  divided between cameras by weighted max-min fair share: a camera never
+  gets more than it asks for, and what it leaves over goes to the others
+  in proportion to their weights;
+- each camera is decimated to its share by skipping frames (spacing in
+  stream time), so under overload every camera degrades to a lower but
+  steady FPS instead of queueing; frames older than ``max_queue_seconds``
+  are skipped too;
+- frames of different cameras are ordered within a batch by weighted fair
+  queueing (virtual finish times), so a heavier camera is served first
+  when a batch cannot take everything pending;
+- a camera with a current "warning"/"danger" activity is boosted for a
+  while: its weight and requested FPS are multiplied by ``boost_factor``.
+
+Per-camera allocated FPS, achieved FPS and queue latency (capture to
+detection) are exported as metrics and reported in stream status.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from detection.backends import Detector, FrameDetections
+from preprocessing.live import FrameRing, RingFrame
+from preprocessing.motion import MotionGate
+from service.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_CAPACITY = REGISTRY.gauge(
+    "cctv_scheduler_capacity_fps", "Measured live detection throughput shared between cameras (frames/s)."
+)
+
+# deliver(frames, detections): the frames taken from the ring (in order) and
+# detections for those of them that passed the motion gate. ``None`` means
+# the feed has ended.
+Deliver = Callable[[Optional[Tuple[List[RingFrame], List[FrameDetections]]]], None]
+
+
+def fair_share(demands: List[float], weights: List[float], capacity: float) -> List[float]:
+    """
+    Weighted max-min fair allocation of ``capacity`` between consumers
+    asking for ``demands``: nobody gets more than its demand, and capacity
+    left by satisfied consumers is split by weight among the rest.
+    """
+    allocation = [0.0] * len(demands)
+    remaining = [i for i in range(len(demands)) if demands[i] > 0]
+    while remaining and capacity > 1e-9:
+        total_weight = sum(weights[i] for i in remaining)
+        satisfied = [i for i in remaining if demands[i] <= capacity * weights[i] / total_weight]
+        if not satisfied:
+            for i in remaining:
+                allocation[i] = capacity * weights[i] / total_weight
+            break
+        for i in satisfied:
+            allocation[i] = demands[i]
+            capacity -= demands[i]
+            remaining.remove(i)
+    return allocation
+
+
+# Per-camera series of every feed, removed when the camera's last feed finishes.
+_FEED_SERIES = (
+    "cctv_camera_target_fps",
+    "cctv_camera_achieved_fps",
+    "cctv_camera_queue_latency_seconds",
+    "cctv_camera_frames_skipped_total",
+)
+
+
+class CameraFeed:
+    """One camera's ring as seen by the scheduler, with its scheduling state."""
+
+    def __init__(
+        self,
+        camera_id: str,
+        ring: FrameRing,
+        deliver: Deliver,
+        *,
+        base_fps: float,
+        weight: float = 1.0,
+        gate: Optional[MotionGate] = None,
+        on_drop: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        self.camera_id = camera_id
+        self.ring = ring
+        self.deliver = deliver
+        self.base_fps = base_fps
+        self.weight = max(weight, 1e-3)
+        self.gate = gate
+        self.on_drop = on_drop
+        self.boost_until = 0.0
+
+        self.target_fps = base_fps
+        self.achieved_fps = 0.0
+        self.queue_latency = 0.0
+        self.frames_served = 0
+        self.frames_skipped = 0  # decimated or stale
+
+        self._scanned = -1  # newest sequence number looked at
+        self._next_due = -math.inf  # stream time the next frame should be taken at
+        self._eligible: Deque[Tuple[int, float, float]] = deque()  # (seq, stream_seconds, captured_at)
+        self._finish_tag = 0.0
+        self._window_start = time.monotonic()
+        self._window_served = 0
+
+        self._metric_labels = {"camera": camera_id}
+        self._bind_metrics()
+
+    def _bind_metrics(self) -> None:
+        # Again on registration: an earlier feed of the camera may have removed the series meanwhile.
+        labels = self._metric_labels
+        self._target_gauge = REGISTRY.gauge("cctv_camera_target_fps", "Detection FPS allocated to the camera.", labels)
+        self._achieved_gauge = REGISTRY.gauge("cctv_camera_achieved_fps", "Detection FPS the camera actually got.", labels)
+        self._latency_gauge = REGISTRY.gauge(
+            "cctv_camera_queue_latency_seconds", "Capture-to-detection delay of the camera's latest frames.", labels
+        )
+        self._skipped_counter = REGISTRY.counter(
+            "cctv_camera_frames_skipped_total", "Camera frames skipped to hold its allocated FPS or as stale.", labels
+        )
+
+    def remove_metrics(self) -> None:
+        """Drop the camera's series from ``/metrics`` (once no feed of the camera is left)."""
+        for name in _FEED_SERIES:
+            REGISTRY.remove(name, self._metric_labels)
+
+    def boost(self, seconds: float) -> None:
+        """Raise the camera's priority for the next ``seconds``."""
+        self.boost_until = time.monotonic() + seconds
+
+    @property
+    def boosted(self) -> bool:
+        return time.monotonic() < self.boost_until
+
+    def to_dict(self) -> dict:
+        return {
+            "target_fps": self.target_fps,
+            "achieved_fps": self.achieved_fps,
+            "queue_latency_seconds": self.queue_latency,
+            "frames_skipped": self.frames_skipped,
+            "boosted": self.boosted,
+        }
+
+    # -- scheduler thread --------------------------------------------------
+
+    def _skip(self, count: int) -> None:
+        if count > 0:
+            self.frames_skipped += count
+            self._skipped_counter.inc(count)
+
+    def _scan(self, now: float, max_queue_seconds: float) -> None:
+        """Pull newly committed frames into the eligible queue, decimated to ``target_fps``."""
+        ring = self.ring
+        newest = ring.next_seq - 1
+        oldest = ring.oldest_seq()
+        if self._scanned + 1 < oldest:
+            if self.on_drop is not None:
+                self.on_drop(oldest - self._scanned - 1)
+            self._scanned = oldest - 1
+        interval = 1.0 / max(self.target_fps, 1e-6)
+        skipped = 0
+        for seq in range(self._scanned + 1, newest + 1):
+            meta = ring.meta(seq)
+            if meta is None:
+                continue
+            stream_seconds, captured_at = meta
+            # Small tolerance so a camera sampled exactly at its target rate is not thinned.
+            if stream_seconds >= self._next_due - interval * 0.02:
+                self._eligible.append((seq, stream_seconds, captured_at))
+                # Due times advance by the interval, so fractional rates average out;
+                # after a gap they restart from the current frame.
+                self._next_due = max(self._next_due, stream_seconds - interval) + interval
+            else:
+                skipped += 1
+        self._scanned = max(self._scanned, newest)
+
+        # Frames overwritten in the ring or waiting too long are given up.
+        eligible = self._eligible
+        while eligible and (eligible[0][0] < oldest or now - eligible[0][2] > max_queue_seconds):
+            eligible.popleft()
+            skipped += 1
+        self._skip(skipped)
+
+    def _update_rate(self, now: float, served: int) -> None:
+        self.frames_served += served
+        self._window_served += served
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            rate = self._window_served / elapsed
+            self.achieved_fps = rate if self.achieved_fps == 0 else 0.5 * self.achieved_fps + 0.5 * rate
+            self._window_start, self._window_served = now, 0
+            self._achieved_gauge.set(self.achieved_fps)
+
+
+class DetectionScheduler:
+    """
+    Runs ``detector`` for every registered camera from one thread; see the
+    module docstring. Call ``stop()`` to end it (feeds get ``None``).
+    """
+
+    def __init__(
+        self,
+        detector: Detector,
+        *,
+        min_fps: float = 0.5,
+        max_queue_seconds: float = 2.0,
+        boost_factor: float = 2.0,
+    ) -> None:
+        self.detector = detector
+        self.min_fps = min_fps
+        self.max_queue_seconds = max_queue_seconds
+        self.boost_factor = boost_factor
+        self.capacity_fps = math.inf  # unknown until the first batch is timed
+        self._seconds_per_frame: Optional[float] = None
+        self._feeds: Dict[str, CameraFeed] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._virtual_time = 0.0
+        width, height = detector.input_size
+        self._buffer = np.empty((detector.batch_size, height, width, 3), dtype=np.float32)
+        self._thread = threading.Thread(target=self._loop, name="detection-scheduler", daemon=True)
+        self._thread.start()
+
+    # -- registration (any thread) ----------------------------------------
+
+    def register(self, feed: CameraFeed) -> None:
+        feed.ring.on_commit = self._wake.set
+        with self._lock:
+            if not self.alive:
+                # Nobody would ever serve it; end the feed instead of leaving its session waiting.
+                self._release(feed)
+                feed.deliver(None)
+                return
+            feed._bind_metrics()
+            self._feeds[feed.camera_id + "/" + str(id(feed))] = feed
+        self._wake.set()
+
+    def feeds(self) -> List[CameraFeed]:
+        return [feed for _, feed in self._entries()]
+
+    def _entries(self) -> List[Tuple[str, CameraFeed]]:
+        with self._lock:
+            return list(self._feeds.items())
+
+    @property
+    def alive(self) -> bool:
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    # -- scheduler thread --------------------------------------------------
+
+    def _loop(self) -> None:
+        try:
+            while not self._stop.is_set():
+                try:
+                    busy = self._round()
+                except Exception as e:
+                    # One bad batch (its frames are lost) must not stop every camera.
+                    logger.error(f"Detection scheduler round failed: {e}", exc_info=True)
+                    busy = False
+                if not busy:
+                    self._wake.wait(0.25)
+                    self._wake.clear()
+        finally:
+            with self._lock:
+                self._stop.set()  # under the lock: no feed registers after the drain below
+            for key, feed in self._entries():
+                self._finish(key, feed)
+
+    def _finish(self, key: str, feed: CameraFeed) -> None:
+        with self._lock:
+            self._feeds.pop(key, None)
+            self._release(feed)
+        feed.deliver(None)
+
+    def _release(self, feed: CameraFeed) -> None:
+        """Remove ``feed``'s series unless another registered feed shares them. Call under the lock."""
+        if all(other._metric_labels != feed._metric_labels for other in self._feeds.values()):
+            feed.remove_metrics()
+
+    def _allocate(self, feeds: List[CameraFeed]) -> None:
+        demands, weights = [], []
+        for feed in feeds:
+            factor = self.boost_factor if feed.boosted else 1.0
+            demands.append(feed.base_fps * factor)
+            weights.append(feed.weight * factor)
+        if math.isinf(self.capacity_fps):
+            shares = demands
+        else:
+            shares = fair_share(demands, weights, self.capacity_fps)
+        now = time.monotonic()
+        for feed, demand, share in zip(feeds, demands, shares):
+            feed.target_fps = min(demand, max(self.min_fps, share))
+            feed._target_gauge.set(feed.target_fps)
+            feed._update_rate(now, 0)
+
+    def _select(self, feeds: List[CameraFeed]) -> List[Tuple[CameraFeed, int, float]]:
+        """Up to one batch of (feed, seq, captured_at), by weighted fair queueing."""
+        picked: List[Tuple[CameraFeed, int, float]] = []
+        taken = {id(feed): 0 for feed in feeds}
+        while len(picked) < self.detector.batch_size:
+            best, best_tag = None, math.inf
+            for feed in feeds:
+                if taken[id(feed)] < len(feed._eligible):
+                    weight = feed.weight * (self.boost_factor if feed.boosted else 1.0)
+                    tag = max(self._virtual_time, feed._finish_tag) + 1.0 / weight
+                    if tag < best_tag:
+                        best, best_tag = feed, tag
+            if best is None:
+                break
+            seq, _, captured_at = best._eligible[taken[id(best)]]
+            taken[id(best)] += 1
+            best._finish_tag = best_tag
+            picked.append((best, seq, captured_at))
+        for feed in feeds:
+            for _ in range(taken[id(feed)]):
+                feed._eligible.popleft()
+        if picked:
+            self._virtual_time = min(feed._finish_tag for feed, _, _ in picked)
+        return picked
+
+    def _round(self) -> bool:
+        """Schedule and run one batch; False when there was nothing to do."""
+        entries = self._entries()
+        now = time.monotonic()
+        feeds = [feed for _, feed in entries]
+        self._allocate(feeds)
+        for key, feed in entries:
+            feed._scan(now, self.max_queue_seconds)
+            if feed.ring.closed and not feed._eligible and feed._scanned >= feed.ring.next_seq - 1:
+                self._finish(key, feed)
+                feeds.remove(feed)
+
+        picked = self._select(feeds)
+        if not picked:
+            return False
+
+        # Read each camera's frames into its slice of the shared batch, then gate them.
+        groups: List[Tuple[CameraFeed, List[RingFrame], np.ndarray]] = []
+        offset = 0
+        for feed in feeds:
+            seqs = [seq for f, seq, _ in picked if f is feed]
+            if not seqs:
+                continue
+            frames = feed.ring.read(seqs, self._buffer[offset:])
+            if not frames:
+                continue
+            count = len(frames)
+            mask = feed.gate.active_mask(self._buffer[offset:offset + count]) if feed.gate is not None else np.ones(count, bool)
+            groups.append((feed, frames, mask))
+            offset += count
+
+        # Compact the active frames to the front of the batch.
+        active_rows = np.flatnonzero(np.concatenate([mask for _, _, mask in groups])) if groups else np.zeros(0, int)
+        timestamps = np.array([f.stream_seconds for _, frames, mask in groups for f, m in zip(frames, mask) if m])
+        if len(active_rows) and len(active_rows) < offset:
+            self._buffer[: len(active_rows)] = self._buffer[active_rows]
+
+        started = time.monotonic()
+        detections: List[FrameDetections] = []
+        if len(active_rows):
+            detections = self.detector.detect(self._buffer[: len(active_rows)], timestamps)
+            elapsed = time.monotonic() - started
+            per_frame = elapsed / len(active_rows)
+            self._seconds_per_frame = (
+                per_frame if self._seconds_per_frame is None else 0.8 * self._seconds_per_frame + 0.2 * per_frame
+            )
+            # Keep a little headroom so queues drain instead of hovering at capacity.
+            self.capacity_fps = 0.9 / max(self._seconds_per_frame, 1e-6)
+            SCHEDULER_CAPACITY.set(self.capacity_fps)
+
+        done = time.monotonic()
+        position = 0
+        for feed, frames, mask in groups:
+            count = int(mask.sum())
+            feed.queue_latency = max(started - f.captured_at for f in frames)
+            feed._latency_gauge.set(feed.queue_latency)
+            feed._update_rate(done, len(frames))
+            feed.deliver((frames, detections[position:position + count]))
+            position += count
+        return True
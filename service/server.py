@@ -0,0 +1,192 @@
+"""
+Pre-forking server: load the models once, then fork the workers.
+
+``uvicorn --workers N`` starts every worker as a fresh interpreter that
+imports the service and loads every model on its own: N copies of the
+weights and N times the load time. Instead,
+
+    python -m service.server --workers 4 --host 0.0.0.0 --port 8000
+
+loads the models (without warming them) in a master process, freezes
+the loaded objects out of the garbage collector so collections in the
+workers don't write to, and thereby copy, their pages, binds the
+listening socket and forks the workers. They share the weights
+copy-on-write and accept on the one socket. Each worker then imports
+``app``, warms the models it inherited (thread pools and first-run
+allocations are per process) as ``CCTV_MODEL_LOADING`` says, and serves.
+
+Jobs are only visible across workers through a shared job store, so
+more than one worker needs ``CCTV_JOB_STORE=sqlite``. Live streams and
+push subscriptions stay with the worker that took the request.
+
+The master only watches: SIGINT/SIGTERM are passed on to the workers,
+a worker that dies is replaced, and one that dies during startup stops
+the server (a broken model would fail in every replacement too). POSIX
+only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+logger = logging.getLogger("service.server")
+
+# A worker exiting sooner than this after its fork is taken to have failed at startup.
+STARTUP_GRACE_SECONDS = 10.0
+
+
+def preload() -> float:
+    """Load (without warming) the models the service is configured for; returns the seconds taken."""
+    from detection.backends import get_detector
+    from recognition.rules import get_rule_set
+    from recognition.temporal import get_recognizer
+    from service.analysis import PipelineOptions
+    from service.settings import Settings
+    from summarization.backends import get_summarizer
+
+    started = time.perf_counter()
+    settings = Settings.from_env()
+    options = PipelineOptions.from_settings(settings)
+    get_rule_set(settings.rules_path)
+    get_detector(options.detector, warm=False)
+    get_recognizer(options.recognizer, settings.rules_path)
+    get_summarizer(options.summarizer, warm=False)
+    # Modules every worker imports anyway; importing them here shares their pages too.
+    import fastapi  # noqa: F401
+    import uvicorn  # noqa: F401
+
+    return time.perf_counter() - started
+
+
+def bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, app: str, log_level: str) -> int:
+    import uvicorn
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Let app.py set up logging its own way, as in a single-process server.
+    logging.getLogger().handlers.clear()
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level, lifespan="on"))
+    server.run(sockets=[sock])
+    return 0 if server.started else 3
+
+
+def _fork_worker(sock: socket.socket, app: str, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            code = _run_worker(sock, app, log_level)
+        except BaseException:
+            logger.exception("Worker crashed")
+        finally:
+            # Never return into the master's code (or run its atexit handlers).
+            os._exit(code)
+    return pid
+
+
+def serve(
+    *,
+    workers: int,
+    host: str,
+    port: int,
+    app: str = "app:app",
+    preload_models: bool = True,
+    log_level: str = "info",
+) -> int:
+    """Run the master until it is told to stop; returns the exit status."""
+    if not hasattr(os, "fork"):
+        raise SystemExit("service.server needs os.fork; use uvicorn --workers on this platform")
+    from service.settings import Settings
+
+    if workers > 1 and Settings.from_env().job_store != "sqlite":
+        # Each worker keeps its own jobs; only a shared store lets any worker answer for any job.
+        raise SystemExit("Several workers need a shared job store: set CCTV_JOB_STORE=sqlite")
+    if preload_models:
+        seconds = preload()
+        logger.info(f"Loaded models in {seconds:.2f}s")
+    gc.collect()
+    gc.freeze()
+    sock = bind(host, port)
+    logger.info(f"Listening on {host}:{port} with {workers} workers (master pid {os.getpid()})")
+
+    started: Dict[int, float] = {}  # worker pid -> fork time
+    stopping = False
+    status = 0
+
+    def stop(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(started):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(max(1, workers)):
+        started[_fork_worker(sock, app, log_level)] = time.monotonic()
+    while started:
+        try:
+            pid, wait_status = os.wait()
+        except ChildProcessError:
+            break
+        forked_at = started.pop(pid, None)
+        if forked_at is None or stopping:
+            continue
+        code = os.waitstatus_to_exitcode(wait_status)
+        if time.monotonic() - forked_at < STARTUP_GRACE_SECONDS:
+            logger.error(f"Worker {pid} exited during startup (status {code}); stopping")
+            status = 1
+            stop(signal.SIGTERM, None)
+            continue
+        logger.warning(f"Worker {pid} exited (status {code}); starting a replacement")
+        started[_fork_worker(sock, app, log_level)] = time.monotonic()
+    sock.close()
+    return status
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--app", default="app:app", help="ASGI application to serve")
+    parser.add_argument("--no-preload", action="store_true", help="let every worker load its own models")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    sys.exit(
+        serve(
+            workers=args.workers,
+            host=args.host,
+            port=args.port,
+            app=args.app,
+            preload_models=not args.no_preload,
+            log_level=args.log_level,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+"""
+Runtime settings for the backend service.
+
+All knobs are read from environment variables (prefixed with ``CCTV_``)
+so deployments can tune the service without code changes. Defaults are
+chosen to keep a local ``uvicorn app:app`` run working out of the box.
+"""
+
+import os
+from dataclasses import dataclass
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return float(value)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+
+@dataclass
+class Settings:
+    # Uploads
+    max_upload_bytes: int = 2 * 1024 ** 3  # 2 GiB
+    upload_chunk_bytes: int = 1024 ** 2  # 1 MiB
+
+    # Worker pool and admission control
+    worker_kind: str = "thread"  # "thread" | "process"
+    worker_count: int = 2
+    worker_queue_size: int = 8
+    retry_after_seconds: int = 5
+    model_loading: str = "eager"  # "eager" | "background" | "lazy"
+
+    # Background jobs
+    job_store: str = "memory"  # "memory" | "sqlite"
+    job_store_path: str = "jobs.sqlite3"
+    job_store_max_entries: int = 256
+    job_ttl_seconds: int = 3600
+
+    # Result cache
+    cache_memory_bytes: int = 64 * 1024 ** 2  # 64 MiB, 0 disables the memory tier
+    cache_dir: str = ""  # empty disables the disk tier
+
+    # Motion gating in front of detection
+    motion_gating: bool = False
+    motion_method: str = "diff"  # "diff" | "background"
+    motion_sample_fps: float = 2.0
+    motion_pixel_threshold: float = 0.06
+    motion_min_changed_fraction: float = 0.002
+
+    # Detector backend
+    detector: str = "stub"  # "stub" | "onnx"
+    detector_model: str = ""
+    detector_labels: str = ""
+    detector_batch_size: int = 8
+    detector_input_width: int = 640
+    detector_input_height: int = 640
+    detector_intra_threads: int = 0
+    detector_inter_threads: int = 0
+    detector_score_threshold: float = 0.35
+    detector_sample_fps: float = 2.0
+
+    # Segment-sharded detection of long videos
+    shard_workers: int = 0  # 0 disables sharding
+    shard_min_segment_seconds: float = 60.0
+
+    # Label rules for recognition and alerts
+    rules_path: str = ""  # empty uses recognition/default_rules.json
+
+    # Temporal activity recognizer
+    recognizer: str = "rules"  # "rules" | "gru"
+    recognizer_weights: str = ""
+    recognizer_window_seconds: float = 2.0
+    recognizer_stride_seconds: float = 1.0
+    recognizer_batch_windows: int = 64
+    recognizer_min_confidence: float = 0.5
+    # Narrative summarizer
+    summarizer: str = "template"  # "template" | "hf"
+    summarizer_model: str = ""
+    summarizer_max_new_tokens: int = 200
+    summarizer_batch_size: int = 8
+    summarizer_max_wait_ms: float = 20.0
+    summarizer_threads: int = 0
+
+    # Live stream ingestion
+    stream_max_sessions: int = 4
+    stream_buffer_seconds: float = 10.0
+    stream_history: int = 1000
+    stream_file_root: str = ""  # directory local file sources may be read from; empty disables them
+    scheduler_min_fps: float = 0.5  # floor for cameras degraded under overload
+    scheduler_max_queue_seconds: float = 2.0
+    scheduler_boost_factor: float = 2.0  # FPS and weight multiplier while a camera has a warning/danger activity
+    scheduler_boost_seconds: float = 30.0
+    summary_window_seconds: float = 60.0  # live narratives summarize activity per window of this length
+    summary_cache_entries: int = 1024  # window prompt -> summary LRU size
+    push_buffer_size: int = 256  # pending messages per SSE/WebSocket client before coalescing
+    push_max_subscribers: int = 1000
+    push_keepalive_seconds: float = 15.0
+
+    # Incident history
+    incident_db: str = ""  # SQLite file for searchable activities/alerts; empty disables it
+    incident_batch_size: int = 1000
+    incident_flush_seconds: float = 0.5
+
+    # Alert evidence (thumbnails and clips)
+    evidence_dir: str = ""  # cache directory; empty disables evidence extraction
+    evidence_max_bytes: int = 1024 ** 3  # 1 GiB
+    evidence_workers: int = 2
+    evidence_clip_before_seconds: float = 5.0
+    evidence_clip_after_seconds: float = 5.0
+    evidence_thumbnail_width: int = 320
+    evidence_jpeg_quality: int = 80
+
+    # Feature store (sampled frames and detections reused across re-analyses)
+    feature_dir: str = ""  # empty disables it
+    feature_max_bytes: int = 10 * 1024 ** 3  # 10 GiB
+    feature_frames: bool = True  # store sampled frames, not only detections
+
+    # Observability
+    profiling: bool = False  # expose the /debug/profile endpoints
+    profile_max_requests: int = 16  # profiles kept in memory
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        defaults = cls()
+        return cls(
+            max_upload_bytes=_env_int("CCTV_MAX_UPLOAD_BYTES", defaults.max_upload_bytes),
+            upload_chunk_bytes=_env_int("CCTV_UPLOAD_CHUNK_BYTES", defaults.upload_chunk_bytes),
+            worker_kind=os.environ.get("CCTV_WORKER_KIND", defaults.worker_kind),
+            worker_count=_env_int("CCTV_WORKERS", defaults.worker_count),
+            worker_queue_size=_env_int("CCTV_WORKER_QUEUE", defaults.worker_queue_size),
+            retry_after_seconds=_env_int("CCTV_RETRY_AFTER_SECONDS", defaults.retry_after_seconds),
+            model_loading=os.environ.get("CCTV_MODEL_LOADING", defaults.model_loading),
+            job_store=os.environ.get("CCTV_JOB_STORE", defaults.job_store),
+            job_store_path=os.environ.get("CCTV_JOB_STORE_PATH", defaults.job_store_path),
+            job_store_max_entries=_env_int("CCTV_JOB_STORE_MAX_ENTRIES", defaults.job_store_max_entries),
+            job_ttl_seconds=_env_int("CCTV_JOB_TTL_SECONDS", defaults.job_ttl_seconds),
+            cache_memory_bytes=_env_int("CCTV_CACHE_MEMORY_BYTES", defaults.cache_memory_bytes),
+            cache_dir=os.environ.get("CCTV_CACHE_DIR", defaults.cache_dir),
+            motion_gating=_env_bool("CCTV_MOTION_GATING", defaults.motion_gating),
+            motion_method=os.environ.get("CCTV_MOTION_METHOD", defaults.motion_method),
+            motion_sample_fps=_env_float("CCTV_MOTION_SAMPLE_FPS", defaults.motion_sample_fps),
+            motion_pixel_threshold=_env_float("CCTV_MOTION_PIXEL_THRESHOLD", defaults.motion_pixel_threshold),
+            motion_min_changed_fraction=_env_float(
+                "CCTV_MOTION_MIN_CHANGED_FRACTION", defaults.motion_min_changed_fraction
+            ),
+            detector=os.environ.get("CCTV_DETECTOR", defaults.detector),
+            detector_model=os.environ.get("CCTV_DETECTOR_MODEL", defaults.detector_model),
+            detector_labels=os.environ.get("CCTV_DETECTOR_LABELS", defaults.detector_labels),
+            detector_batch_size=_env_int("CCTV_DETECTOR_BATCH_SIZE", defaults.detector_batch_size),
+            detector_input_width=_env_int("CCTV_DETECTOR_INPUT_WIDTH", defaults.detector_input_width),
+            detector_input_height=_env_int("CCTV_DETECTOR_INPUT_HEIGHT", defaults.detector_input_height),
+            detector_intra_threads=_env_int("CCTV_DETECTOR_INTRA_THREADS", defaults.detector_intra_threads),
+            detector_inter_threads=_env_int("CCTV_DETECTOR_INTER_THREADS", defaults.detector_inter_threads),
+            detector_score_threshold=_env_float("CCTV_DETECTOR_SCORE_THRESHOLD", defaults.detector_score_threshold),
+            detector_sample_fps=_env_float("CCTV_DETECTOR_SAMPLE_FPS", defaults.detector_sample_fps),
+            shard_workers=_env_int("CCTV_SHARD_WORKERS", defaults.shard_workers),
+            shard_min_segment_seconds=_env_float(
+                "CCTV_SHARD_MIN_SEGMENT_SECONDS", defaults.shard_min_segment_seconds
+            ),
+            rules_path=os.environ.get("CCTV_RULES_PATH", defaults.rules_path),
+            recognizer=os.environ.get("CCTV_RECOGNIZER", defaults.recognizer),
+            recognizer_weights=os.environ.get("CCTV_RECOGNIZER_WEIGHTS", defaults.recognizer_weights),
+            recognizer_window_seconds=_env_float(
+                "CCTV_RECOGNIZER_WINDOW_SECONDS", defaults.recognizer_window_seconds
+            ),
+            recognizer_stride_seconds=_env_float(
+                "CCTV_RECOGNIZER_STRIDE_SECONDS", defaults.recognizer_stride_seconds
+            ),
+            recognizer_batch_windows=_env_int("CCTV_RECOGNIZER_BATCH_WINDOWS", defaults.recognizer_batch_windows),
+            recognizer_min_confidence=_env_float(
+                "CCTV_RECOGNIZER_MIN_CONFIDENCE", defaults.recognizer_min_confidence
+            ),
+            summarizer=os.environ.get("CCTV_SUMMARIZER", defaults.summarizer),
+            summarizer_model=os.environ.get("CCTV_SUMMARIZER_MODEL", defaults.summarizer_model),
+            summarizer_max_new_tokens=_env_int("CCTV_SUMMARIZER_MAX_NEW_TOKENS", defaults.summarizer_max_new_tokens),
+            summarizer_batch_size=_env_int("CCTV_SUMMARIZER_BATCH_SIZE", defaults.summarizer_batch_size),
+            summarizer_max_wait_ms=_env_float("CCTV_SUMMARIZER_MAX_WAIT_MS", defaults.summarizer_max_wait_ms),
+            summarizer_threads=_env_int("CCTV_SUMMARIZER_THREADS", defaults.summarizer_threads),
+            stream_max_sessions=_env_int("CCTV_STREAM_MAX_SESSIONS", defaults.stream_max_sessions),
+            stream_buffer_seconds=_env_float("CCTV_STREAM_BUFFER_SECONDS", defaults.stream_buffer_seconds),
+            stream_history=_env_int("CCTV_STREAM_HISTORY", defaults.stream_history),
+            stream_file_root=os.environ.get("CCTV_STREAM_FILE_ROOT", defaults.stream_file_root),
+            scheduler_min_fps=_env_float("CCTV_SCHEDULER_MIN_FPS", defaults.scheduler_min_fps),
+            scheduler_max_queue_seconds=_env_float("CCTV_SCHEDULER_MAX_QUEUE_SECONDS", defaults.scheduler_max_queue_seconds),
+            scheduler_boost_factor=_env_float("CCTV_SCHEDULER_BOOST_FACTOR", defaults.scheduler_boost_factor),
+            scheduler_boost_seconds=_env_float("CCTV_SCHEDULER_BOOST_SECONDS", defaults.scheduler_boost_seconds),
+            summary_window_seconds=_env_float("CCTV_SUMMARY_WINDOW_SECONDS", defaults.summary_window_seconds),
+            summary_cache_entries=_env_int("CCTV_SUMMARY_CACHE_ENTRIES", defaults.summary_cache_entries),
+            push_buffer_size=_env_int("CCTV_PUSH_BUFFER_SIZE", defaults.push_buffer_size),
+            push_max_subscribers=_env_int("CCTV_PUSH_MAX_SUBSCRIBERS", defaults.push_max_subscribers),
+            push_keepalive_seconds=_env_float("CCTV_PUSH_KEEPALIVE_SECONDS", defaults.push_keepalive_seconds),
+            incident_db=os.environ.get("CCTV_INCIDENT_DB", defaults.incident_db),
+            incident_batch_size=_env_int("CCTV_INCIDENT_BATCH_SIZE", defaults.incident_batch_size),
+            incident_flush_seconds=_env_float("CCTV_INCIDENT_FLUSH_SECONDS", defaults.incident_flush_seconds),
+            evidence_dir=os.environ.get("CCTV_EVIDENCE_DIR", defaults.evidence_dir),
+            evidence_max_bytes=_env_int("CCTV_EVIDENCE_MAX_BYTES", defaults.evidence_max_bytes),
+            evidence_workers=_env_int("CCTV_EVIDENCE_WORKERS", defaults.evidence_workers),
+            evidence_clip_before_seconds=_env_float(
+                "CCTV_EVIDENCE_CLIP_BEFORE_SECONDS", defaults.evidence_clip_before_seconds
+            ),
+            evidence_clip_after_seconds=_env_float(
+                "CCTV_EVIDENCE_CLIP_AFTER_SECONDS", defaults.evidence_clip_after_seconds
+            ),
+            evidence_thumbnail_width=_env_int("CCTV_EVIDENCE_THUMBNAIL_WIDTH", defaults.evidence_thumbnail_width),
+            evidence_jpeg_quality=_env_int("CCTV_EVIDENCE_JPEG_QUALITY", defaults.evidence_jpeg_quality),
+            feature_dir=os.environ.get("CCTV_FEATURE_DIR", defaults.feature_dir),
+            feature_max_bytes=_env_int("CCTV_FEATURE_MAX_BYTES", defaults.feature_max_bytes),
+            feature_frames=_env_bool("CCTV_FEATURE_FRAMES", defaults.feature_frames),
+            profiling=_env_bool("CCTV_PROFILING", defaults.profiling),
+            profile_max_requests=_env_int("CCTV_PROFILE_MAX_REQUESTS", defaults.profile_max_requests),
+        )
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+"""
+Request tracing.
+
+Every HTTP request gets a request id (the client's ``X-Request-ID`` if it
+sent a sane one, otherwise a fresh one) held in a context variable, so it
+follows the request into tasks and, through ``PipelineExecutor``, into
+the pool threads running its stages. Named, timed sections of the work
+(upload, queue wait, each pipeline stage, ...) are recorded as spans with
+``span`` or, for durations measured elsewhere, ``record_span``. Each span
+
+- is observed into the ``cctv_stage_seconds{stage=...}`` histogram;
+- is added to the request's ``Trace``, which the service returns as a
+  ``Server-Timing`` header;
+- is logged at DEBUG with the request id.
+
+``RequestIdFilter`` puts the request id on every log record, so all the
+lines of one request can be found together.
+"""
+
+import logging
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+from service.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+_REQUEST_ID: ContextVar[Optional[str]] = ContextVar("cctv_request_id", default=None)
+_TRACE: ContextVar[Optional["Trace"]] = ContextVar("cctv_trace", default=None)
+
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+@dataclass
+class Span:
+    name: str
+    start_seconds: float  # offset from the start of the trace
+    seconds: float
+    status: str = "ok"  # "ok" | "error"
+
+
+class Trace:
+    """The spans recorded for one request."""
+
+    __slots__ = ("request_id", "started", "spans", "_lock")
+
+    def __init__(self, request_id: str) -> None:
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value: one ``name;dur=ms`` entry per span."""
+        with self._lock:
+            spans = list(self.spans)
+        return ", ".join(f"{s.name};dur={s.seconds * 1e3:.1f}" for s in spans)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def start_trace(request_id: Optional[str] = None) -> Trace:
+    """
+    Begin a trace in the current context. ``request_id`` is kept if it is
+    a plausible id (at most 128 of ``A-Z a-z 0-9 . _ : -``), else replaced.
+    """
+    if not request_id or not _VALID_REQUEST_ID.match(request_id):
+        request_id = new_request_id()
+    trace = Trace(request_id)
+    _REQUEST_ID.set(request_id)
+    _TRACE.set(trace)
+    return trace
+
+
+def current_request_id() -> Optional[str]:
+    return _REQUEST_ID.get()
+
+
+def current_trace() -> Optional[Trace]:
+    return _TRACE.get()
+
+
+def record_span(name: str, seconds: float, *, status: str = "ok", started: Optional[float] = None) -> None:
+    """
+    Record a span that took ``seconds`` (and began at ``started``, a
+    ``time.perf_counter()`` value; default: ``seconds`` ago).
+    """
+    REGISTRY.histogram(
+        "cctv_stage_seconds", "Time spent per request stage (upload, queue, pipeline stages).", {"stage": name}
+    ).observe(seconds)
+    trace = _TRACE.get()
+    if trace is not None:
+        if started is None:
+            started = time.perf_counter() - seconds
+        trace.add(Span(name=name, start_seconds=started - trace.started, seconds=seconds, status=status))
+    logger.debug(f"span {name} {status} {seconds * 1e3:.1f} ms")
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the enclosed block as span ``name``."""
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        record_span(name, time.perf_counter() - started, status=status, started=started)
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds ``request_id`` ("-" outside a request) to log records."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _REQUEST_ID.get() or "-"
+        return True
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+"""
+Streaming upload handling.
+
+Uploaded videos are copied to disk in fixed-size chunks instead of being
+read into memory in one go, so a multi-GB recording only ever costs one
+chunk of RAM per request. The SHA-256 digest is computed while the bytes
+stream past, which lets later pipeline stages reuse it without a second
+read of the file.
+"""
+
+import hashlib
+from dataclasses import dataclass
+from typing import BinaryIO, Mapping, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from service.metrics import MEMORY_BUCKETS, REGISTRY, peak_rss_bytes
+
+UPLOAD_BYTES = REGISTRY.counter("cctv_upload_bytes_total", "Bytes received through video uploads.")
+UPLOADS_REJECTED = REGISTRY.counter("cctv_uploads_rejected_total", "Uploads rejected for exceeding the size limit.")
+UPLOAD_PEAK_BUFFER = REGISTRY.gauge(
+    "cctv_upload_peak_buffer_bytes",
+    "Largest chunk held in memory while streaming the most recent upload.",
+)
+PROCESS_PEAK_RSS = REGISTRY.gauge("cctv_process_peak_rss_bytes", "Process resident set size high-water mark.")
+ANALYSIS_PEAK_RSS_GROWTH = REGISTRY.histogram(
+    "cctv_analysis_peak_rss_growth_bytes",
+    "Growth of the process RSS high-water mark per analysis (upload request or job).",
+    buckets=MEMORY_BUCKETS,
+)
+
+
+@dataclass
+class UploadResult:
+    path: str
+    size_bytes: int
+    sha256: str
+    peak_buffer_bytes: int
+
+
+def content_length_exceeds(headers: Mapping[str, str], max_bytes: int) -> bool:
+    """
+    True if the request declares a body larger than ``max_bytes``.
+
+    Used to reject oversized uploads before the multipart body is parsed.
+    Requests without a Content-Length are checked while streaming instead.
+    """
+    if max_bytes <= 0:
+        return False
+    raw = headers.get("content-length")
+    if raw is None:
+        return False
+    try:
+        return int(raw) > max_bytes
+    except ValueError:
+        return False
+
+
+def _write_and_hash(out: BinaryIO, digest, chunk: bytes) -> None:
+    # hashlib releases the GIL for large buffers, so this runs well in the threadpool.
+    digest.update(chunk)
+    out.write(chunk)
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    UPLOADS_REJECTED.inc()
+    return HTTPException(
+        status_code=413,
+        detail=f"Uploaded file exceeds the maximum allowed size of {max_bytes} bytes",
+    )
+
+
+async def stream_upload_to_disk(
+    upload: UploadFile,
+    dest_path: str,
+    *,
+    max_bytes: int,
+    chunk_size: int = 1024 ** 2,
+) -> UploadResult:
+    """
+    Copy ``upload`` to ``dest_path`` chunk by chunk, hashing as we go.
+
+    Raises HTTP 413 as soon as the size limit is crossed and HTTP 400 for
+    empty uploads.
+    """
+    declared: Optional[int] = upload.size
+    if max_bytes > 0 and declared is not None and declared > max_bytes:
+        raise _too_large(max_bytes)
+
+    digest = hashlib.sha256()
+    total = 0
+    peak_buffer = 0
+
+    with open(dest_path, "wb") as out:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            total += len(chunk)
+            if max_bytes > 0 and total > max_bytes:
+                raise _too_large(max_bytes)
+            peak_buffer = max(peak_buffer, len(chunk))
+            await run_in_threadpool(_write_and_hash, out, digest, chunk)
+
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+
+    UPLOAD_BYTES.inc(total)
+    UPLOAD_PEAK_BUFFER.set(peak_buffer)
+    rss = peak_rss_bytes()
+    if rss is not None:
+        PROCESS_PEAK_RSS.set_max(rss)
+
+    return UploadResult(
+        path=dest_path,
+        size_bytes=total,
+        sha256=digest.hexdigest(),
+        peak_buffer_bytes=peak_buffer,
+    )
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+"""
+Bounded worker pool for the CPU-bound analysis stages.
+
+OpenCV decoding, detection, recognition, summarization and risk scoring
+are blocking calls. Running them directly inside ``async def`` handlers
+stalls the event loop, so ``/health`` and every other request wait for
+the slowest clip. ``PipelineExecutor`` moves each stage onto a thread or
+process pool and puts a bounded admission queue in front of it: at most
+``max_workers`` analyses run at once, at most ``max_queue`` wait, and
+anything beyond that is rejected immediately with a Retry-After hint
+instead of piling up.
+"""
+
+import asyncio
+import contextvars
+import math
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Optional, Tuple
+
+from service.metrics import REGISTRY
+from service.profiling import RequestProfile, current_profile
+from service.tracing import record_span
+
+QUEUE_DEPTH = REGISTRY.gauge("cctv_pipeline_queue_depth", "Analyses admitted and waiting for a worker slot.")
+IN_FLIGHT = REGISTRY.gauge("cctv_pipeline_in_flight", "Analyses currently running on the worker pool.")
+REJECTED = REGISTRY.counter("cctv_pipeline_rejected_total", "Analyses rejected because the admission queue was full.")
+QUEUE_WAIT = REGISTRY.histogram("cctv_pipeline_queue_wait_seconds", "Time analyses waited for a worker slot.")
+TASK_WAIT = REGISTRY.histogram(
+    "cctv_pipeline_task_wait_seconds", "Time stage tasks waited in the pool before starting."
+)
+
+
+def _call(
+    fn: Callable[..., Any],
+    args: tuple,
+    kwargs: dict,
+    submitted_at: float,
+    profile: Optional[RequestProfile] = None,
+) -> Tuple[Any, float]:
+    """Pool-side wrapper: run ``fn`` and return its result with the time it waited to start."""
+    # Wall clock, not perf_counter: with a process pool this runs in another process.
+    waited = max(0.0, time.time() - submitted_at)
+    if profile is not None:
+        profile.attach()
+    try:
+        return fn(*args, **kwargs), waited
+    finally:
+        if profile is not None:
+            profile.detach()
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the admission queue is full; maps to HTTP 503."""
+
+    def __init__(self, retry_after_seconds: int) -> None:
+        super().__init__("Analysis workers are saturated, retry later")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class PipelineExecutor:
+    """
+    Runs blocking stage functions on a pool with bounded admission.
+
+    Usage::
+
+        async with executor.admit():
+            metadata = await executor.run(extract_video_metadata, path)
+            ...
+
+    With ``kind="process"`` the stage functions and their arguments must
+    be picklable (all module-level pipeline functions are).
+    """
+
+    def __init__(
+        self,
+        *,
+        kind: str = "thread",
+        max_workers: int = 2,
+        max_queue: int = 8,
+        default_retry_after: int = 5,
+    ) -> None:
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown worker kind: {kind!r} (expected 'thread' or 'process')")
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.default_retry_after = max(1, default_retry_after)
+        self._pool: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._queued = 0
+        self._running = 0
+        # Exponential moving average of admitted-analysis wall time, for Retry-After.
+        self._avg_seconds: Optional[float] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    @property
+    def in_flight(self) -> int:
+        return self._running
+
+    def _ensure_started(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cctv-stage")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        return self._pool
+
+    def is_saturated(self) -> bool:
+        """True if a new analysis would be rejected by ``admit()``."""
+        return self._running >= self.max_workers and self._queued >= self.max_queue
+
+    def retry_after_seconds(self) -> int:
+        if self._avg_seconds is None:
+            return self.default_retry_after
+        # Rough time until a queue position frees up.
+        waves = (self._queued + self._running) / self.max_workers
+        return max(1, math.ceil(self._avg_seconds * max(waves, 1.0)))
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """
+        Reserve a worker slot for one analysis, waiting in the bounded
+        queue if all slots are busy. Raises ``PoolSaturatedError`` if the
+        queue is already full.
+        """
+        self._ensure_started()
+        assert self._slots is not None
+        if self.is_saturated():
+            REJECTED.inc()
+            raise PoolSaturatedError(self.retry_after_seconds())
+
+        self._queued += 1
+        QUEUE_DEPTH.set(self._queued)
+        queued_at = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+            QUEUE_DEPTH.set(self._queued)
+        waited = time.perf_counter() - queued_at
+        QUEUE_WAIT.observe(waited)
+        record_span("queue", waited, started=queued_at)
+
+        self._running += 1
+        IN_FLIGHT.set(self._running)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._avg_seconds = elapsed if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * elapsed
+            self._running -= 1
+            IN_FLIGHT.set(self._running)
+            self._slots.release()
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run one blocking stage function on the pool. On a thread pool the
+        function runs in a copy of the caller's context (request id, trace)
+        and under the request's profiler, if it is being profiled.
+        """
+        pool = self._ensure_started()
+        loop = asyncio.get_running_loop()
+        if self.kind == "thread":
+            call = partial(contextvars.copy_context().run, _call, fn, args, kwargs, time.time(), current_profile())
+        else:
+            call = partial(_call, fn, args, kwargs, time.time())
+        result, waited = await loop.run_in_executor(pool, call)
+        TASK_WAIT.observe(waited)
+        return result
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+"""
+Pluggable narrative summarizer backends.
+
+A ``Summarizer`` turns an activity timeline into the narrative text,
+either all at once (``summarize``) or as a stream of text chunks as they
+are produced (``stream``). Model backends are also a ``TextGenerator``
+answering free-form prompts (``generate``, used for live window
+summaries); ``text_generator`` returns it, or None for backends without
+a model. Backends are selected by
+``SummarizerConfig.backend``:
+
+- ``template``: today's fixed-phrase narrative; instant, no model. The
+  default.
+- ``hf``: a local Hugging Face seq2seq model (e.g. ``google/flan-t5-small``)
+  on CPU with ``transformers`` and ``torch``. Requests arriving from
+  concurrent jobs are micro-batched: a background thread waits up to
+  ``max_wait_ms`` for up to ``batch_size`` prompts and decodes them in one
+  ``generate`` call, streaming each row's tokens back to its caller as
+  they are decoded.
+
+``get_summarizer`` builds each configuration once per process and keeps
+the model resident, like ``get_detector``.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Protocol, Set
+
+from recognition.activity_recognition import ActivityItem
+from summarization.llm_summarizer import RISK_PHRASES, generate_narrative_summary
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SummarizerConfig:
+    backend: str = "template"  # "template" | "hf"
+    model_path: str = ""  # local directory or Hub id of a seq2seq model
+    max_new_tokens: int = 200
+    max_input_tokens: int = 1024
+    batch_size: int = 8
+    max_wait_ms: float = 20.0  # how long a request waits for others to batch with
+    threads: int = 0  # torch intra-op threads; 0 leaves torch's default
+
+
+class Summarizer(Protocol):
+    name: str
+
+    def warmup(self) -> None: ...
+
+    def summarize(self, activities: List[ActivityItem], duration_seconds: float) -> str: ...
+
+    def stream(self, activities: List[ActivityItem], duration_seconds: float) -> Iterator[str]: ...
+
+
+class TextGenerator(Protocol):
+    def generate(self, prompt: str) -> str: ...
+
+
+def text_generator(summarizer: Summarizer) -> Optional[TextGenerator]:
+    """``summarizer`` if it answers free-form prompts, else None."""
+    return summarizer if callable(getattr(summarizer, "generate", None)) else None
+
+
+def narrative_prompt(activities: List[ActivityItem], duration_seconds: float) -> str:
+    lines = "\n".join(
+        f"- {a.timestamp}: {a.label} ({RISK_PHRASES.get(a.type, 'observed behavior')}, "
+        f"confidence {a.confidence * 100:.0f}%)"
+        for a in activities
+    )
+    return (
+        f"Write a short incident report for {duration_seconds / 60.0:.1f} minutes of CCTV footage. "
+        "Describe the sequence of events, point out anything suspicious and say whether "
+        f"a security review is needed.\nDetected activities:\n{lines or '- none'}"
+    )
+
+
+class TemplateSummarizer:
+    """Fixed-phrase narrative (``generate_narrative_summary``); no model."""
+
+    name = "template"
+
+    def __init__(self, config: SummarizerConfig) -> None:
+        self.config = config
+
+    def warmup(self) -> None:
+        return None
+
+    def summarize(self, activities: List[ActivityItem], duration_seconds: float) -> str:
+        return generate_narrative_summary(activities, duration_seconds)
+
+    def stream(self, activities: List[ActivityItem], duration_seconds: float) -> Iterator[str]:
+        text = self.summarize(activities, duration_seconds)
+        yield from text.splitlines(keepends=True)
+
+
+class _Request:
+    __slots__ = ("prompt", "chunks", "enqueued_at")
+
+    def __init__(self, prompt: str) -> None:
+        self.prompt = prompt
+        self.chunks: "queue.SimpleQueue" = queue.SimpleQueue()  # str chunks, then None or an exception
+        self.enqueued_at = time.monotonic()
+
+
+class _BatchStreamer:
+    """
+    ``transformers`` streamer for a whole batch: ``put`` receives the next
+    token of every row, and each row's newly decodable text is forwarded
+    to its request.
+    """
+
+    def __init__(self, tokenizer, requests: List[_Request]) -> None:
+        self.tokenizer = tokenizer
+        self.requests = requests
+        self._tokens: List[List[int]] = [[] for _ in requests]
+        self._sent = [0] * len(requests)  # characters already forwarded per row
+        self._done = [False] * len(requests)
+        self._started = False
+
+    def put(self, value) -> None:
+        if not self._started:
+            # The first call carries the decoder start tokens, not generated text.
+            self._started = True
+            return
+        ids = value.reshape(len(self.requests), -1)[:, -1].tolist()
+        eos = self.tokenizer.eos_token_id
+        for row, token in enumerate(ids):
+            if self._done[row]:
+                continue
+            if token == eos:
+                self._done[row] = True
+                continue
+            self._tokens[row].append(token)
+            text = self.tokenizer.decode(self._tokens[row], skip_special_tokens=True)
+            # Hold back a trailing partial character until the next token completes it.
+            if text.endswith("\ufffd"):
+                continue
+            if len(text) > self._sent[row]:
+                self.requests[row].chunks.put(text[self._sent[row]:])
+                self._sent[row] = len(text)
+
+    def end(self) -> None:
+        for row, request in enumerate(self.requests):
+            text = self.tokenizer.decode(self._tokens[row], skip_special_tokens=True)
+            if len(text) > self._sent[row]:
+                request.chunks.put(text[self._sent[row]:])
+            request.chunks.put(None)
+
+
+class HFSummarizer:
+    """
+    Local seq2seq model with micro-batched, streamed generation (see the
+    module docstring).
+    """
+
+    name = "hf"
+
+    def __init__(self, config: SummarizerConfig) -> None:
+        try:
+            import torch
+            from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The 'hf' summarizer backend requires transformers and torch: pip install transformers torch"
+            ) from e
+        if not config.model_path:
+            raise ValueError("The 'hf' summarizer backend needs a model (CCTV_SUMMARIZER_MODEL)")
+
+        if config.threads > 0:
+            torch.set_num_threads(config.threads)
+        self.config = config
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(config.model_path)
+        self.model = AutoModelForSeq2SeqLM.from_pretrained(config.model_path)
+        self.model.eval()
+        self._requests: "queue.Queue[_Request]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid = 0
+        self._thread_lock = threading.Lock()
+
+    def _ensure_batcher(self) -> None:
+        # Started on first use, and again in a forked child (threads don't
+        # survive fork), so a summarizer loaded before forking works in every worker.
+        if self._thread_pid == os.getpid():
+            return
+        with self._thread_lock:
+            if self._thread_pid != os.getpid():
+                self._requests = queue.Queue()
+                self._thread = threading.Thread(target=self._serve, name="summarizer-batcher", daemon=True)
+                self._thread.start()
+                self._thread_pid = os.getpid()
+
+    def warmup(self) -> None:
+        self.generate("Summarize: nothing happened.")
+
+    # -- callers -----------------------------------------------------------
+
+    def stream_prompt(self, prompt: str) -> Iterator[str]:
+        self._ensure_batcher()
+        request = _Request(prompt)
+        self._requests.put(request)
+        while True:
+            chunk = request.chunks.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    def generate(self, prompt: str) -> str:
+        return "".join(self.stream_prompt(prompt)).strip()
+
+    def stream(self, activities: List[ActivityItem], duration_seconds: float) -> Iterator[str]:
+        return self.stream_prompt(narrative_prompt(activities, duration_seconds))
+
+    def summarize(self, activities: List[ActivityItem], duration_seconds: float) -> str:
+        return self.generate(narrative_prompt(activities, duration_seconds))
+
+    # -- batching thread -----------------------------------------------------
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._requests.get()]
+        deadline = batch[0].enqueued_at + self.config.max_wait_ms / 1000.0
+        while len(batch) < self.config.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _serve(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                inputs = self.tokenizer(
+                    [r.prompt for r in batch],
+                    return_tensors="pt",
+                    padding=True,
+                    truncation=True,
+                    max_length=self.config.max_input_tokens,
+                )
+                streamer = _BatchStreamer(self.tokenizer, batch)
+                with self._torch.inference_mode():
+                    self.model.generate(
+                        **inputs,
+                        max_new_tokens=self.config.max_new_tokens,
+                        do_sample=False,
+                        streamer=streamer,
+                    )
+            except Exception as e:
+                logger.error(f"Summarizer batch of {len(batch)} failed: {e}", exc_info=True)
+                for request in batch:
+                    request.chunks.put(e)
+
+
+def create_summarizer(config: SummarizerConfig) -> Summarizer:
+    if config.backend == "template":
+        return TemplateSummarizer(config)
+    if config.backend == "hf":
+        return HFSummarizer(config)
+    raise ValueError(f"Unknown summarizer backend: {config.backend!r} (expected 'template' or 'hf')")
+
+
+_instances: Dict[SummarizerConfig, Summarizer] = {}
+_warmed: Set[SummarizerConfig] = set()
+_instances_lock = threading.Lock()
+
+
+def get_summarizer(config: SummarizerConfig, *, warm: bool = True) -> Summarizer:
+    """
+    Process-wide summarizer for ``config``, created (and warmed up) on
+    first use and reused afterwards. One created with ``warm=False`` is
+    warmed by the first call that wants it warm.
+    """
+    summarizer: Optional[Summarizer] = _instances.get(config)
+    if summarizer is not None and (not warm or config in _warmed):
+        return summarizer
+    with _instances_lock:
+        summarizer = _instances.get(config)
+        if summarizer is None:
+            summarizer = create_summarizer(config)
+            _instances[config] = summarizer
+        if warm and config not in _warmed:
+            summarizer.warmup()
+            _warmed.add(config)
+    return summarizer
+
+
+def warm_summarizer(config: SummarizerConfig) -> None:
+    """Load and warm the summarizer for ``config`` in the calling process."""
+    get_summarizer(config)
+
+
+def summarizer_loaded(config: SummarizerConfig) -> bool:
+    """True once the summarizer for ``config`` is loaded and warm in this process."""
+    return config in _warmed
@@ -9,62 +9,300 @@ For a production / research setup you can:
 
 Here we generate a clear, human-readable narrative using the list of
 activities so you get immediate, offline-friendly behavior.
+
+``generate_narrative_summary`` builds the narrative for a finished
+timeline in one go. ``IncrementalSummarizer`` maintains it for timelines
+that keep growing (live streams): each activity's sentence is formatted
+once when it arrives, and activities are grouped into fixed time windows
+that are summarized once, when the stream clock passes their end.
+Window summaries are memoized in a process-wide LRU ``PromptCache`` keyed
+by the window's prompt, so identical windows (on any camera) are only
+generated once; that matters once a real LLM produces them. A stream
+may run for months, so only the latest activities and windows are kept
+in full; older ones are rolled up into counts.
 """
 
-from typing import List
+import threading
+from collections import Counter, OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Optional
 
-from recognition.activity_recognition import ActivityItem
+from recognition.activity_recognition import ActivityItem, format_timestamp
 
+RISK_PHRASES = {
+    "normal": "normal behavior",
+    "warning": "potentially suspicious behavior",
+    "danger": "high-risk behavior",
+}
 
-def generate_narrative_summary(
-    activities: List[ActivityItem],
-    duration_seconds: float,
-) -> str:
-    if not activities:
-        return (
-            "The CCTV footage shows normal activity in the monitored area. "
-            "No abnormal or high-risk events were detected during the recording."
-        )
+NO_ACTIVITY_SUMMARY = (
+    "The CCTV footage shows normal activity in the monitored area. "
+    "No abnormal or high-risk events were detected during the recording."
+)
 
+# Generates text for a prompt (e.g. a local LLM); the template is used without one.
+Generate = Callable[[str], str]
+
+
+def activity_sentence(a: ActivityItem) -> str:
+    risk_phrase = RISK_PHRASES.get(a.type, "observed behavior")
+    return (
+        f"- At {a.timestamp}, the system detected '{a.label}' "
+        f"({risk_phrase}, confidence {a.confidence * 100:.0f}%)."
+    )
+
+
+def _intro(duration_seconds: float) -> str:
     duration_min = max(duration_seconds / 60.0, 0.1)
-    intro = (
+    return (
         f"The analyzed CCTV footage spans approximately {duration_min:.1f} minutes. "
         "The AI system detected the following sequence of activities:"
     )
 
-    lines = []
-    for a in activities:
-        risk_phrase = {
-            "normal": "normal behavior",
-            "warning": "potentially suspicious behavior",
-            "danger": "high-risk behavior",
-        }.get(a.type, "observed behavior")
-
-        lines.append(
-            f"- At {a.timestamp}, the system detected '{a.label}' "
-            f"({risk_phrase}, confidence {a.confidence * 100:.0f}%)."
-        )
 
+def _closing(has_danger: bool, has_warning: bool) -> str:
     # Simple risk-focused closing sentence
-    has_danger = any(a.type == "danger" for a in activities)
-    has_warning = any(a.type == "warning" for a in activities)
-
     if has_danger:
-        closing = (
+        return (
             "Overall, the sequence of events indicates a high-risk incident "
             "involving unauthorized access and possible theft, and immediate "
             "security review is recommended."
         )
-    elif has_warning:
-        closing = (
+    if has_warning:
+        return (
             "While no confirmed critical incident was detected, the presence of "
             "suspicious or unusual behavior warrants closer monitoring of this area."
         )
-    else:
-        closing = (
-            "No anomalous activities were identified, and the scene appears to "
-            "remain within normal behavioral patterns."
-        )
+    return (
+        "No anomalous activities were identified, and the scene appears to "
+        "remain within normal behavioral patterns."
+    )
+
+
+def generate_narrative_summary(
+    activities: List[ActivityItem],
+    duration_seconds: float,
+) -> str:
+    if not activities:
+        return NO_ACTIVITY_SUMMARY
+
+    lines = [activity_sentence(a) for a in activities]
+    has_danger = any(a.type == "danger" for a in activities)
+    has_warning = any(a.type == "warning" for a in activities)
+    return "\n\n".join([_intro(duration_seconds), "\n".join(lines), _closing(has_danger, has_warning)])
+
+
+class PromptCache:
+    """Thread-safe LRU map from prompt text to generated output."""
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_generate(self, prompt: str, generate: Generate) -> str:
+        with self._lock:
+            output = self._entries.get(prompt)
+            if output is not None:
+                self._entries.move_to_end(prompt)
+                self.hits += 1
+                return output
+            self.misses += 1
+        # Generate outside the lock; two threads racing on one prompt both generate once.
+        output = generate(prompt)
+        with self._lock:
+            self._entries[prompt] = output
+            self._entries.move_to_end(prompt)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return output
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_prompt_caches: Dict[int, PromptCache] = {}
+_prompt_caches_lock = threading.Lock()
+
+
+def get_prompt_cache(max_entries: int = 1024) -> PromptCache:
+    """Process-wide prompt cache of the given size, created on first use."""
+    cache = _prompt_caches.get(max_entries)
+    if cache is not None:
+        return cache
+    with _prompt_caches_lock:
+        cache = _prompt_caches.get(max_entries)
+        if cache is None:
+            cache = PromptCache(max_entries)
+            _prompt_caches[max_entries] = cache
+    return cache
+
+
+def window_prompt(activities: List[ActivityItem]) -> str:
+    """
+    Prompt describing one time window's activities, and the cache key for
+    its summary. It leaves out clock times so that windows with the same
+    activities share one summary.
+    """
+    lines = "\n".join(f"- {a.type}: '{a.label}' (confidence {a.confidence:.2f})" for a in activities)
+    return f"Summarize this CCTV activity in one sentence, noting anything suspicious:\n{lines}"
+
+
+_RISK_ORDER = [RISK_PHRASES["normal"], RISK_PHRASES["warning"], RISK_PHRASES["danger"]]
+
+
+def _risk_phrase(activities: List[ActivityItem]) -> str:
+    if any(a.type == "danger" for a in activities):
+        return RISK_PHRASES["danger"]
+    return RISK_PHRASES["warning"] if any(a.type == "warning" for a in activities) else RISK_PHRASES["normal"]
+
+
+def template_window_summary(activities: List[ActivityItem]) -> str:
+    flagged = [a for a in activities if a.type in ("warning", "danger")]
+    described = ", ".join(f"'{a.label}'" for a in (flagged or activities))
+    risk = _risk_phrase(activities)
+    count = len(activities)
+    return f"{count} {'activity' if count == 1 else 'activities'} ({risk}), including {described}."
+
+
+class IncrementalSummarizer:
+    """
+    Narrative of a growing timeline. Call ``add`` with each batch of new
+    activities and the stream time they occurred at, then ``narrative``
+    or ``window_summaries`` whenever a summary is wanted; neither redoes
+    work for activities or windows already handled.
+
+    Closed windows are summarized lazily by ``window_summaries``, on the
+    reader's thread, so a slow ``generate`` never holds up the caller of
+    ``add`` (the live processing thread).
+
+    Memory stays bounded however long the stream runs: the narrative
+    lists the last ``max_activities`` activities and ``window_summaries``
+    the last ``max_windows`` windows; anything older is rolled up into
+    one leading line.
+    """
+
+    def __init__(
+        self,
+        *,
+        window_seconds: float = 60.0,
+        generate: Optional[Generate] = None,
+        cache: Optional[PromptCache] = None,
+        max_activities: int = 500,
+        max_windows: int = 100,
+    ) -> None:
+        self.window_seconds = max(window_seconds, 1e-3)
+        self.generate = generate
+        self.cache = cache if cache is not None else get_prompt_cache()
+        self.max_activities = max(1, max_activities)
+        self.max_windows = max(1, max_windows)
+        self._lines: Deque[str] = deque()
+        self._line_types: Deque[str] = deque()  # activity type of each of ``_lines``
+        self._rolled_types: Counter = Counter()  # activity types no longer listed
+        self._has_danger = False
+        self._has_warning = False
+        self._open: Dict[int, List[ActivityItem]] = {}  # window index -> its activities so far
+        # Closed windows in order: [window index, activities, summary once generated].
+        self._closed: Deque[list] = deque()
+        self._rolled_windows: Optional[list] = None  # [first window, last window, activities, risk]
+        self._summaries_lock = threading.Lock()
+        self._clock = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, activities: List[ActivityItem], at_seconds: float) -> None:
+        with self._lock:
+            window = int(at_seconds // self.window_seconds)
+            for a in activities:
+                self._lines.append(activity_sentence(a))
+                self._line_types.append(a.type)
+                self._has_danger = self._has_danger or a.type == "danger"
+                self._has_warning = self._has_warning or a.type == "warning"
+                self._open.setdefault(window, []).append(a)
+            while len(self._lines) > self.max_activities:
+                self._lines.popleft()
+                self._rolled_types[self._line_types.popleft()] += 1
+            self._advance(at_seconds)
+
+    def advance(self, now_seconds: float) -> None:
+        """Move the stream clock (closing windows that ended) without new activities."""
+        with self._lock:
+            self._advance(now_seconds)
+
+    def _advance(self, now_seconds: float) -> None:
+        self._clock = max(self._clock, now_seconds)
+        current = int(self._clock // self.window_seconds)
+        for window in sorted(w for w in self._open if w < current):
+            self._close_window(window)
+
+    def flush(self) -> None:
+        """Close every window still open (the stream has ended)."""
+        with self._lock:
+            for window in sorted(self._open):
+                self._close_window(window)
+
+    def _close_window(self, window: int) -> None:
+        self._closed.append([window, self._open.pop(window), None])
+        while len(self._closed) > self.max_windows:
+            old, activities, _ = self._closed.popleft()
+            risk = _risk_phrase(activities)
+            if self._rolled_windows is None:
+                self._rolled_windows = [old, old, len(activities), risk]
+            else:
+                rolled = self._rolled_windows
+                rolled[1], rolled[2] = old, rolled[2] + len(activities)
+                if _RISK_ORDER.index(risk) > _RISK_ORDER.index(rolled[3]):
+                    rolled[3] = risk
+
+    def _span(self, first: int, last: int) -> str:
+        start, end = first * self.window_seconds, (last + 1) * self.window_seconds
+        return f"{format_timestamp(start)}-{format_timestamp(end)}"
+
+    def _summarize(self, window: int, activities: List[ActivityItem]) -> str:
+        generate = self.generate or (lambda _: template_window_summary(activities))
+        summary = self.cache.get_or_generate(window_prompt(activities), generate)
+        return f"{self._span(window, window)}: {summary}"
 
-    return "\n\n".join([intro, "\n".join(lines), closing])
+    def window_summaries(self) -> List[str]:
+        """
+        Summaries of the windows closed so far, in time order, after one
+        line rolling up the windows no longer kept.
+        """
+        with self._summaries_lock:
+            with self._lock:
+                pending = [entry for entry in self._closed if entry[2] is None]
+            for entry in pending:
+                # An entry rolled up meanwhile is just summarized for nothing.
+                entry[2] = self._summarize(entry[0], entry[1])
+            with self._lock:
+                summaries = [entry[2] for entry in self._closed if entry[2] is not None]
+                rolled = self._rolled_windows
+                if rolled is not None:
+                    first, last, count, risk = rolled
+                    noun = "activity" if count == 1 else "activities"
+                    summaries.insert(0, f"{self._span(first, last)}: {count} {noun} ({risk}), not itemized.")
+            return summaries
 
+    def narrative(self, duration_seconds: Optional[float] = None) -> str:
+        """
+        The same text ``generate_narrative_summary`` gives for the
+        activities added so far (``duration_seconds`` defaults to the
+        stream clock), except that activities beyond the last
+        ``max_activities`` are only counted.
+        """
+        with self._lock:
+            if not self._lines:
+                return NO_ACTIVITY_SUMMARY
+            duration = self._clock if duration_seconds is None else duration_seconds
+            lines = list(self._lines)
+            if self._rolled_types:
+                count = sum(self._rolled_types.values())
+                flagged = ", ".join(
+                    f"{self._rolled_types[kind]} {RISK_PHRASES[kind]}"
+                    for kind in ("danger", "warning")
+                    if self._rolled_types[kind]
+                )
+                detail = f" ({flagged})" if flagged else ""
+                verb = "activity was" if count == 1 else "activities were"
+                lines.insert(0, f"- Earlier, {count} {verb} detected{detail}; the latest {len(lines)} follow.")
+            return "\n\n".join([_intro(duration), "\n".join(lines), _closing(self._has_danger, self._has_warning)])